@@ -0,0 +1,980 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Device Monitor Benchmarks
+Measures the device-scan, event-delivery and launch hot paths of main.py
+against fake sysfs trees, fake lsusb output, a headless Tcl interpreter
+and trivial child executables. Runs on a plain Linux box without USB
+hardware or a display.
+
+Usage:
+    python benchmarks.py                          # run everything, print a table
+    python benchmarks.py --output baseline.json   # save results as a baseline
+    python benchmarks.py --baseline baseline.json # compare, exit 1 on regression
+    python benchmarks.py --filter scan            # only benchmarks matching "scan"
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import os
+import platform
+import queue
+import shutil
+import stat
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import main
+from tests.fakes import (FakeClock, FakeHotplugListener, bouncing_trace, make_fake_sysfs, wait_for_delta,
+                         write_fake_device)
+
+BENCHMARKS = []
+
+
+def benchmark(name):
+    """Register a benchmark function returning a result dict"""
+    def register(func):
+        BENCHMARKS.append((name, func))
+        return func
+    return register
+
+
+def percentile(sorted_samples, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, max(0, int(round(fraction * len(sorted_samples) + 0.5)) - 1))
+    return sorted_samples[index]
+
+
+def summarize(samples, items_per_sample=1):
+    """Reduce per-iteration durations (seconds) to p50/p99 latency and throughput"""
+    ordered = sorted(samples)
+    total = sum(ordered)
+    return {
+        'samples': len(ordered),
+        'p50_ms': percentile(ordered, 0.50) * 1000,
+        'p99_ms': percentile(ordered, 0.99) * 1000,
+        'mean_ms': total / len(ordered) * 1000 if ordered else 0.0,
+        'throughput_per_s': len(ordered) * items_per_sample / total if total else 0.0,
+    }
+
+
+def measure(func, iterations, warmup=3):
+    """Time func() over iterations after a few warmup calls"""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def make_fake_lsusb(directory, devices):
+    """Write an lsusb stand-in printing canned output for the given devices"""
+    lines = [f"Bus {busnum:03d} Device {devnum:03d}: ID {vendor}:{product} Fake Device"
+             for _, vendor, product, busnum, devnum in devices]
+    script = os.path.join(directory, 'lsusb')
+    with open(script, 'w') as f:
+        f.write('#!/bin/sh\ncat <<"EOF"\n' + '\n'.join(lines) + '\nEOF\n')
+    os.chmod(script, 0o755)
+    return '\n'.join(lines)
+
+
+def make_child(directory, name, body):
+    """Write a trivial shell child executable"""
+    path = os.path.join(directory, name)
+    with open(path, 'w') as f:
+        f.write('#!/bin/sh\n' + body + '\n')
+    os.chmod(path, 0o755)
+    return path
+
+
+@benchmark('scan.sysfs_enumerate')
+def bench_sysfs_enumerate(args, workdir):
+    root = os.path.join(workdir, 'sysfs')
+    make_fake_sysfs(root)
+    enumerator = main.SysfsUSBEnumerator(root)
+    return summarize(measure(enumerator.enumerate, args.iterations))
+
+
+@benchmark('scan.parse_lsusb')
+def bench_parse_lsusb(args, workdir):
+    devices = make_fake_sysfs(os.path.join(workdir, 'sysfs'))
+    output = make_fake_lsusb(workdir, devices)
+    return summarize(measure(lambda: main.USBMonitor.parse_lsusb_output(output), args.iterations))
+
+
+@benchmark('scan.check_devices_sysfs')
+def bench_check_devices_sysfs(args, workdir):
+    root = os.path.join(workdir, 'sysfs')
+    make_fake_sysfs(root)
+    monitor = main.USBMonitor(queue.Queue(), queue.Queue())
+    monitor.sysfs_enumerator = main.SysfsUSBEnumerator(root)
+    return summarize(measure(monitor.check_devices, args.iterations))
+
+
+@benchmark('scan.check_devices_16_cards')
+def bench_check_devices_16_cards(args, workdir):
+    root = os.path.join(workdir, 'sysfs')
+    make_fake_sysfs(root, device_count=0)
+    ports = [f'3-1.{hub}.{port}' for hub in range(1, 5) for port in range(1, 5)]
+    for devnum, port in enumerate(ports, 2):
+        write_fake_device(root, port, '1809', '4761', 3, devnum)
+    monitor = main.USBMonitor(queue.Queue(), queue.Queue())
+    monitor.sysfs_enumerator = main.SysfsUSBEnumerator(root)
+    monitor.set_slot_map_path(os.path.join(workdir, 'card_slots.json'))
+    before = dict((status['port'], name) for name, status in monitor.check_devices().items() if status.get('port'))
+
+    # Re-plug every card in reverse order (new device numbers), then restart with the saved map
+    for devnum, port in enumerate(reversed(ports), 40):
+        shutil.rmtree(os.path.join(root, port))
+        shutil.rmtree(os.path.join(root, f'{port}:1.0'))
+        write_fake_device(root, port, '1809', '4761', 3, devnum)
+    monitor = main.USBMonitor(queue.Queue(), queue.Queue())
+    monitor.sysfs_enumerator = main.SysfsUSBEnumerator(root)
+    monitor.set_slot_map_path(os.path.join(workdir, 'card_slots.json'))
+    status = monitor.check_devices()
+    after = dict((status['port'], name) for name, status in status.items() if status.get('port'))
+    # 16 cards plus the 4750
+    if len(before) != 17 or before != after:
+        return {'error': f"card slots not stable across re-plug: {before} != {after}"}
+    return summarize(measure(monitor.check_devices, args.iterations))
+
+
+@benchmark('scan.check_devices_lsusb')
+def bench_check_devices_lsusb(args, workdir):
+    devices = make_fake_sysfs(os.path.join(workdir, 'sysfs'))
+    bin_dir = os.path.join(workdir, 'bin')
+    os.makedirs(bin_dir)
+    make_fake_lsusb(bin_dir, devices)
+    monitor = main.USBMonitor(queue.Queue(), queue.Queue())
+    monitor.sysfs_enumerator = main.SysfsUSBEnumerator(os.path.join(workdir, 'missing'))
+    old_path = os.environ.get('PATH', '')
+    os.environ['PATH'] = bin_dir + os.pathsep + old_path
+    try:
+        return summarize(measure(monitor.check_devices, max(10, args.iterations // 10)))
+    finally:
+        os.environ['PATH'] = old_path
+
+
+class SlowStream:
+    """File stream wrapper adding a fixed delay per write, like a busy eMMC"""
+
+    def __init__(self, stream, delay):
+        self.stream = stream
+        self.delay = delay
+
+    def write(self, data):
+        time.sleep(self.delay)
+        return self.stream.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+@benchmark('scan.check_devices_with_logging')
+def bench_check_devices_with_logging(args, workdir):
+    root = os.path.join(workdir, 'sysfs')
+    make_fake_sysfs(root)
+    monitor = main.USBMonitor(queue.Queue(), queue.Queue())
+    monitor.sysfs_enumerator = main.SysfsUSBEnumerator(root)
+    delay = 0.002
+
+    # Previous setup: a FileHandler writing on the calling thread
+    sync_logger = logging.getLogger('bench.sync')
+    sync_logger.propagate = False
+    sync_logger.setLevel(logging.INFO)
+    file_handler = logging.FileHandler(os.path.join(workdir, 'sync.log'))
+    file_handler.stream = SlowStream(file_handler.stream, delay)
+    sync_logger.addHandler(file_handler)
+
+    async_logger = logging.getLogger('bench.async')
+    async_logger.propagate = False
+    listener = main.configure_logging(os.path.join(workdir, 'async.log'), target=async_logger, console=False)
+    listener.handlers[0].stream = SlowStream(listener.handlers[0].stream, delay)
+
+    def scan_and_log(target):
+        def run():
+            target.info(f"Device status: {monitor.check_devices()}")
+        return run
+
+    plain = summarize(measure(monitor.check_devices, args.iterations))
+    synchronous = summarize(measure(scan_and_log(sync_logger), args.iterations))
+    queued = summarize(measure(scan_and_log(async_logger), args.iterations))
+    main.stop_log_listener(listener)
+    file_handler.close()
+    result = dict(queued)
+    result['no_logging_p50_ms'] = plain['p50_ms']
+    result['sync_file_p50_ms'] = synchronous['p50_ms']
+    result['sync_file_p99_ms'] = synchronous['p99_ms']
+    result['write_delay_ms'] = delay * 1000
+    return result
+
+
+@benchmark('scan.poll_schedule')
+def bench_poll_schedule(args, workdir):
+    # One simulated hour of polling with a stable device set and one change in the middle
+    clock = FakeClock()
+    monitor = main.USBMonitor(queue.Queue(), queue.Queue())
+    scheduler = main.PollScheduler(monitor.monitoring_interval, monitor.max_monitoring_interval, clock=clock)
+    scan_time = 0.005
+    change_at = 1800.0
+    scans = 0
+    detection_latency = None
+    while clock.now < 3600:
+        clock.now += scheduler.timeout()
+        clock.now += scan_time
+        scans += 1
+        changed = detection_latency is None and clock.now >= change_at
+        if changed:
+            detection_latency = clock.now - change_at
+        scheduler.record_scan(changed)
+    # One simulated hour with an application running, monitor_loop hurries after every scan
+    busy_clock = FakeClock()
+    busy = main.PollScheduler(monitor.monitoring_interval, monitor.max_monitoring_interval, clock=busy_clock)
+    busy_scans = 0
+    while busy_clock.now < 3600:
+        busy_clock.now += busy.timeout() + scan_time
+        busy_scans += 1
+        busy.record_scan(False)
+        busy.hurry()
+    samples = measure(lambda: scheduler.record_scan(False), args.iterations)
+    result = summarize(samples)
+    result['scans_per_hour'] = float(scans)
+    result['busy_scans_per_hour'] = float(busy_scans)
+    result['fixed_1s_scans_per_hour'] = 3600.0
+    result['change_detection_s'] = detection_latency
+    result['worst_detection_s'] = scheduler.max_interval
+    return result
+
+
+@benchmark('scan.debounce_bouncing_trace')
+def bench_debounce_bouncing_trace(args, workdir):
+    clock = FakeClock()
+    debouncer = main.DeviceDebouncer(clock=clock)
+    connected = {'connected': True, 'count': 1, 'instances': ['/dev/bus/usb/001/004'], 'port': '1-1'}
+    disconnected = {'connected': False, 'count': 0, 'instances': []}
+    raw_changes = 0
+    published = []
+    flapping_since = None
+    flapping_s = 0.0
+    last_raw = last_status = None
+    # The trace flaps on purpose, keep the debouncer's "is flapping" warnings out of the report
+    logger_disabled = main.logger.disabled
+    main.logger.disabled = True
+    try:
+        # 30 simulated seconds of 50 ms scans
+        for step in range(600):
+            clock.now = step * 0.05
+            raw = bouncing_trace(clock.now)
+            raw_changes += last_raw is not None and raw != last_raw
+            last_raw = raw
+            status = debouncer.update({'4761': connected if raw else disconnected})['4761']
+            if last_status is not None and status['connected'] != last_status['connected']:
+                published.append((clock.now, status['connected']))
+            if status.get('flapping') and flapping_since is None:
+                flapping_since = clock.now
+            elif not status.get('flapping') and flapping_since is not None:
+                flapping_s += clock.now - flapping_since
+                flapping_since = None
+            last_status = status
+    finally:
+        main.logger.disabled = logger_disabled
+
+    if [state for _, state in published] != [False, True]:
+        return {'error': f"expected one detach after the bouncing and one attach, got {published}"}
+    if not 1.0 < flapping_s < 12.0:
+        return {'error': f"device flapped for {flapping_s:.2f}s"}
+
+    devices = dict((f'4761_{index}', connected) for index in range(16))
+    result = summarize(measure(lambda: debouncer.update(devices), args.iterations))
+    result['raw_transitions'] = float(raw_changes)
+    result['published_transitions'] = float(len(published))
+    result['flapping_s'] = flapping_s
+    result['attach_latency_s'] = published[1][0] - 20.0
+    return result
+
+
+@benchmark('scan.hotplug_replay')
+def bench_hotplug_replay(args, workdir):
+    if not hasattr(os, 'pipe') or main.IS_WINDOWS:
+        return {'skipped': "FakeHotplugListener needs selectable pipes"}
+    root = os.path.join(workdir, 'sysfs')
+    make_fake_sysfs(root, device_count=0)
+    device_queue = queue.Queue()
+    monitor = main.USBMonitor(device_queue, queue.Queue())
+    monitor.sysfs_enumerator = main.SysfsUSBEnumerator(root)
+    monitor.debouncer = main.DeviceDebouncer(settle_time=0.02, min_dwell=0.0, flap_threshold=1000)
+    listeners = []
+
+    def make_listener(device_ids):
+        listeners.append(FakeHotplugListener(device_ids))
+        return listeners[-1]
+
+    monitor.hotplug_factory = make_listener
+    monitor.start_monitoring()
+    attach, detach = [], []
+    try:
+        message_type, _ = device_queue.get(timeout=5)
+        if message_type != 'device_status' or not listeners:
+            return {'error': "monitor did not start on the fake hotplug listener"}
+        listener = listeners[0]
+        # Only events drive scans here, the safety rescan is a minute away
+        for _ in range(max(5, args.iterations // 20)):
+            write_fake_device(root, '1-5', '1809', '4761', 1, 10)
+            started = time.perf_counter()
+            listener.inject('add', 0x1809, 0x4761)
+            if not wait_for_delta(device_queue, 'device_attached', '4761'):
+                return {'error': "injected add did not attach 4761"}
+            attach.append(time.perf_counter() - started)
+
+            shutil.rmtree(os.path.join(root, '1-5'))
+            shutil.rmtree(os.path.join(root, '1-5:1.0'))
+            started = time.perf_counter()
+            listener.inject('remove', 0x1809, 0x4761)
+            if not wait_for_delta(device_queue, 'device_detached', '4761'):
+                return {'error': "injected remove did not detach 4761"}
+            detach.append(time.perf_counter() - started)
+
+        # Events of other devices do not trigger a scan
+        write_fake_device(root, '1-6', '1809', '4761', 1, 11)
+        listener.inject('add', 0x046d, 0xc001)
+        if wait_for_delta(device_queue, 'device_attached', '4761', timeout=0.3):
+            return {'error': "an unrelated device event triggered a rescan"}
+    finally:
+        monitor.stop_monitoring()
+    result = summarize(attach)
+    result['detach_p50_ms'] = summarize(detach)['p50_ms']
+    return result
+
+
+@benchmark('delivery.device_queue_to_handler')
+def bench_event_delivery(args, workdir):
+    main.load_tkinter()
+    root = main.tk.Tcl()
+    received = []
+    bridge = None
+
+    def handler():
+        while True:
+            try:
+                received.append(time.perf_counter() - bridge.get_nowait())
+            except queue.Empty:
+                return
+
+    bridge = main.TkEventBridge(root, handler)
+    count = args.iterations
+
+    def produce():
+        for _ in range(count):
+            bridge.put(time.perf_counter())
+            time.sleep(0.001)
+
+    producer = threading.Thread(target=produce)
+    producer.start()
+    deadline = time.monotonic() + 30
+    while len(received) < count and time.monotonic() < deadline:
+        root.tk.dooneevent(0)
+    producer.join()
+    bridge.close()
+    # Break the handler/bridge cycle, the Tcl interpreter must be freed here on the main
+    # thread and not by a garbage collection that happens to run on another thread
+    bridge = None
+    return summarize(received)
+
+
+def soak_channel(channel, blocked_seconds, rate=2000):
+    """Produce device deltas, samples and events while nobody consumes, then time the catch-up"""
+    stop = threading.Event()
+    produced = [0]
+
+    def produce():
+        statuses = [{'connected': False, 'count': 0, 'instances': []},
+                    {'connected': True, 'count': 1, 'instances': ['1-1']}]
+        for index in itertools.count():
+            if stop.is_set():
+                return
+            kind = index % 10
+            if kind < 7:
+                channel.put(('device_changed', (f'dev{index % 3}', statuses[index % 2], time.monotonic())))
+            elif kind < 9:
+                channel.put(('app_sample', 4242))
+            else:
+                channel.put(('app_finished', index))
+            produced[0] += 1
+            if index % 100 == 99:
+                time.sleep(100.0 / rate)
+
+    producer = threading.Thread(target=produce)
+    producer.start()
+    time.sleep(blocked_seconds)
+    stop.set()
+    producer.join()
+    backlog = channel.qsize()
+    device_status = {}
+    start = time.perf_counter()
+    while True:
+        try:
+            message_type, data = channel.get_nowait()
+        except queue.Empty:
+            break
+        main.apply_device_message(device_status, message_type, data)
+    return produced[0], backlog, time.perf_counter() - start
+
+
+@benchmark('delivery.soak_blocked_consumer')
+def bench_soak_blocked_consumer(args, workdir):
+    import resource
+    # Messages come out in put order and a change merged into a pending attach stays an attach
+    channel = main.CoalescingChannel(name='order')
+    attached = {'connected': True, 'count': 1, 'instances': ['1-1']}
+    changed = {'connected': True, 'count': 1, 'instances': ['1-2']}
+    channel.put(('device_attached', ('dev0', attached, 1.0)))
+    channel.put(('app_error', 'failed'))
+    channel.put(('device_changed', ('dev0', changed, 2.0)))
+    drained = [channel.get_nowait() for _ in range(channel.qsize())]
+    if drained != [('app_error', 'failed'), ('device_attached', ('dev0', changed, 1.0))]:
+        return {'error': f"channel delivered {drained}"}
+
+    short_seconds = max(args.soak_seconds / 10.0, 1.0)
+    channel = main.CoalescingChannel(max_events=1000, name='soak')
+    short_produced, short_backlog, short_catchup = soak_channel(channel, short_seconds)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    produced, backlog, catchup = soak_channel(channel, args.soak_seconds)
+    rss_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+    # Backlog is bounded by the event deque plus one pending state per device and pid
+    if backlog > channel.max_events + 4 or catchup > short_catchup * 3 + 0.005:
+        raise RuntimeError(f"backlog {short_backlog} -> {backlog}, catch-up {short_catchup * 1000:.2f} -> "
+                           f"{catchup * 1000:.2f} ms after blocking {short_seconds:.0f} s and {args.soak_seconds:.0f} s")
+    return {
+        'samples': 2,
+        'blocked_s': float(args.soak_seconds),
+        'messages_produced': produced,
+        'short_backlog': short_backlog,
+        'backlog': backlog,
+        'short_catchup_ms': short_catchup * 1000,
+        'catchup_ms': catchup * 1000,
+        'rss_growth_kb': float(rss_growth),
+        'dropped': channel.dropped,
+        'coalesced': channel.coalesced,
+    }
+
+
+@benchmark('launch.launch_application')
+def bench_launch(args, workdir):
+    child = make_child(workdir, 'true_child', 'exit 0')
+    core = main.MonitorCore()
+    launcher = main.ApplicationLauncher(core=core)
+    finished = threading.Event()
+    launcher.set_callback('finished', lambda exit_code: finished.set())
+    spawn_samples = []
+    lifetime_samples = []
+    for _ in range(max(10, args.iterations // 10)):
+        finished.clear()
+        start = time.perf_counter()
+        launcher.launch_application(child)
+        spawn_samples.append(time.perf_counter() - start)
+        finished.wait(10)
+        lifetime_samples.append(time.perf_counter() - start)
+    core.stop()
+    result = summarize(spawn_samples)
+    result['exit_detected_p50_ms'] = summarize(lifetime_samples)['p50_ms']
+    return result
+
+
+@benchmark('launch.output_throughput')
+def bench_output_throughput(args, workdir):
+    line_count = args.output_mb * 1024 * 1024 // 64
+    child = make_child(workdir, 'chatty_child',
+                       f'yes "{"x" * 62}" | head -n {line_count}')
+    launcher = main.ApplicationLauncher()
+    finished = threading.Event()
+    launcher.set_callback('finished', lambda exit_code: finished.set())
+    start = time.perf_counter()
+    launcher.launch_application(child)
+    finished.wait(600)
+    elapsed = time.perf_counter() - start
+    return {
+        'samples': 1,
+        'elapsed_s': elapsed,
+        'lines': line_count,
+        'throughput_mb_per_s': args.output_mb / elapsed,
+        'throughput_per_s': line_count / elapsed,
+    }
+
+
+@benchmark('launch.resource_sampler')
+def bench_resource_sampler(args, workdir):
+    if not main.ProcessSampler.available():
+        return {'skipped': 'no /proc'}
+    child = make_child(workdir, 'tree_child', 'sleep 30 & sleep 30 & sleep 30 & sleep 30 & wait')
+    process = subprocess.Popen([child])
+    core = main.MonitorCore()
+    sampler = main.ProcessSampler(core, interval=0.1)
+    try:
+        time.sleep(0.2)
+        probe = main.ProcessSampler(core)
+        probe.rings[process.pid] = main.ResourceRing()
+        sample_samples = measure(lambda: probe.sample(process.pid), args.iterations)
+        ring = sampler.watch(process.pid)
+        duration = 5.0
+        cpu_start = time.process_time()
+        time.sleep(duration)
+        overhead = (time.process_time() - cpu_start) / duration * 100
+        sampler.unwatch(process.pid)
+    finally:
+        process.kill()
+        process.wait()
+        core.stop()
+    result = summarize(sample_samples)
+    result['overhead_cpu_percent_at_10hz'] = overhead
+    result['ring_samples'] = ring.count
+    result['tree_size'] = 5
+    if overhead > 1.0:
+        raise RuntimeError(f"sampling at 10 Hz used {overhead:.2f}% CPU, budget is 1%")
+    return result
+
+
+def thread_nice_levels(pid):
+    """Nice level of every thread of a process, from /proc/<pid>/task/*/stat"""
+    levels = set()
+    for tid in os.listdir(f'/proc/{pid}/task'):
+        with open(f'/proc/{pid}/task/{tid}/stat') as f:
+            # Field 19, counted after the parenthesised command name
+            levels.add(int(f.read().rsplit(')', 1)[1].split()[16]))
+    return levels
+
+
+def scan_latency_under_load(monitor, launcher, burner, burner_count, duration, nice=0):
+    """Time check_devices while burner_count copies of burner run, returns the samples"""
+    for _ in range(burner_count):
+        launcher.launch_application(burner)
+    for pid in list(launcher.processes):
+        if thread_nice_levels(pid) != {nice}:
+            launcher.terminate_application()
+            raise RuntimeError(f"burner {pid} runs at nice {sorted(thread_nice_levels(pid))}, not {nice}")
+    samples = []
+    deadline = time.monotonic() + duration
+    try:
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            monitor.check_devices()
+            samples.append(time.perf_counter() - start)
+            # Scans are periodic, give the scheduler a chance to prefer the burners
+            time.sleep(0.01)
+    finally:
+        launcher.terminate_application()
+    return samples
+
+
+@benchmark('launch.policy_scan_latency')
+def bench_policy_scan_latency(args, workdir):
+    root = os.path.join(workdir, 'sysfs')
+    make_fake_sysfs(root)
+    monitor = main.USBMonitor(queue.Queue(), queue.Queue())
+    monitor.sysfs_enumerator = main.SysfsUSBEnumerator(root)
+    burner = make_child(workdir, 'burner', 'while :; do :; done')
+    burner_count = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+    launcher = main.ApplicationLauncher(max_processes=burner_count)
+    policy_file = os.path.join(workdir, 'launch_policies.json')
+    with open(policy_file, 'w') as f:
+        json.dump({'default': {}, 'executables': {'burner': {'nice': 19, 'ioprio_class': 'idle'}}}, f)
+
+    idle = summarize(measure(monitor.check_devices, args.iterations))
+    loaded = summarize(scan_latency_under_load(monitor, launcher, burner, burner_count, 3.0))
+    launcher.policies = main.LaunchPolicyStore(policy_file)
+    niced = summarize(scan_latency_under_load(monitor, launcher, burner, burner_count, 3.0, nice=19))
+    launcher.stop()
+    result = dict(niced)
+    result['idle_p99_ms'] = idle['p99_ms']
+    result['unniced_p50_ms'] = loaded['p50_ms']
+    result['unniced_p99_ms'] = loaded['p99_ms']
+    result['burners'] = burner_count
+    return result
+
+
+def counter_total(counter):
+    """Sum of a main.py counter over all label values"""
+    return sum(value for _, _, value in counter.samples())
+
+
+@benchmark('launch.stage_relaunch')
+def bench_stage_relaunch(args, workdir):
+    source = os.path.join(workdir, 'usb', 'tool')
+    os.makedirs(os.path.join(source, 'data'))
+    make_child(source, 'tool', 'exit 0')
+    for index in range(200):
+        with open(os.path.join(source, 'data', f'table{index}.bin'), 'wb') as f:
+            f.write(os.urandom(256 * 1024))
+    cache = main.StagingCache(os.path.join(workdir, 'stage_cache'))
+    executable = os.path.join(source, 'tool')
+
+    started = time.perf_counter()
+    key, staged_executable = cache.stage(source, executable)
+    first_ms = (time.perf_counter() - started) * 1000
+    cache.release(key)
+    staged_table = os.path.join(os.path.dirname(staged_executable), 'data', 'table0.bin')
+    if os.stat(staged_table).st_nlink != 1 or not os.access(staged_table, os.W_OK):
+        return {'error': "data files of the staged tree are not private writable copies"}
+    if os.stat(staged_executable).st_nlink < 2:
+        return {'error': "the staged executable is not linked to its object"}
+    copied = counter_total(main.STAGE_COPIED_BYTES)
+
+    def relaunch():
+        cache.release(cache.stage(source, executable)[0])
+
+    result = summarize(measure(relaunch, max(10, args.iterations // 10)))
+    if counter_total(main.STAGE_COPIED_BYTES) != copied:
+        return {'error': "relaunching an unchanged directory copied files again"}
+    result['first_stage_ms'] = first_ms
+    result['staged_mb'] = cache.size() / 1024 ** 2
+    return result
+
+
+def drop_file_cache(path):
+    """Evict a file from the page cache so the next read comes from storage"""
+    with open(path, 'rb') as f:
+        os.fsync(f.fileno())
+        os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
+
+@benchmark('launch.verify_large_file')
+def bench_verify_large_file(args, workdir):
+    if not hasattr(os, 'posix_fadvise'):
+        return {'skipped': "needs posix_fadvise to drop the page cache"}
+    path = os.path.join(workdir, 'big_tool')
+    chunk = os.urandom(1024 * 1024)
+    with open(path, 'wb') as f:
+        for _ in range(args.verify_mb):
+            f.write(chunk)
+    verifier = main.ExecutableVerifier(os.path.join(workdir, 'allowed_executables.json'),
+                                       os.path.join(workdir, 'hash_cache.json'))
+
+    drop_file_cache(path)
+    started = time.perf_counter()
+    digest = main.hash_file(path, chunk_size=64 * 1024)
+    small_buffer_s = time.perf_counter() - started
+
+    drop_file_cache(path)
+    progress = []
+    started = time.perf_counter()
+    if verifier.digest(path, lambda done, total: progress.append(done)) != digest:
+        return {'error': "digest differs between buffer sizes"}
+    cold_s = time.perf_counter() - started
+
+    with open(os.path.join(workdir, 'allowed_executables.json'), 'w') as f:
+        json.dump({'sha256': {digest: 'big_tool'}}, f)
+    if verifier.cached_digest(path) != digest:
+        return {'error': "digest was not cached"}
+    result = summarize(measure(lambda: verifier.verify(path), args.iterations))
+    if verifier.verify(path) != (True, digest):
+        return {'error': "allow-listed file was rejected"}
+
+    # Selection and launch of the same file at once must hash it once
+    def hash_count():
+        return next(value for name, _, value in main.EXECUTABLE_HASH_SECONDS.samples() if name.endswith('_count'))
+
+    hashes = hash_count()
+    concurrent = main.ExecutableVerifier(os.path.join(workdir, 'allowed_executables.json'))
+    threads = [threading.Thread(target=concurrent.verify, args=(path,)) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if hash_count() != hashes + 1:
+        return {'error': "concurrent verifications hashed the file twice"}
+    result['cold_hash_ms'] = cold_s * 1000
+    result['hash_mb_per_s'] = args.verify_mb / cold_s
+    result['small_buffer_mb_per_s'] = args.verify_mb / small_buffer_s
+    result['progress_updates'] = len(progress)
+    return result
+
+
+def time_to_first_output(launcher, executable):
+    """Launch executable and return the seconds until its first output line"""
+    first_line = threading.Event()
+    finished = threading.Event()
+    launcher.set_callback('output', lambda stream_name, line: first_line.set())
+    launcher.set_callback('finished', lambda exit_code: finished.set())
+    started = time.perf_counter()
+    if not launcher.launch_application(executable):
+        raise RuntimeError(f"cannot launch {executable}")
+    first_line.wait(30)
+    elapsed = time.perf_counter() - started
+    finished.wait(30)
+    return elapsed
+
+
+def python_startup_files(python):
+    """Module files (sources and cached bytecode) a python -S startup reads, as reported by python itself"""
+    script = ("import sys\n"
+              "for module in list(sys.modules.values()):\n"
+              "    for attribute in ('__file__', '__cached__'):\n"
+              "        print(getattr(module, attribute, None) or '')\n")
+    output = subprocess.run([python, '-S', '-c', script], stdout=subprocess.PIPE, universal_newlines=True).stdout
+    return sorted(set(path for path in output.splitlines() if path and os.path.isfile(path)))
+
+
+@benchmark('launch.prefetch_first_output')
+def bench_prefetch_first_output(args, workdir):
+    if not hasattr(os, 'posix_fadvise'):
+        return {'skipped': "needs posix_fadvise to drop the page cache"}
+    # A relocated copy of this Python with its shared libraries stands in for a tool on a stick
+    interpreter = os.path.realpath(sys.executable)
+    bin_dir = os.path.join(workdir, 'app', 'bin')
+    lib_dir = os.path.join(workdir, 'app', 'lib')
+    os.makedirs(bin_dir)
+    os.makedirs(lib_dir)
+    files = [shutil.copy2(interpreter, os.path.join(bin_dir, 'python'))]
+    for library in main.find_dependencies(interpreter)[1:]:
+        if not os.path.basename(library).startswith('ld-'):
+            files.append(shutil.copy2(library, lib_dir))
+    child = os.path.join(workdir, 'app', 'tool')
+    with open(child, 'w') as f:
+        f.write(f"#!{files[0]} -S\nprint('ready', flush=True)\n")
+    os.chmod(child, 0o755)
+    files.append(child)
+
+    old_library_path = os.environ.get('LD_LIBRARY_PATH')
+    os.environ['LD_LIBRARY_PATH'] = lib_dir
+    launcher = main.ApplicationLauncher()
+    try:
+        if len(main.find_dependencies(child)) < len(files):
+            return {'error': f"prefetch missed dependencies of {child}"}
+        # Everything the child reads starts cold, also the stdlib modules prefetching does not know about
+        stdlib_files = python_startup_files(files[0])
+        evicted = files + stdlib_files
+        cold, prefetched = [], []
+        for _ in range(5):
+            for path in evicted:
+                drop_file_cache(path)
+            cold.append(time_to_first_output(launcher, child))
+            for path in evicted:
+                drop_file_cache(path)
+            main.prefetch_executable(child)
+            # The operator takes a moment between selecting and pressing Launch
+            time.sleep(0.5)
+            prefetched.append(time_to_first_output(launcher, child))
+    finally:
+        launcher.stop()
+        if old_library_path is None:
+            os.environ.pop('LD_LIBRARY_PATH', None)
+        else:
+            os.environ['LD_LIBRARY_PATH'] = old_library_path
+    result = summarize(prefetched)
+    result['cold_p50_ms'] = summarize(cold)['p50_ms']
+    result['prefetched_mb'] = sum(os.path.getsize(path) for path in files) / 1024 ** 2
+    result['stdlib_files'] = float(len(stdlib_files))
+    return result
+
+
+def make_file_tree(root, file_count, files_per_directory=100):
+    """Synthetic tree with one executable per directory"""
+    for index in range(file_count):
+        directory = os.path.join(root, f'd{index // (files_per_directory * 10)}',
+                                 f's{index // files_per_directory}')
+        if index % files_per_directory == 0:
+            os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'f{index}')
+        with open(path, 'w'):
+            pass
+        if index % files_per_directory == 0:
+            os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+
+
+def rglob_walk(directory):
+    """The executable search used before ExecutableScanner"""
+    executables = []
+    for file_path in Path(directory).rglob('*'):
+        if file_path.is_file() and os.access(file_path, os.X_OK):
+            executables.append(str(file_path))
+    return executables
+
+
+@benchmark('discovery.executable_scan')
+def bench_discovery(args, workdir):
+    root = os.path.join(workdir, 'tree')
+    make_file_tree(root, args.tree_files)
+    scanner_samples = measure(lambda: list(main.ExecutableScanner(root, max_entries=10 ** 9).walk()), 3, warmup=1)
+    rglob_samples = measure(lambda: rglob_walk(root), 3, warmup=1)
+    cache = main.ExecutableIndexCache(os.path.join(workdir, 'index.json'))
+    list(main.ExecutableScanner(root, max_entries=10 ** 9, cache=cache).walk())
+    cached_samples = measure(lambda: list(main.ExecutableScanner(root, max_entries=10 ** 9, cache=cache).walk()),
+                             3, warmup=0)
+    result = summarize(scanner_samples, args.tree_files)
+    result['rglob_p50_ms'] = summarize(rglob_samples)['p50_ms']
+    result['cached_p50_ms'] = summarize(cached_samples)['p50_ms']
+    result['files'] = args.tree_files
+    return result
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_importtime(stderr):
+    """Parse -X importtime output into {module: (self_us, cumulative_us)}"""
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        timings[fields[2].strip()] = (int(fields[0]), int(fields[1]))
+    return timings
+
+
+@benchmark('startup.import_main')
+def bench_import_main(args, workdir):
+    env = dict(os.environ, PYTHONPATH=HERE)
+    samples = []
+    slowest = {}
+    for _ in range(min(args.iterations, 20)):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import main'], cwd=workdir, env=env,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        timings = parse_importtime(result.stderr)
+        if 'main' not in timings:
+            return {'skipped': '-X importtime needs Python 3.7+'}
+        samples.append(timings['main'][1] / 1e6)
+        for module, (self_us, _) in timings.items():
+            slowest[module] = max(slowest.get(module, 0), self_us)
+    result = summarize(samples)
+    result['tk_imported'] = 'tkinter' in timings
+    result['slowest_imports_us'] = dict(sorted(slowest.items(), key=lambda item: -item[1])[:10])
+    return result
+
+
+# Started as a fresh interpreter: what run_gui does, plus a report when the root window is first mapped
+FIRST_FRAME_SCRIPT = """
+import time
+import main
+main.init_logging()
+main.init_data_directories()
+main.load_tkinter()
+root = main.tk.Tk()
+app = main.DeviceMonitorGUI(root)
+
+def first_frame(event):
+    if event.widget is root:
+        print(f"first-frame {time.monotonic():.6f}", flush=True)
+        root.after(0, app.on_closing)
+
+root.bind('<Map>', first_frame)
+root.mainloop()
+"""
+
+
+@benchmark('startup.first_frame')
+def bench_first_frame(args, workdir):
+    if not sys.platform.startswith('win') and not os.environ.get('DISPLAY'):
+        return {'skipped': 'no display'}
+    env = dict(os.environ, PYTHONPATH=HERE)
+    samples = []
+    for _ in range(min(args.iterations, 5)):
+        started = time.monotonic()
+        child = subprocess.Popen([sys.executable, '-c', FIRST_FRAME_SCRIPT], cwd=workdir, env=env,
+                                 stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True)
+        try:
+            for line in child.stdout:
+                if line.startswith('first-frame '):
+                    samples.append(float(line.split()[1]) - started)
+                    break
+            else:
+                raise RuntimeError(f"GUI exited with {child.wait()} before drawing a frame")
+        finally:
+            child.stdout.close()
+            child.wait(30)
+    return summarize(samples)
+
+
+def compare(results, baseline, tolerance):
+    """Print regressions of p50 latency against a baseline, returns True if any"""
+    regressed = False
+    for name, result in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous or 'p50_ms' not in result or not previous.get('p50_ms'):
+            continue
+        change = (result['p50_ms'] - previous['p50_ms']) / previous['p50_ms']
+        marker = ''
+        if change > tolerance:
+            marker = '  REGRESSION'
+            regressed = True
+        print(f"{name:40s} p50 {previous['p50_ms']:9.3f} -> {result['p50_ms']:9.3f} ms ({change:+.0%}){marker}")
+    return regressed
+
+
+def main_benchmarks(argv=None):
+    parser = argparse.ArgumentParser(description="Device Monitor benchmarks")
+    parser.add_argument('--iterations', type=int, default=200, help="iterations for the fast benchmarks")
+    parser.add_argument('--tree-files', type=int, default=100000, help="files in the synthetic discovery tree")
+    parser.add_argument('--output-mb', type=int, default=200, help="MB written by the output throughput child")
+    parser.add_argument('--verify-mb', type=int, default=400, help="MB of the file hashed by launch.verify_large_file")
+    parser.add_argument('--soak-seconds', type=float, default=120.0,
+                        help="seconds the soak benchmark keeps the consumer blocked")
+    parser.add_argument('--filter', default='', help="only run benchmarks whose name contains this text")
+    parser.add_argument('--output', help="write results as JSON to this file")
+    parser.add_argument('--baseline', help="compare against a JSON file written with --output")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="allowed p50 slowdown against the baseline (default 0.25)")
+    parser.add_argument('--verbose', action='store_true', help="show the application's INFO log lines")
+    args = parser.parse_args(argv)
+    if not args.verbose:
+        main.logger.setLevel(logging.WARNING)
+
+    results = {}
+    for name, func in BENCHMARKS:
+        if args.filter not in name:
+            continue
+        workdir = tempfile.mkdtemp(prefix='guard-bench-')
+        try:
+            results[name] = func(args, workdir)
+        except Exception as e:
+            results[name] = {'error': str(e)}
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        result = results[name]
+        if 'error' in result:
+            print(f"{name:40s} ERROR {result['error']}")
+        elif 'skipped' in result:
+            print(f"{name:40s} skipped ({result['skipped']})")
+        else:
+            standard = ('p50_ms', 'p99_ms', 'mean_ms', 'throughput_per_s')
+            line = f"{name:40s}"
+            if 'p50_ms' in result:
+                line += (f" p50 {result['p50_ms']:9.3f} ms  p99 {result['p99_ms']:9.3f} ms  "
+                         f"{result['throughput_per_s']:12.1f}/s")
+            extras = [f"{key} {value:.3f}" for key, value in sorted(result.items())
+                      if isinstance(value, float) and key not in standard]
+            if extras:
+                line += "  " + "  ".join(extras)
+            print(line)
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_benchmarks())
@@ -7,427 +7,1782 @@ Compatible with RHEL 7.9, RHEL 9.x, Windows 10/11
 Cross-platform support using threading
 """
 
-import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
 import threading
-import subprocess
 import os
 import time
 import queue
 import logging
-from pathlib import Path
-import json
+import logging.handlers
 import sys
 import re
+import errno
+import select
+import stat
+import struct
+from collections import namedtuple, deque, OrderedDict
+from array import array
+import itertools
+import argparse
+import atexit
+import fnmatch
+import importlib
+import signal
 
-# Platform detection
-IS_WINDOWS = sys.platform.startswith('win')
-IS_LINUX = sys.platform.startswith('linux')
 
-# Windows-specific imports
-if IS_WINDOWS:
-    try:
-        import wmi
-        WMI_AVAILABLE = True
-    except ImportError:
-        WMI_AVAILABLE = False
-        
-    try:
-        import ctypes
-        CTYPES_AVAILABLE = True
-    except ImportError:
-        CTYPES_AVAILABLE = False
-else:
-    WMI_AVAILABLE = False
-    CTYPES_AVAILABLE = False
-
-# Configure logging with platform-appropriate log file location
-if IS_WINDOWS:
-    log_dir = os.path.join(os.environ.get('APPDATA', '.'), 'GUARD')
-    os.makedirs(log_dir, exist_ok=True)
-    log_file = os.path.join(log_dir, 'device_monitor.log')
-else:
-    log_file = 'device_monitor.log'
-
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_file),
-        logging.StreamHandler()
-    ]
-)
-logger = logging.getLogger(__name__)
+class LazyModule:
+    """Module stand-in that imports the real module on first attribute access.
 
+    Keeps slow or platform specific imports (asyncio, subprocess, wmi, ...)
+    off the startup path. PyInstaller cannot see these imports, so the build
+    lists them with --hidden-import.
+    """
 
-class USBMonitor:
-    """USB Device Monitor with threading support"""
-    
-    def __init__(self, device_queue, control_queue):
-        self.device_queue = device_queue
-        self.control_queue = control_queue
-        self.known_devices = {
-            "4750": "1809:4750",
-            "4761": "1809:4761", 
-            "4761_1": "1809:4761"
-        }
-        self.running = False
-        self.paused = False
-        self.monitoring_interval = 1.0
-        self.monitor_thread = None
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._error = None
         self._lock = threading.Lock()
-    
-    def is_device_connected(self, vendor_id, product_id, device_index=1):
-        """Check if a specific USB device is connected (cross-platform)"""
-        if IS_WINDOWS:
-            return self._is_device_connected_windows(vendor_id, product_id, device_index)
-        else:
-            return self._is_device_connected_linux(vendor_id, product_id, device_index)
-    
-    def _is_device_connected_linux(self, vendor_id, product_id, device_index=1):
-        """Check USB device on Linux using lsusb"""
-        try:
-            result = subprocess.run(['lsusb'], 
-                                  stdout=subprocess.PIPE, 
-                                  stderr=subprocess.PIPE, 
-                                  timeout=10)
-            if result.returncode != 0:
-                return False
-                
-            stdout_str = result.stdout.decode('utf-8', errors='ignore')
-            lines = stdout_str.strip().split('\n')
-            current_index = 0
-            
-            for line in lines:
-                if vendor_id.lower() in line.lower() and product_id.lower() in line.lower():
-                    current_index += 1
-                    if current_index == device_index:
-                        return True
-            return False
-            
-        except (subprocess.TimeoutExpired, subprocess.SubprocessError) as e:
-            logger.error(f"USB detection error (Linux): {e}")
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def available(self):
+        """Import the module if needed, returns False if it is not installed"""
+        if self._module is not None:
+            return True
+        if self._error is not None:
             return False
-    
-    def _is_device_connected_windows(self, vendor_id, product_id, device_index=1):
-        """Check USB device on Windows using WMI or wmic"""
         try:
-            # Try WMI first if available
-            if WMI_AVAILABLE:
-                c = wmi.WMI()
-                usb_devices = c.Win32_USBControllerDevice()
-                current_index = 0
-                for device in usb_devices:
-                    device_id = device.Dependent.DeviceID.upper()
-                    vid_pid = f"VID_{vendor_id.upper()}&PID_{product_id.upper()}"
-                    if vid_pid in device_id:
-                        current_index += 1
-                        if current_index == device_index:
-                            return True
-                return False
-            else:
-                # Fallback to wmic command
-                result = subprocess.run(
-                    ['wmic', 'path', 'Win32_USBControllerDevice', 'get', 'Dependent'],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    timeout=10,
-                    creationflags=subprocess.CREATE_NO_WINDOW if hasattr(subprocess, 'CREATE_NO_WINDOW') else 0
-                )
-                if result.returncode != 0:
-                    return False
-                
-                stdout_str = result.stdout.decode('utf-8', errors='ignore')
-                vid_pid = f"VID_{vendor_id.upper()}&PID_{product_id.upper()}"
-                current_index = stdout_str.upper().count(vid_pid)
-                return current_index >= device_index
-                
-        except Exception as e:
-            logger.error(f"USB detection error (Windows): {e}")
+            self._load()
+            return True
+        except ImportError as e:
+            self._error = e
             return False
-    
-    def get_4761_device_paths(self):
-        """Detect all USB-4761 device paths (cross-platform)"""
-        if IS_WINDOWS:
-            return self._get_4761_device_paths_windows()
-        else:
-            return self._get_4761_device_paths_linux()
-    
-    def _get_4761_device_paths_linux(self):
-        """Detect USB-4761 device paths on Linux using lsusb"""
-        try:
-            result = subprocess.run(['lsusb'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=10)
-            if result.returncode != 0:
-                return []
-            
-            stdout_str = result.stdout.decode('utf-8', errors='ignore')
-            lines = stdout_str.strip().split('\n')
-            device_paths = []
-            for line in lines:
-                if 'ID 1809:4761' in line:
-                    parts = line.split()
-                    bus = parts[1]
-                    device = parts[3].replace(':', '')
-                    device_paths.append(f'/dev/bus/usb/{bus}/{device}')
-            return device_paths
-        except Exception as e:
-            logger.error(f"Error detecting 4761 devices (Linux): {e}")
-            return []
-    
-    def _get_4761_device_paths_windows(self):
-        """Detect USB-4761 device paths on Windows"""
-        try:
-            device_paths = []
-            if WMI_AVAILABLE:
-                c = wmi.WMI()
-                usb_devices = c.Win32_USBControllerDevice()
-                for device in usb_devices:
-                    device_id = device.Dependent.DeviceID.upper()
-                    if 'VID_1809&PID_4761' in device_id:
-                        device_paths.append(device_id)
-            else:
-                # Fallback to wmic command
-                result = subprocess.run(
-                    ['wmic', 'path', 'Win32_USBControllerDevice', 'get', 'Dependent'],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    timeout=10,
-                    creationflags=subprocess.CREATE_NO_WINDOW if hasattr(subprocess, 'CREATE_NO_WINDOW') else 0
-                )
-                if result.returncode == 0:
-                    lines = result.stdout.decode('utf-8', errors='ignore').split('\n')
-                    for line in lines:
-                        if 'VID_1809&PID_4761' in line.upper():
-                            device_paths.append(line.strip())
-            return device_paths
-        except Exception as e:
-            logger.error(f"Error detecting 4761 devices (Windows): {e}")
-            return []
 
-    def check_devices(self):
-        """Check all known devices and report status, dynamically mapping 4761 cards."""
-        device_status = {
-            "4750": {'connected': False, 'count': 0, 'instances': []},
-            "4761": {'connected': False, 'count': 0, 'instances': []},
-            "4761_1": {'connected': False, 'count': 0, 'instances': []}
-        }
+    def __getattr__(self, attribute):
+        return getattr(self._load(), attribute)
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f"<LazyModule {self._name!r} ({state})>"
+
+
+asyncio = LazyModule('asyncio')
+futures = LazyModule('concurrent.futures')
+json = LazyModule('json')
+socket = LazyModule('socket')
+socketserver = LazyModule('socketserver')
+subprocess = LazyModule('subprocess')
+hashlib = LazyModule('hashlib')
+shutil = LazyModule('shutil')
+
+# Windows-only modules, wmi in particular is slow to import (COM setup)
+wmi = LazyModule('wmi')
+ctypes = LazyModule('ctypes')
+
+# tkinter is only loaded for the GUI (see load_tkinter), the daemon never imports it
+tk = None
+ttk = LazyModule('tkinter.ttk')
+messagebox = LazyModule('tkinter.messagebox')
+filedialog = LazyModule('tkinter.filedialog')
+
+# Platform detection
+IS_WINDOWS = sys.platform.startswith('win')
+IS_LINUX = sys.platform.startswith('linux')
 
-        # Check 4750
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+# kind -> (override variable, directory as root, XDG base variable, XDG default below the home directory)
+GUARD_DIRECTORIES = {
+    'log': ('GUARD_LOG_DIR', '/var/log/guard', 'XDG_STATE_HOME', ('.local', 'state')),
+    'config': ('GUARD_CONFIG_DIR', '/etc/guard', 'XDG_CONFIG_HOME', ('.config',)),
+    'state': ('GUARD_STATE_DIR', '/var/lib/guard', 'XDG_STATE_HOME', ('.local', 'state')),
+    'cache': ('GUARD_CACHE_DIR', '/var/cache/guard', 'XDG_CACHE_HOME', ('.cache',)),
+}
+
+
+def guard_directory(kind):
+    """Absolute per-platform directory for 'log', 'config' (allow-list, policies), 'state' or 'cache' files"""
+    override_variable, root_directory, xdg_variable, xdg_default = GUARD_DIRECTORIES[kind]
+    override = os.environ.get(override_variable)
+    if override:
+        return os.path.abspath(override)
+    if IS_WINDOWS:
+        base = os.environ.get('LOCALAPPDATA' if kind == 'cache' else 'APPDATA') or os.path.expanduser('~')
+        return os.path.join(base, 'GUARD')
+    if hasattr(os, 'geteuid') and os.geteuid() == 0:
+        return root_directory
+    base = os.environ.get(xdg_variable) or os.path.join(os.path.expanduser('~'), *xdg_default)
+    return os.path.join(base, 'guard')
+
+
+def default_log_dir():
+    """Absolute per-platform directory for the log and application output"""
+    return guard_directory('log')
+
+
+class CompressingRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Log file rotated by size and at midnight, rotated segments are gzipped"""
+
+    def __init__(self, filename, max_bytes=10 * 1024 * 1024, backup_count=10, rotate_daily=True):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+        self.rotate_daily = rotate_daily
+        self._day = time.strftime('%Y-%m-%d')
+        self.namer = self.gzip_name
+        self.rotator = self.gzip_rotate
+
+    @staticmethod
+    def gzip_name(name):
+        return name + '.gz'
+
+    @staticmethod
+    def gzip_rotate(source, dest):
+        import gzip
+        import shutil
+        with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        os.remove(source)
+
+    def shouldRollover(self, record):
+        if self.rotate_daily and time.strftime('%Y-%m-%d', time.localtime(record.created)) != self._day:
+            return 1
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        self._day = time.strftime('%Y-%m-%d')
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
         try:
-            vendor_id, product_id = self.known_devices["4750"].split(":")
-            connected = self.is_device_connected(vendor_id, product_id)
-            if connected:
-                device_status["4750"] = {
-                    'connected': True,
-                    'count': 1,
-                    'instances': [1]
-                }
-        except Exception as e:
-            logger.error(f"Error checking device 4750: {e}")
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            LOG_RECORDS_DROPPED.inc()
+
+
+def configure_logging(log_file, target=None, console=True, level=logging.INFO, max_queued=10000):
+    """Route records of target (the root logger by default) through a queue to a writer thread.
+
+    Emitting a record only formats and queues it, the rotating log file and the
+    console are written on the QueueListener's thread. Returns the listener,
+    which is flushed and stopped at exit.
+    """
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [CompressingRotatingFileHandler(log_file)]
+    # --noconsole builds have no stderr
+    if console and sys.stderr is not None:
+        handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    log_queue = queue.Queue(maxsize=max_queued)
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    target = target if target is not None else logging.getLogger()
+    target.setLevel(level)
+    target.addHandler(DroppingQueueHandler(log_queue))
+    listener.start()
+    atexit.register(stop_log_listener, listener)
+    return listener
+
+
+def stop_log_listener(listener):
+    """Flush queued records and stop the writer thread, does nothing if it is already stopped"""
+    if getattr(listener, '_thread', None) is not None:
+        listener.stop()
+
+
+# Set by init_logging() from main(), importing the module neither creates directories nor starts threads
+log_file = None
+log_listener = None
+logger = logging.getLogger(__name__)
+
+
+def init_logging():
+    """Log to the platform's log directory, falling back to the current directory"""
+    global log_file, log_listener
+    log_dir = default_log_dir()
+    try:
+        os.makedirs(log_dir, exist_ok=True)
+    except OSError:
+        log_dir = os.path.abspath('.')
+    log_file = os.path.join(log_dir, 'device_monitor.log')
+    log_listener = configure_logging(log_file)
 
-        # Dynamically map 4761 devices
+
+def init_data_directories():
+    """Create the state and cache directories, the config directory belongs to the administrator"""
+    for kind in ('state', 'cache'):
         try:
-            paths_4761 = self.get_4761_device_paths()
-            for idx, path in enumerate(paths_4761):
-                if idx == 0:
-                    logical_name = "4761"
-                elif idx == 1:
-                    logical_name = "4761_1"
-                else:
-                    continue  # Support up to two 4761 devices
+            os.makedirs(guard_directory(kind), exist_ok=True)
+        except OSError as e:
+            logger.warning(f"Cannot create {kind} directory {guard_directory(kind)}: {e}")
 
-                device_status[logical_name] = {
-                    'connected': True,
-                    'count': 1,
-                    'instances': [path],
-                }
-        except Exception as e:
-            logger.error(f"Error checking 4761 devices: {e}")
 
-        return device_status
-    
-    def start_monitoring(self):
-        """Start the monitoring thread"""
+def default_socket_path():
+    """Daemon socket path: /run/guard as root, $XDG_RUNTIME_DIR or a private temp directory otherwise"""
+    if hasattr(os, 'geteuid') and os.geteuid() == 0:
+        # RUNTIME_DIRECTORY is set by systemd's RuntimeDirectory=
+        return os.path.join(os.environ.get('RUNTIME_DIRECTORY') or '/run/guard', 'device-monitor.sock')
+    if os.environ.get('XDG_RUNTIME_DIR'):
+        return os.path.join(os.environ['XDG_RUNTIME_DIR'], 'guard-device-monitor.sock')
+    user = os.getuid() if hasattr(os, 'getuid') else 'user'
+    return os.path.join(os.environ.get('TMPDIR') or '/tmp', f'guard-{user}', 'device-monitor.sock')
+
+
+DEFAULT_SOCKET_PATH = default_socket_path()
+
+
+class Metric:
+    """Base class of registry metrics, values are kept per label tuple"""
+
+    metric_type = 'untyped'
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+
+    def samples(self):
+        """Yield (sample_name, labels_dict, value) for the exposition formats"""
         with self._lock:
-            if self.running:
-                logger.warning("Monitor is already running")
-                return False
-            
-            self.running = True
-            self.paused = False
-            self.monitor_thread = threading.Thread(target=self.monitor_loop, daemon=True)
-            self.monitor_thread.start()
-            logger.info("USB Monitor started")
-            return True
-    
-    def stop_monitoring(self):
-        """Stop the monitoring thread"""
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, dict(zip(self.label_names, key)), value
+
+
+class Counter(Metric):
+    metric_type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
         with self._lock:
-            if not self.running:
-                return
-            
-            self.running = False
-            
-        # Send stop command to ensure quick shutdown
-        try:
-            self.control_queue.put('stop', timeout=1)
-        except queue.Full:
-            pass
-        
-        # Wait for thread to finish
-        if self.monitor_thread and self.monitor_thread.is_alive():
-            self.monitor_thread.join(timeout=5)
-            if self.monitor_thread.is_alive():
-                logger.warning("Monitor thread did not stop gracefully")
-        
-        logger.info("USB Monitor stopped")
-    
-    def pause_monitoring(self):
-        """Pause monitoring without stopping the thread"""
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    metric_type = 'gauge'
+
+    def __init__(self, name, help_text, label_names=()):
+        super().__init__(name, help_text, label_names)
+        self._functions = {}
+
+    def set(self, value, **labels):
         with self._lock:
-            if self.running:
-                self.paused = True
-                try:
-                    self.control_queue.put('pause', timeout=1)
-                except queue.Full:
-                    pass
-                logger.info("USB Monitor paused")
-    
-    def resume_monitoring(self):
-        """Resume monitoring"""
+            self._values[self._key(labels)] = value
+
+    def set_function(self, func, **labels):
+        """Read the gauge from func() at collection time"""
         with self._lock:
-            if self.running:
-                self.paused = False
-                try:
-                    self.control_queue.put('resume', timeout=1)
-                except queue.Full:
-                    pass
-                logger.info("USB Monitor resumed")
-    
-    def monitor_loop(self):
-        """Main monitoring loop running in separate thread"""
-        logger.info("USB Monitor thread started")
-        
-        while self.running:
+            self._functions[self._key(labels)] = func
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+            functions = list(self._functions.items())
+        for key, func in functions:
             try:
-                # Check for control commands
-                try:
-                    command = self.control_queue.get_nowait()
-                    if command == 'stop':
-                        break
-                    elif command == 'pause':
-                        self.paused = True
-                    elif command == 'resume':
-                        self.paused = False
-                except queue.Empty:
-                    pass
-                
-                # Skip device checking if paused
-                if self.paused:
-                    time.sleep(0.5)
-                    continue
-                
-                # Check devices
-                device_status = self.check_devices()
-                
-                # Send status to main thread
-                try:
-                    self.device_queue.put(('device_status', device_status), timeout=1)
-                except queue.Full:
-                    logger.warning("Device queue full, skipping update")
-                
-                time.sleep(self.monitoring_interval)
-                
+                items.append((key, func()))
             except Exception as e:
-                logger.error(f"Monitor loop error: {e}")
-                try:
-                    self.device_queue.put(('error', str(e)), timeout=1)
-                except queue.Full:
-                    pass
-                time.sleep(5)  # Wait before retrying
-        
-        logger.info("USB Monitor thread stopped")
-    
-    def is_running(self):
-        """Check if monitor is running"""
+                logger.debug(f"Gauge {self.name} callback failed: {e}")
+        for key, value in items:
+            yield self.name, dict(zip(self.label_names, key)), value
+
+
+class Histogram(Metric):
+    metric_type = 'histogram'
+
+    DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 60.0)
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+
+    def observe(self, value):
         with self._lock:
-            return self.running and self.monitor_thread and self.monitor_thread.is_alive()
-    
-    def is_paused(self):
-        """Check if monitor is paused"""
+            index = len(self.buckets)
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    index = position
+                    break
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def samples(self):
         with self._lock:
-            return self.paused
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += bucket_count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            yield f"{self.name}_bucket", {'le': le}, cumulative
+        yield f"{self.name}_sum", {}, total
+        yield f"{self.name}_count", {}, count
 
 
-class SystemController:
-    """System control operations with proper privilege handling (cross-platform)"""
-    
+class MetricsRegistry:
+    """In-process metrics rendered in the Prometheus text format or as JSON"""
+
+    def __init__(self):
+        self._metrics = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help_text, label_names=()):
+        return self._register(Counter(name, help_text, label_names))
+
+    def gauge(self, name, help_text, label_names=()):
+        return self._register(Gauge(name, help_text, label_names))
+
+    def histogram(self, name, help_text, buckets=Histogram.DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, buckets))
+
     @staticmethod
-    def check_sudo_available():
-        """Check if sudo is available (Linux only)"""
-        if IS_WINDOWS:
-            return False
-        try:
-            result = subprocess.run(['which', 'sudo'], 
-                                  stdout=subprocess.PIPE, 
-                                  stderr=subprocess.PIPE, 
-                                  timeout=5)
-            return result.returncode == 0
-        except subprocess.SubprocessError:
+    def _format_labels(labels):
+        if not labels:
+            return ''
+        escaped = (
+            f'{key}="' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+            for key, value in labels.items()
+        )
+        return '{' + ','.join(escaped) + '}'
+
+    def render_prometheus(self):
+        """Return all metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+            for sample_name, labels, value in metric.samples():
+                lines.append(f"{sample_name}{self._format_labels(labels)} {float(value)!r}")
+        return '\n'.join(lines) + '\n'
+
+    def to_dict(self):
+        """Return all metrics as a JSON-serialisable dict"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        result = {}
+        for metric in metrics:
+            result[metric.name] = {
+                'type': metric.metric_type,
+                'help': metric.help_text,
+                'samples': [{'name': sample_name, 'labels': labels, 'value': value}
+                            for sample_name, labels, value in metric.samples()]
+            }
+        return result
+
+    def write_textfile(self, path):
+        """Atomically write the Prometheus rendering for node_exporter's textfile collector"""
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render_prometheus())
+        os.replace(temp_path, path)
+
+    def write_json(self, path):
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'timestamp': time.time(), 'metrics': self.to_dict()}, f, indent=2)
+        os.replace(temp_path, path)
+
+
+class MetricsTextfileExporter:
+    """Background thread rewriting a Prometheus textfile at a fixed interval"""
+
+    def __init__(self, registry, path, interval=15.0):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='metrics-exporter', daemon=True)
+        self._thread.start()
+        logger.info(f"Writing metrics to {self.path} every {self.interval:g} s")
+
+    def _run(self):
+        while True:
+            try:
+                self.registry.write_textfile(self.path)
+            except OSError as e:
+                logger.warning(f"Cannot write metrics textfile {self.path}: {e}")
+            if self._stop_event.wait(self.interval):
+                return
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        try:
+            self.registry.write_textfile(self.path)
+        except OSError:
+            pass
+
+
+METRICS = MetricsRegistry()
+CHECK_DEVICES_SECONDS = METRICS.histogram(
+    'guard_check_devices_seconds', "Duration of USBMonitor.check_devices")
+BACKEND_ERRORS = METRICS.counter(
+    'guard_backend_errors_total', "Errors of the device detection backends", ('backend',))
+CHANNEL_DROPPED = METRICS.counter(
+    'guard_channel_dropped_total', "Discrete events dropped because a device queue was full", ('channel',))
+CHANNEL_COALESCED = METRICS.counter(
+    'guard_channel_coalesced_total', "Pending state messages replaced by a newer one", ('channel',))
+DEVICE_FLAPS = METRICS.counter(
+    'guard_device_flaps_total', "Connected state changes seen by the debouncer", ('device',))
+MONITOR_WAKEUPS = METRICS.counter(
+    'guard_monitor_wakeups_total', "Times the device monitor loop went to sleep and woke up again")
+DEVICE_QUEUE_DEPTH = METRICS.gauge(
+    'guard_device_queue_depth', "Messages waiting in the device queue")
+DEVICE_QUEUE_OLDEST_AGE = METRICS.gauge(
+    'guard_device_queue_oldest_age_seconds', "Age of the oldest undelivered device queue message")
+ATTACH_TO_RECOLOR_SECONDS = METRICS.histogram(
+    'guard_attach_to_recolor_seconds', "Time from detecting a USB attach to recoloring its button")
+APP_SPAWN_SECONDS = METRICS.histogram(
+    'guard_app_spawn_seconds', "Time taken to spawn a launched application")
+APP_LIFETIME_SECONDS = METRICS.histogram(
+    'guard_app_lifetime_seconds', "Lifetime of launched applications",
+    buckets=(1.0, 10.0, 60.0, 300.0, 900.0, 3600.0, 4 * 3600.0, 24 * 3600.0))
+STAGE_SECONDS = METRICS.histogram(
+    'guard_stage_seconds', "Time taken to stage an application directory to local disk",
+    buckets=(0.01, 0.1, 0.5, 1.0, 5.0, 30.0, 120.0, 600.0))
+STAGE_COPIED_BYTES = METRICS.counter(
+    'guard_stage_copied_bytes_total', "Bytes copied from removable media into the staging cache")
+PREFETCH_BYTES = METRICS.counter(
+    'guard_prefetch_bytes_total', "Bytes of selected executables and their libraries prefetched into the page cache")
+EXECUTABLE_HASH_SECONDS = METRICS.histogram(
+    'guard_executable_hash_seconds', "Time taken to hash an executable that was not in the hash cache",
+    buckets=(0.01, 0.1, 0.5, 1.0, 5.0, 30.0, 120.0))
+LOG_RECORDS_DROPPED = METRICS.counter(
+    'guard_log_records_dropped_total', "Log records dropped because the log writer queue was full")
+
+
+def load_tkinter():
+    """Import tkinter into the module namespace for the GUI, dialogs load on first use"""
+    global tk
+    import tkinter
+    tk = tkinter
+
+
+SYSFS_USB_DEVICES = '/sys/bus/usb/devices'
+
+
+class USBDeviceRecord(namedtuple('USBDeviceRecord', 'vendor_id product_id busnum devnum sysfs_name')):
+    """USB device attributes as read from sysfs"""
+
+    __slots__ = ()
+
+    @property
+    def device_id(self):
+        return f"{self.vendor_id}:{self.product_id}"
+
+    @property
+    def dev_path(self):
+        return f"/dev/bus/usb/{self.busnum:03d}/{self.devnum:03d}"
+
+
+class SysfsUSBEnumerator:
+    """In-process USB device enumeration from sysfs (Linux only)"""
+
+    def __init__(self, sysfs_root=SYSFS_USB_DEVICES):
+        self.sysfs_root = sysfs_root
+
+    def available(self):
+        """Check if the sysfs USB device tree exists"""
+        return os.path.isdir(self.sysfs_root)
+
+    def enumerate(self):
+        """Return a USBDeviceRecord for every USB device, ordered by bus and device number"""
+        records = []
+        try:
+            entries = list(os.scandir(self.sysfs_root))
+        except OSError as e:
+            logger.error(f"Error reading {self.sysfs_root}: {e}")
+            BACKEND_ERRORS.inc(backend='sysfs')
+            return records
+
+        for entry in entries:
+            # Interfaces ("1-1:1.0") have no device descriptor of their own
+            if ':' in entry.name:
+                continue
+            record = self._read_device(entry.path, entry.name)
+            if record is not None:
+                records.append(record)
+        records.sort(key=lambda r: (r.busnum, r.devnum))
+        return records
+
+    @staticmethod
+    def _read_device(path, name):
+        """Read one device directory, returns None if it vanished or is incomplete"""
+        try:
+            values = []
+            for attribute in ('idVendor', 'idProduct', 'busnum', 'devnum'):
+                with open(os.path.join(path, attribute)) as f:
+                    values.append(f.read().strip())
+            return USBDeviceRecord(
+                vendor_id=values[0].lower(),
+                product_id=values[1].lower(),
+                busnum=int(values[2]),
+                devnum=int(values[3]),
+                sysfs_name=name
+            )
+        except (OSError, ValueError):
+            return None
+
+
+def diff_device_status(previous, current):
+    """Compare two device status snapshots.
+
+    Returns a list of (event, device_id, status) tuples where event is
+    'device_attached', 'device_detached' or 'device_changed'.
+    """
+    deltas = []
+    for device_id, status in current.items():
+        old_status = previous.get(device_id)
+        was_connected = bool(old_status and old_status['connected'])
+        if status['connected'] and not was_connected:
+            deltas.append(('device_attached', device_id, status))
+        elif was_connected and not status['connected']:
+            deltas.append(('device_detached', device_id, status))
+        elif old_status != status:
+            deltas.append(('device_changed', device_id, status))
+    for device_id, old_status in previous.items():
+        if device_id not in current and old_status['connected']:
+            deltas.append(('device_detached', device_id, {'connected': False, 'count': 0, 'instances': []}))
+    return deltas
+
+
+DEVICE_DELTA_MESSAGES = ('device_attached', 'device_detached', 'device_changed')
+
+
+def apply_device_message(device_status, message_type, data):
+    """Apply a device_queue message to a status dict, returns the device IDs it touched"""
+    if message_type == 'device_status':
+        device_status.clear()
+        device_status.update(data)
+        return list(data)
+    if message_type in DEVICE_DELTA_MESSAGES:
+        # data is (device_id, status, detected_at)
+        device_id, status = data[0], data[1]
+        device_status[device_id] = status
+        return [device_id]
+    return []
+
+
+class CoalescingChannel:
+    """Bounded device_queue keeping the newest state per key and a bounded backlog of events.
+
+    A device_status snapshot and the per-device deltas are state: a newer
+    delta replaces the pending one of the same device and a snapshot replaces
+    all of them. A device_changed delta merged into a pending attach or
+    detach keeps that kind and its detection time, so the attach is not
+    lost. app_sample messages are likewise kept per pid and
+    verify_progress messages per executable. Any other
+    message is a discrete event, at most max_events are kept and when
+    they are full the oldest event is dropped and counted.
+    get()/get_nowait() hand out messages in the order they were put, a
+    replaced state taking the place of its newest put, and raise
+    queue.Empty like queue.Queue. put() never blocks.
+    """
+
+    def __init__(self, max_events=1000, name='device_queue'):
+        self.max_events = max_events
+        self.name = name
+        self.coalesced = 0
+        self.dropped = 0
+        # Pending messages in put order, keyed by state key or ('event', sequence number)
+        self._items = OrderedDict()
+        self._event_count = 0
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+
+    @staticmethod
+    def state_key(item):
+        """Return the coalescing key of a message, None for discrete events"""
+        if isinstance(item, tuple) and len(item) == 2:
+            message_type, data = item
+            if message_type == 'device_status':
+                return ('device_status',)
+            if message_type in DEVICE_DELTA_MESSAGES:
+                return ('device', data[0])
+            if message_type == 'app_sample':
+                return ('app_sample', data)
+            if message_type == 'verify_progress':
+                return ('verify_progress', data[0])
+        return None
+
+    @staticmethod
+    def merge_delta(pending, item):
+        """Merge a device delta into the pending one of the same device"""
+        if item[0] == 'device_changed' and pending[0] != 'device_changed':
+            return pending[0], tuple(item[1][:2]) + tuple(pending[1][2:])
+        return item
+
+    def put(self, item, block=True, timeout=None):
+        with self._cond:
+            key = self.state_key(item)
+            if key is None:
+                if self._event_count >= self.max_events:
+                    oldest = next(pending_key for pending_key in self._items if pending_key[0] == 'event')
+                    del self._items[oldest]
+                    self._event_count -= 1
+                    self.dropped += 1
+                    CHANNEL_DROPPED.inc(channel=self.name)
+                self._items[('event', next(self._sequence))] = item
+                self._event_count += 1
+            elif key[0] == 'device_status':
+                superseded = [pending_key for pending_key in self._items
+                              if pending_key[0] in ('device', 'device_status')]
+                for pending_key in superseded:
+                    del self._items[pending_key]
+                self._items[key] = item
+                self._count_coalesced(len(superseded))
+            else:
+                pending = self._items.pop(key, None)
+                if pending is not None:
+                    if key[0] == 'device':
+                        item = self.merge_delta(pending, item)
+                    self._count_coalesced(1)
+                self._items[key] = item
+            self._cond.notify()
+
+    def put_nowait(self, item):
+        self.put(item, block=False)
+
+    def _count_coalesced(self, count):
+        if count:
+            self.coalesced += count
+            CHANNEL_COALESCED.inc(count, channel=self.name)
+
+    def get(self, block=True, timeout=None):
+        with self._cond:
+            if block and not self._cond.wait_for(self._pending, timeout):
+                raise queue.Empty
+            if not self._items:
+                raise queue.Empty
+            key, item = self._items.popitem(last=False)
+            if key[0] == 'event':
+                self._event_count -= 1
+            return item
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def _pending(self):
+        return bool(self._items)
+
+    def qsize(self):
+        with self._cond:
+            return len(self._items)
+
+    def empty(self):
+        return self.qsize() == 0
+
+
+class HotplugListener:
+    """Base class for push-based USB hotplug backends.
+
+    Subclasses override open() and next_event(), the defaults are a backend
+    that is unavailable and never reports an event. wait() drains events and
+    reports whether any of them concerns a watched vid:pid, so a fake event
+    source can drive USBMonitor without real hardware.
+    """
+
+    def __init__(self, device_ids):
+        # device_ids are "vvvv:pppp" strings as used in USBMonitor.known_devices
+        self.watched_ids = set()
+        for device_id in device_ids:
+            vendor_id, product_id = device_id.split(":")
+            self.watched_ids.add((int(vendor_id, 16), int(product_id, 16)))
+
+    def open(self):
+        """Start receiving events, returns False if the backend is unavailable"""
+        return False
+
+    def next_event(self, timeout):
+        """Return the next (action, vendor_id, product_id) event, or None after timeout seconds.
+
+        action is 'add', 'remove', 'rescan' (events were lost) or 'other'.
+        """
+        time.sleep(timeout)
+        return None
+
+    def wait(self, timeout):
+        """Wait up to timeout seconds, returns True if a watched device was added or removed"""
+        relevant = False
+        event = self.next_event(timeout)
+        while event is not None:
+            action, vendor_id, product_id = event
+            if action == 'rescan':
+                relevant = True
+            elif action in ('add', 'remove') and (vendor_id, product_id) in self.watched_ids:
+                relevant = True
+            event = self.next_event(0)
+        return relevant
+
+    def close(self):
+        pass
+
+
+class LinuxHotplugListener(HotplugListener):
+    """Kernel uevent listener for USB hotplug (Linux only)"""
+
+    NETLINK_KOBJECT_UEVENT = 15
+    KERNEL_UEVENT_GROUP = 1
+    RECEIVE_BUFFER_SIZE = 1024 * 1024
+
+    def __init__(self, device_ids):
+        super().__init__(device_ids)
+        self.sock = None
+
+    def open(self):
+        """Open the netlink socket, returns False if uevents are unavailable"""
+        if not IS_LINUX or not hasattr(socket, 'AF_NETLINK'):
             return False
-    
+        try:
+            self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM,
+                                      self.NETLINK_KOBJECT_UEVENT)
+            try:
+                self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.RECEIVE_BUFFER_SIZE)
+            except OSError:
+                pass
+            self.sock.bind((0, self.KERNEL_UEVENT_GROUP))
+            return True
+        except OSError as e:
+            logger.warning(f"USB hotplug events unavailable, falling back to polling: {e}")
+            self.close()
+            return False
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def next_event(self, timeout):
+        """Read one uevent from the netlink socket"""
+        try:
+            readable, _, _ = select.select([self.sock], [], [], timeout)
+        except InterruptedError:
+            return None
+        if not readable:
+            return None
+
+        try:
+            data = self.sock.recv(16384, socket.MSG_DONTWAIT)
+        except BlockingIOError:
+            return None
+        except OSError as e:
+            # ENOBUFS means the kernel dropped events, so state must be rescanned
+            logger.warning(f"USB hotplug event overflow: {e}")
+            BACKEND_ERRORS.inc(backend='netlink')
+            return ('rescan', None, None)
+        return self.uevent_to_event(self.parse_uevent(data))
+
+    def close(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+
     @staticmethod
-    def check_password_required():
-        """Check if sudo requires password (Linux only)"""
-        if IS_WINDOWS:
+    def parse_uevent(data):
+        """Parse a raw kernel uevent datagram into a dict of its KEY=VALUE fields"""
+        fields = {}
+        for part in data.split(b'\0')[1:]:
+            key, sep, value = part.partition(b'=')
+            if sep:
+                fields[key.decode('ascii', errors='ignore')] = value.decode('utf-8', errors='ignore')
+        return fields
+
+    @staticmethod
+    def uevent_to_event(uevent):
+        """Convert a parsed uevent into an (action, vendor_id, product_id) event"""
+        if uevent.get('SUBSYSTEM') != 'usb' or uevent.get('DEVTYPE') != 'usb_device':
+            return ('other', None, None)
+        # PRODUCT is "vid/pid/bcdDevice" in hex without leading zeros
+        product = uevent.get('PRODUCT', '').split('/')
+        try:
+            return (uevent.get('ACTION', 'other'), int(product[0], 16), int(product[1], 16))
+        except (IndexError, ValueError):
+            return ('other', None, None)
+
+
+class WindowsHotplugListener(HotplugListener):
+    """WMI Win32_PnPEntity creation/deletion event subscription (Windows only)"""
+
+    EVENT_ACTIONS = {'creation': 'add', 'deletion': 'remove'}
+
+    def __init__(self, device_ids, connection_factory):
+        super().__init__(device_ids)
+        # connection_factory returns the calling thread's WMI connection
+        self.connection_factory = connection_factory
+        self.watcher = None
+
+    def open(self):
+        """Subscribe to PnP entity arrival and removal, returns False if WMI is unavailable"""
+        if not wmi.available():
             return False
+        vendor_filters = ' OR '.join(
+            f"TargetInstance.DeviceID LIKE 'USB\\\\VID_{vendor_id:04X}%'"
+            for vendor_id in sorted({vendor_id for vendor_id, _ in self.watched_ids})
+        )
+        wql = (
+            "SELECT * FROM __InstanceOperationEvent WITHIN 1 "
+            "WHERE (__CLASS = '__InstanceCreationEvent' OR __CLASS = '__InstanceDeletionEvent') "
+            f"AND TargetInstance ISA 'Win32_PnPEntity' AND ({vendor_filters})"
+        )
         try:
-            result = subprocess.run(['sudo', '-n', 'true'], 
-                                  stdout=subprocess.PIPE, 
-                                  stderr=subprocess.PIPE, 
-                                  timeout=5)
-            return result.returncode != 0
-        except subprocess.SubprocessError:
+            self.watcher = self.connection_factory().watch_for(raw_wql=wql)
             return True
+        except Exception as e:
+            logger.warning(f"USB hotplug events unavailable, falling back to polling: {e}")
+            self.watcher = None
+            return False
+
+    def next_event(self, timeout):
+        """Wait for one PnP entity event from the subscription"""
+        try:
+            event = self.watcher(timeout_ms=int(timeout * 1000))
+        except wmi.x_wmi_timed_out:
+            return None
+        except Exception as e:
+            logger.warning(f"USB hotplug event error: {e}")
+            BACKEND_ERRORS.inc(backend='wmi_events')
+            return ('rescan', None, None)
+
+        action = self.EVENT_ACTIONS.get(event.event_type, 'other')
+        match = re.search(r'VID_([0-9A-F]{4})&PID_([0-9A-F]{4})', str(event.DeviceID).upper())
+        if not match:
+            return ('other', None, None)
+        return (action, int(match.group(1), 16), int(match.group(2), 16))
+
+    def close(self):
+        self.watcher = None
+
+
+class MonitorCore:
+    """Background asyncio event loop shared by device scanning, process supervision and control commands"""
+
+    def __init__(self):
+        self.loop = None
+        self.thread = None
+        self._started = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the event loop thread if it is not running yet"""
+        with self._lock:
+            if self.is_alive():
+                return
+            self._started.clear()
+            self.thread = threading.Thread(target=self._run, name='monitor-core', daemon=True)
+            self.thread.start()
+        self._started.wait()
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._started.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+    def is_alive(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def submit(self, coroutine):
+        """Schedule a coroutine from any thread, returns a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def call_soon(self, callback, *args):
+        """Run a callback on the event loop from any thread"""
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def stop(self, timeout=5):
+        with self._lock:
+            if not self.is_alive():
+                return
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout)
+
+
+class PollScheduler:
+    """Monotonic scan deadlines that adapt to how busy the devices are.
+
+    Scans run every min_interval right after a change or while busy, and the
+    interval doubles up to max_interval while the device set stays the same.
+    The next deadline is derived from the previous one, not from when the scan
+    finished, so scan time does not add drift; deadlines missed by a slow scan
+    are skipped rather than run back to back. Errors back off exponentially
+    from error_interval up to max_error_interval.
+    """
+
+    def __init__(self, min_interval, max_interval, error_interval=1.0, max_error_interval=60.0,
+                 clock=time.monotonic):
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.error_interval = error_interval
+        self.max_error_interval = max_error_interval
+        self.clock = clock
+        self.interval = min_interval
+        self.deadline = clock()
+        self._error_delay = None
+
+    def due(self):
+        return self.clock() >= self.deadline
+
+    def timeout(self):
+        """Seconds until the next scan is due"""
+        return max(self.deadline - self.clock(), 0.0)
+
+    def reset(self):
+        """Scan now and poll fast afterwards, e.g. after resuming"""
+        self.interval = self.min_interval
+        self.deadline = self.clock()
+
+    def hurry(self):
+        """Switch to the fast interval without waiting out a long backoff"""
+        if self.interval > self.min_interval:
+            self.interval = self.min_interval
+            self.deadline = min(self.deadline, self.clock() + self.min_interval)
+
+    def record_scan(self, changed):
+        """Schedule the next scan after a successful one"""
+        now = self.clock()
+        self._error_delay = None
+        if changed:
+            self.interval = self.min_interval
+            self.deadline = now + self.interval
+            return
+        if now < self.deadline:
+            # Early scan after a hotplug event or command, keep the schedule
+            return
+        self.interval = min(self.interval * 2, self.max_interval)
+        self.deadline += self.interval
+        if self.deadline <= now:
+            self.deadline += (int((now - self.deadline) / self.interval) + 1) * self.interval
+
+    def record_error(self):
+        """Schedule a retry after a failed scan"""
+        if self._error_delay is None:
+            self._error_delay = self.error_interval
+        else:
+            self._error_delay = min(self._error_delay * 2, self.max_error_interval)
+        self.interval = self.min_interval
+        self.deadline = self.clock() + self._error_delay
+
+
+class DeviceDebouncer:
+    """Hysteresis between raw device scans and the device status published to consumers.
+
+    A device whose connected state changes is reported only once the new
+    state has held for settle_time and the previous state was shown for at
+    least min_dwell. Changes of a connected device's details (path, port)
+    pass straight through. A device that toggled flap_threshold times within
+    flap_window is reported with 'flapping': True and its last stable state
+    until it has been quiet for flap_window. Toggles are counted per device
+    in flap_counts.
+    """
+
+    def __init__(self, settle_time=0.25, min_dwell=1.0, flap_window=5.0, flap_threshold=4, clock=time.monotonic):
+        self.settle_time = settle_time
+        self.min_dwell = min_dwell
+        self.flap_window = flap_window
+        self.flap_threshold = flap_threshold
+        self.clock = clock
+        self.flap_counts = {}
+        self._raw = {}
+        self._states = {}
+
+    def reset(self):
+        """Forget all devices, the next scan is published as it is, e.g. after resuming"""
+        self._raw = {}
+        self._states = {}
+
+    def update(self, raw_status=None):
+        """Feed a new scan (or None to re-check pending changes), returns the status to publish"""
+        now = self.clock()
+        if raw_status is not None:
+            self._raw = raw_status
+        device_status = {}
+        for device_id, raw in self._raw.items():
+            state = self._states.get(device_id)
+            if state is None:
+                # First sight is published as it is
+                state = self._states[device_id] = {
+                    'stable': raw, 'shown_at': now - self.min_dwell, 'pending_since': None,
+                    'raw_connected': raw['connected'], 'toggles': deque(), 'flapping': False,
+                }
+            if raw_status is not None and raw['connected'] != state['raw_connected']:
+                state['raw_connected'] = raw['connected']
+                state['toggles'].append(now)
+                self.flap_counts[device_id] = self.flap_counts.get(device_id, 0) + 1
+                DEVICE_FLAPS.inc(device=device_id)
+                state['pending_since'] = now if raw['connected'] != state['stable']['connected'] else None
+            while state['toggles'] and state['toggles'][0] + self.flap_window <= now:
+                state['toggles'].popleft()
+
+            # Enter at flap_threshold toggles, leave only after a quiet window
+            was_flapping = state['flapping']
+            state['flapping'] = len(state['toggles']) >= self.flap_threshold or (was_flapping and bool(state['toggles']))
+            if was_flapping != state['flapping']:
+                logger.warning(f"Device {device_id} {'is flapping' if state['flapping'] else 'stopped flapping'}")
+
+            stable = state['stable']
+            if state['flapping']:
+                pass
+            elif raw['connected'] != stable['connected']:
+                if state['pending_since'] is None:
+                    state['pending_since'] = now
+                # Same comparison as timeout(), so a deadline it reports is never missed by rounding
+                if (state['pending_since'] + self.settle_time <= now
+                        and state['shown_at'] + self.min_dwell <= now):
+                    state['stable'] = raw
+                    state['shown_at'] = now
+                    state['pending_since'] = None
+            else:
+                state['pending_since'] = None
+                state['stable'] = raw
+            device_status[device_id] = dict(state['stable'], flapping=True) if state['flapping'] else state['stable']
+        return device_status
+
+    def timeout(self):
+        """Seconds until update() may publish a pending change, None if nothing is pending"""
+        now = self.clock()
+        deadlines = []
+        for state in self._states.values():
+            if state['flapping'] and state['toggles']:
+                deadlines.append(state['toggles'][-1] + self.flap_window)
+            elif state['pending_since'] is not None:
+                deadlines.append(max(state['pending_since'] + self.settle_time, state['shown_at'] + self.min_dwell))
+        return max(min(deadlines) - now, 0.0) if deadlines else None
+
+
+def natural_key(text):
+    """Sort key ordering embedded numbers numerically ("1-1.10" after "1-1.2", "4761_10" after "4761_2")"""
+    return [(0, int(part), '') if part.isdigit() else (1, 0, part) for part in re.split(r'(\d+)', text) if part]
+
+
+class PortSlotMap:
+    """Stable logical slots ("4761", "4761_1", ...) for the cards of one kind, keyed by physical USB port.
+
+    Ports are sysfs topology names ("1-1.3") on Linux and PnP instance IDs on
+    Windows, which the PnP manager derives from the port for devices without a
+    serial number. A port keeps its slot across re-plugs, and across restarts
+    when the map is persisted with load(). New ports take the lowest free slot
+    and reclaim the slot of a disconnected port once all max_slots are taken.
+    """
+
+    def __init__(self, kind, min_slots=2, max_slots=16):
+        self.kind = kind
+        self.min_slots = min_slots
+        self.max_slots = max_slots
+        self.path = None
+        self._slots = {}
+        self._lock = threading.Lock()
+
+    def slot_name(self, number):
+        return self.kind if number == 0 else f"{self.kind}_{number}"
+
+    def slot_names(self):
+        """Names of all slots shown, at least min_slots"""
+        with self._lock:
+            count = max([self.min_slots] + [number + 1 for number in self._slots.values()])
+        return [self.slot_name(number) for number in range(count)]
+
+    def load(self, path):
+        """Persist the map in path (shared by all kinds) and read the saved assignments"""
+        self.path = path
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                slots = json.load(f).get(self.kind, {})
+            with self._lock:
+                self._slots = {port: int(number) for port, number in slots.items() if 0 <= int(number) < self.max_slots}
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            logger.warning(f"Ignoring unreadable card slot map {path}: {e}")
+
+    def _save(self):
+        if not self.path:
+            return
+        try:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                data = {}
+            data[self.kind] = dict(sorted(self._slots.items(), key=lambda item: item[1]))
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Cannot save card slot map {self.path}: {e}")
+
+    def assign(self, ports):
+        """Map the connected ports to slot names, giving new ports a slot, returns {slot_name: port}"""
+        connected = set(ports)
+        changed = False
+        with self._lock:
+            used = set(self._slots.values())
+            for port in sorted(connected - set(self._slots), key=natural_key):
+                free = [number for number in range(self.max_slots) if number not in used]
+                if not free:
+                    # Reclaim the lowest slot whose card is not plugged in
+                    stale = sorted((number, old_port) for old_port, number in self._slots.items()
+                                   if old_port not in connected)
+                    if not stale:
+                        logger.warning(f"More than {self.max_slots} {self.kind} cards connected, ignoring {port}")
+                        continue
+                    number, old_port = stale[0]
+                    del self._slots[old_port]
+                    free = [number]
+                self._slots[port] = free[0]
+                used.add(free[0])
+                changed = True
+                logger.info(f"Card {self.kind} on port {port} assigned to slot {self.slot_name(free[0])}")
+            assigned = {self.slot_name(number): port for port, number in self._slots.items() if port in connected}
+            if changed:
+                self._save()
+        return assigned
+
+
+class USBMonitor:
+    """USB Device Monitor running on a MonitorCore event loop"""
     
-    @classmethod
-    def shutdown_system(cls):
-        """Shutdown the system using the best available method (cross-platform)"""
+    # Safety rescan while hotplug events drive the scans, in case an event is lost
+    HOTPLUG_RESCAN_INTERVAL = 60.0
+    
+    def __init__(self, device_queue, control_queue, core=None):
+        self.device_queue = device_queue
+        self.control_queue = control_queue
+        self.known_devices = {
+            "4750": "1809:4750",
+            "4761": "1809:4761"
+        }
+        # Kinds with several cards get one logical device per slot ("4761", "4761_1", ...)
+        self.slot_maps = {"4761": PortSlotMap("4761", min_slots=2, max_slots=16)}
+        self.running = False
+        self.paused = False
+        # Polling adapts between these intervals, see PollScheduler: the old fixed 1 s right after a
+        # change or while busy, backing off while the devices stay the same. Without hotplug events
+        # max_monitoring_interval is also the worst case detection latency, hotplug mode uses
+        # HOTPLUG_RESCAN_INTERVAL
+        self.monitoring_interval = 1.0
+        self.max_monitoring_interval = 8.0
+        # Optional callable, polling stays fast while it returns True (e.g. an application is running)
+        self.is_busy = None
+        # Settles bouncing devices before their status is published
+        self.debouncer = DeviceDebouncer()
+        self.use_hotplug = True
+        # Optional callable(device_ids) returning a HotplugListener, e.g. a fake event source in tests
+        self.hotplug_factory = None
+        self.sysfs_enumerator = SysfsUSBEnumerator()
+        self.monitor_thread = None
+        self._lock = threading.Lock()
+        self._wmi_local = threading.local()
+        # PnP instance ID -> physical port, kept while the device stays connected
+        self._windows_ports = {}
+        self._last_status = None
+        # Without a shared core the monitor runs its own event loop thread
+        self._owns_core = core is None
+        self.core = core if core is not None else MonitorCore()
+        self._monitor_future = None
+        self._loop = None
+        self._wakeup = None
+        self._hotplug_pending = False
+        self._hotplug_time = None
+    
+    def is_device_connected(self, vendor_id, product_id, device_index=1):
+        """Check if a specific USB device is connected (cross-platform)"""
+        index = self.index_devices(self.scan_usb_devices())
+        return len(index.get(f"{vendor_id}:{product_id}".lower(), [])) >= device_index
+    
+    def get_4761_device_paths(self):
+        """Detect all USB-4761 device paths (cross-platform)"""
+        index = self.index_devices(self.scan_usb_devices())
+        return [path for path, port in index.get("1809:4761", [])]
+    
+    def set_slot_map_path(self, path):
+        """Persist the port to slot assignments of multi-card kinds in path"""
+        for slot_map in self.slot_maps.values():
+            slot_map.load(path)
+    
+    def scan_usb_devices(self):
+        """Take one snapshot of connected USB devices as (vid:pid, path, port) triples (cross-platform)
+
+        port identifies the physical USB port, or is None when the backend cannot tell.
+        """
         if IS_WINDOWS:
-            return cls._shutdown_windows()
+            return self._scan_usb_devices_windows()
         else:
-            return cls._shutdown_linux()
+            return self._scan_usb_devices_linux()
     
-    @classmethod
-    def _shutdown_windows(cls):
-        """Shutdown Windows system"""
+    def _scan_usb_devices_linux(self):
+        """Snapshot USB devices on Linux using sysfs, or lsusb when sysfs is unavailable"""
+        if self.sysfs_enumerator.available():
+            return [(r.device_id, r.dev_path, r.sysfs_name) for r in self.sysfs_enumerator.enumerate()]
+        
         try:
-            # Windows shutdown command: /s = shutdown, /t 0 = immediately
-            subprocess.Popen(
-                ['shutdown', '/s', '/t', '0'],
-                creationflags=subprocess.CREATE_NO_WINDOW if hasattr(subprocess, 'CREATE_NO_WINDOW') else 0
-            )
-            logger.info("System shutdown initiated (Windows)")
-            return True
-        except Exception as e:
-            logger.error(f"Windows shutdown failed: {e}")
-            return False
+            result = subprocess.run(['lsusb'], 
+                                  stdout=subprocess.PIPE, 
+                                  stderr=subprocess.PIPE, 
+                                  timeout=10)
+            if result.returncode != 0:
+                BACKEND_ERRORS.inc(backend='lsusb')
+                return []
+            
+            return self.parse_lsusb_output(result.stdout.decode('utf-8', errors='ignore'))
+            
+        except (subprocess.TimeoutExpired, subprocess.SubprocessError) as e:
+            logger.error(f"USB detection error (Linux): {e}")
+            BACKEND_ERRORS.inc(backend='lsusb')
+            return []
     
-    @classmethod
-    def _shutdown_linux(cls):
-        """Shutdown Linux system"""
-        commands = []
-        
-        if cls.check_sudo_available():
-            if not cls.check_password_required():
-                commands.extend([
-                    ['sudo', 'shutdown', '-h', 'now'],
-                    ['sudo', 'poweroff'],
-                    ['sudo', 'halt', '-p']
-                ])
+    @staticmethod
+    def parse_lsusb_output(output):
+        """Parse "Bus 001 Device 005: ID 1809:4761 ..." lines into (vid:pid, path, None) triples, lsusb has no port"""
+        devices = []
+        for line in output.strip().split('\n'):
+            parts = line.split()
+            if len(parts) < 6 or parts[0] != 'Bus' or parts[4] != 'ID':
+                continue
+            bus = parts[1]
+            device = parts[3].rstrip(':')
+            devices.append((parts[5].lower(), f'/dev/bus/usb/{bus}/{device}', None))
+        return devices
+    
+    def _get_wmi_connection(self):
+        """Return the calling thread's WMI connection, connecting on first use"""
+        connection = getattr(self._wmi_local, 'connection', None)
+        if connection is None:
+            try:
+                import pythoncom
+                pythoncom.CoInitialize()
+                self._wmi_local.com_initialized = True
+            except ImportError:
+                pass
+            connection = wmi.WMI()
+            self._wmi_local.connection = connection
+        return connection
+    
+    def _release_wmi_connection(self):
+        """Drop the calling thread's WMI connection"""
+        self._wmi_local.connection = None
+        if getattr(self._wmi_local, 'com_initialized', False):
+            import pythoncom
+            pythoncom.CoUninitialize()
+            self._wmi_local.com_initialized = False
+    
+    def _scan_usb_devices_windows(self):
+        """Snapshot USB devices on Windows using WMI or wmic"""
+        try:
+            device_ids = []
+            wmi_devices = {}
+            # Try WMI first if available
+            if wmi.available():
+                try:
+                    c = self._get_wmi_connection()
+                    for device in c.query("SELECT DeviceID FROM Win32_PnPEntity WHERE DeviceID LIKE 'USB\\\\%'"):
+                        device_ids.append(device.DeviceID)
+                        wmi_devices[device.DeviceID.upper()] = device
+                except Exception:
+                    # A broken connection is rebuilt on the next scan
+                    self._wmi_local.connection = None
+                    raise
             else:
-                commands.extend([
-                    ['shutdown', '-h', 'now'],
+                # Fallback to wmic command
+                result = subprocess.run(
+                    ['wmic', 'path', 'Win32_USBControllerDevice', 'get', 'Dependent'],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    timeout=10,
+                    creationflags=subprocess.CREATE_NO_WINDOW if hasattr(subprocess, 'CREATE_NO_WINDOW') else 0
+                )
+                if result.returncode != 0:
+                    BACKEND_ERRORS.inc(backend='wmic')
+                    return []
+                
+                for line in result.stdout.decode('utf-8', errors='ignore').split('\n'):
+                    match = re.search(r'DeviceID="([^"]+)"', line)
+                    device_ids.append(match.group(1).replace('\\\\', '\\') if match else line.strip())
+            
+            devices = self.parse_pnp_device_ids(
+                device_ids, lambda device_id: self._windows_port(device_id, wmi_devices.get(device_id)))
+            # A device with a serial number keeps its instance ID on another port, forget ports of removed ones
+            present = set(path for _, path, _ in devices)
+            for device_id in [device_id for device_id in self._windows_ports if device_id not in present]:
+                del self._windows_ports[device_id]
+            return devices
+            
+        except Exception as e:
+            logger.error(f"USB detection error (Windows): {e}")
+            BACKEND_ERRORS.inc(backend='wmi' if wmi.available() else 'wmic')
+            return []
+    
+    def _windows_port(self, device_id, device=None):
+        """Physical port of a PnP device, its location path or else the registry's LocationInformation
+
+        The instance ID cannot serve as the port: for devices with a serial
+        number it is the serial number and follows the device to any port.
+        """
+        if device_id in self._windows_ports:
+            return self._windows_ports[device_id]
+        port = None
+        if device is not None:
+            try:
+                # Out parameters come back as a tuple, the property list among them (Windows 8 and later)
+                for result in device.GetDeviceProperties(['DEVPKEY_Device_LocationPaths']):
+                    for device_property in (result if isinstance(result, (list, tuple)) else ()):
+                        data = getattr(device_property, 'Data', None)
+                        if data:
+                            port = data[0] if isinstance(data, (list, tuple)) else data
+            except Exception as e:
+                logger.debug(f"No location paths for {device_id}: {e}")
+        if not port:
+            try:
+                import winreg
+                with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, f"SYSTEM\\CurrentControlSet\\Enum\\{device_id}") as key:
+                    # e.g. "Port_#0002.Hub_#0003"
+                    port = winreg.QueryValueEx(key, 'LocationInformation')[0]
+            except (ImportError, OSError):
+                pass
+        port = str(port).upper() if port else None
+        self._windows_ports[device_id] = port
+        return port
+    
+    @staticmethod
+    def parse_pnp_device_ids(device_ids, locate=None):
+        """Turn PnP device IDs ("USB\\VID_1809&PID_4761\\...") into (vid:pid, path, port) triples
+
+        locate(device_id) returns the port of a device, without it (or when
+        it returns None) the port is None and cards are mapped to slots in
+        enumeration order.
+        """
+        devices = []
+        for device_id in device_ids:
+            device_id = device_id.upper()
+            match = re.search(r'VID_([0-9A-F]{4})&PID_([0-9A-F]{4})(&MI_)?', device_id)
+            # Interface nodes of composite devices (&MI_xx) belong to a device already listed
+            if match and not match.group(3):
+                port = locate(device_id) if locate is not None else None
+                devices.append((f"{match.group(1)}:{match.group(2)}".lower(), device_id, port))
+        return devices
+    
+    @staticmethod
+    def index_devices(snapshot):
+        """Index a device snapshot by vid:pid into (path, port) lists in enumeration order"""
+        index = {}
+        for device_id, path, port in snapshot:
+            index.setdefault(device_id, []).append((path, port))
+        return index
+
+    def check_devices(self):
+        """Check all known devices against one device snapshot, mapping multiple cards to slots by port."""
+        started = time.monotonic()
+        try:
+            index = self.index_devices(self.scan_usb_devices())
+        except Exception as e:
+            logger.error(f"Error scanning USB devices: {e}")
+            BACKEND_ERRORS.inc(backend='linux' if IS_LINUX else 'windows')
+            index = {}
+        
+        device_status = {}
+        for logical_name, device_id in self.known_devices.items():
+            devices = index.get(device_id, [])
+            slot_map = self.slot_maps.get(logical_name)
+            if slot_map is None:
+                slots = {logical_name: devices[0] if devices else None}
+            elif devices and all(port is not None for path, port in devices):
+                paths = dict((port, path) for path, port in devices)
+                assigned = slot_map.assign(list(paths))
+                slots = dict((name, (paths[assigned[name]], assigned[name]) if name in assigned else None)
+                             for name in slot_map.slot_names())
+            else:
+                # Without port information (lsusb, unlocatable Windows devices) cards take the slots in enumeration order
+                names = slot_map.slot_names()
+                names += [slot_map.slot_name(number) for number in range(len(names), min(len(devices), slot_map.max_slots))]
+                slots = dict((name, devices[number] if number < len(devices) else None)
+                             for number, name in enumerate(names))
+            
+            for name, device in slots.items():
+                if device is not None:
+                    device_status[name] = {
+                        'connected': True,
+                        'count': 1,
+                        'instances': [device[0]],
+                        'port': device[1],
+                    }
+                else:
+                    device_status[name] = {'connected': False, 'count': 0, 'instances': []}
+
+        CHECK_DEVICES_SECONDS.observe(time.monotonic() - started)
+        return device_status
+    
+    def start_monitoring(self):
+        """Start the monitoring coroutine on the monitor core"""
+        with self._lock:
+            if self.running:
+                logger.warning("Monitor is already running")
+                return False
+            
+            self.running = True
+            self.paused = False
+            self.core.start()
+            self.monitor_thread = self.core.thread
+            self._monitor_future = self.core.submit(self.monitor_loop())
+            logger.info("USB Monitor started")
+            return True
+    
+    def stop_monitoring(self):
+        """Stop the monitoring coroutine"""
+        with self._lock:
+            if not self.running:
+                return
+            
+            self.running = False
+            
+        # Send stop command to ensure quick shutdown
+        try:
+            self.control_queue.put('stop', timeout=1)
+        except queue.Full:
+            pass
+        self._wake()
+        
+        # Wait for the coroutine to finish
+        if self._monitor_future is not None:
+            try:
+                self._monitor_future.result(timeout=5)
+            except futures.TimeoutError:
+                logger.warning("Monitor thread did not stop gracefully")
+            except Exception as e:
+                logger.error(f"Monitor loop ended with error: {e}")
+        if self._owns_core:
+            self.core.stop()
+        
+        logger.info("USB Monitor stopped")
+    
+    def pause_monitoring(self):
+        """Pause monitoring without stopping the thread"""
+        with self._lock:
+            if self.running:
+                self.paused = True
+                try:
+                    self.control_queue.put('pause', timeout=1)
+                except queue.Full:
+                    pass
+                self._wake()
+                logger.info("USB Monitor paused")
+    
+    def resume_monitoring(self):
+        """Resume monitoring"""
+        with self._lock:
+            if self.running:
+                self.paused = False
+                try:
+                    self.control_queue.put('resume', timeout=1)
+                except queue.Full:
+                    pass
+                self._wake()
+                logger.info("USB Monitor resumed")
+    
+    def publish_status(self, device_status, detected_at=None):
+        """Send a full snapshot first, then only the deltas against the previous snapshot.
+
+        Deltas carry (device_id, status, detected_at) where detected_at is the
+        time.monotonic() at which the change was first noticed.
+        """
+        if detected_at is None:
+            detected_at = time.monotonic()
+        if self._last_status is None:
+            messages = [('device_status', device_status)]
+        else:
+            messages = [(event, (device_id, status, detected_at))
+                        for event, device_id, status in diff_device_status(self._last_status, device_status)]
+        
+        try:
+            for message in messages:
+                self.device_queue.put(message, timeout=1)
+            self._last_status = device_status
+        except queue.Full:
+            logger.warning("Device queue full, skipping update")
+            # Resynchronise consumers with a full snapshot on the next scan
+            self._last_status = None
+    
+    def _open_hotplug_listener(self):
+        """Open a hotplug event listener for the known devices, or None to poll"""
+        if not self.use_hotplug:
+            return None
+        if self.hotplug_factory is not None:
+            listener = self.hotplug_factory(set(self.known_devices.values()))
+        elif IS_LINUX:
+            listener = LinuxHotplugListener(set(self.known_devices.values()))
+        elif IS_WINDOWS and wmi.available():
+            listener = WindowsHotplugListener(set(self.known_devices.values()), self._get_wmi_connection)
+        else:
+            return None
+        if not listener.open():
+            return None
+        logger.info("USB hotplug events enabled")
+        return listener
+
+    def _wake(self):
+        """Wake the monitoring coroutine from any thread so commands apply immediately"""
+        loop, wakeup = self._loop, self._wakeup
+        if loop is None or wakeup is None:
+            return
+        try:
+            loop.call_soon_threadsafe(wakeup.set)
+        except RuntimeError:
+            # Event loop already closed
+            pass
+    
+    def _process_control_commands(self):
+        """Apply queued control commands, returns False when asked to stop"""
+        while True:
+            try:
+                command = self.control_queue.get_nowait()
+            except queue.Empty:
+                return True
+            if command == 'stop':
+                return False
+            elif command == 'pause':
+                self.paused = True
+            elif command == 'resume':
+                self.paused = False
+    
+    async def _sleep_until_woken(self, timeout):
+        """Sleep until _wake() or a hotplug event, or until timeout seconds (None waits forever)"""
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+    
+    def _on_hotplug_readable(self, hotplug):
+        """Event loop reader callback for the netlink socket"""
+        if hotplug.wait(0):
+            self._hotplug_pending = True
+            self._hotplug_time = time.monotonic()
+            self._wakeup.set()
+    
+    async def _pump_hotplug_events(self, hotplug, executor):
+        """Forward events of a blocking hotplug listener, run on the listener's own thread"""
+        loop = asyncio.get_event_loop()
+        while self.running:
+            if await loop.run_in_executor(executor, hotplug.wait, 1.0):
+                self._hotplug_pending = True
+                self._hotplug_time = time.monotonic()
+                self._wakeup.set()
+    
+    async def monitor_loop(self):
+        """Main monitoring coroutine running on the monitor core's event loop"""
+        logger.info("USB Monitor thread started")
+        loop = asyncio.get_event_loop()
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._hotplug_pending = False
+        
+        # Blocking scans run on one worker thread, so a Windows WMI connection stays on one thread
+        scan_executor = futures.ThreadPoolExecutor(max_workers=1)
+        hotplug_executor = None
+        hotplug_task = None
+        if IS_WINDOWS:
+            hotplug_executor = futures.ThreadPoolExecutor(max_workers=1)
+            hotplug = await loop.run_in_executor(hotplug_executor, self._open_hotplug_listener)
+            if hotplug is not None:
+                hotplug_task = loop.create_task(self._pump_hotplug_events(hotplug, hotplug_executor))
+        else:
+            hotplug = self._open_hotplug_listener()
+            if hotplug is not None:
+                loop.add_reader(hotplug.fileno(), self._on_hotplug_readable, hotplug)
+        if hotplug is not None:
+            scheduler = PollScheduler(self.HOTPLUG_RESCAN_INTERVAL, self.HOTPLUG_RESCAN_INTERVAL)
+        else:
+            scheduler = PollScheduler(self.monitoring_interval, self.max_monitoring_interval)
+        scan_needed = True
+        last_raw_status = None
+        
+        try:
+            while self.running:
+                try:
+                    # Check for control commands
+                    if not self._process_control_commands():
+                        break
+                    
+                    # Skip device checking if paused, resuming starts with a full snapshot
+                    if self.paused:
+                        scan_needed = True
+                        self._last_status = None
+                        self.debouncer.reset()
+                        scheduler.reset()
+                        await self._sleep_until_woken(None)
+                        continue
+                    
+                    detected_at = time.monotonic()
+                    if self._hotplug_pending:
+                        self._hotplug_pending = False
+                        detected_at = self._hotplug_time
+                        scan_needed = True
+                    
+                    # With hotplug events the devices are rescanned after a change and rarely otherwise
+                    if scan_needed or scheduler.due():
+                        scan_needed = False
+                        raw_status = await loop.run_in_executor(scan_executor, self.check_devices)
+                        changed = raw_status != last_raw_status
+                        last_raw_status = raw_status
+                        self.publish_status(self.debouncer.update(raw_status), detected_at)
+                        scheduler.record_scan(changed)
+                    elif self.debouncer.timeout() == 0:
+                        # A settled change or the end of flapping, no rescan needed
+                        self.publish_status(self.debouncer.update(), detected_at)
+                    
+                    if hotplug is None and self.is_busy is not None and self.is_busy():
+                        scheduler.hurry()
+                    MONITOR_WAKEUPS.inc()
+                    timeout = scheduler.timeout()
+                    settle_timeout = self.debouncer.timeout()
+                    if settle_timeout is not None:
+                        timeout = min(timeout, settle_timeout)
+                    await self._sleep_until_woken(timeout)
+                    
+                except Exception as e:
+                    logger.error(f"Monitor loop error: {e}")
+                    BACKEND_ERRORS.inc(backend='monitor')
+                    try:
+                        self.device_queue.put(('error', str(e)), timeout=1)
+                    except queue.Full:
+                        pass
+                    # Retry with exponential backoff, a hotplug event or command still wakes the loop
+                    scheduler.record_error()
+                    await self._sleep_until_woken(scheduler.timeout())
+        finally:
+            if hotplug_task is not None:
+                hotplug_task.cancel()
+            if hotplug is not None:
+                if hotplug_executor is not None:
+                    await loop.run_in_executor(hotplug_executor, hotplug.close)
+                else:
+                    loop.remove_reader(hotplug.fileno())
+                    hotplug.close()
+            if IS_WINDOWS and wmi.available():
+                await loop.run_in_executor(scan_executor, self._release_wmi_connection)
+                if hotplug_executor is not None:
+                    await loop.run_in_executor(hotplug_executor, self._release_wmi_connection)
+            scan_executor.shutdown(wait=False)
+            if hotplug_executor is not None:
+                hotplug_executor.shutdown(wait=False)
+            self._wakeup = None
+            logger.info("USB Monitor thread stopped")
+    
+    def is_running(self):
+        """Check if monitor is running"""
+        with self._lock:
+            return self.running and self._monitor_future is not None and not self._monitor_future.done()
+    
+    def is_paused(self):
+        """Check if monitor is paused"""
+        with self._lock:
+            return self.paused
+
+
+class SystemController:
+    """System control operations with proper privilege handling (cross-platform)"""
+    
+    @staticmethod
+    def check_sudo_available():
+        """Check if sudo is available (Linux only)"""
+        if IS_WINDOWS:
+            return False
+        try:
+            result = subprocess.run(['which', 'sudo'], 
+                                  stdout=subprocess.PIPE, 
+                                  stderr=subprocess.PIPE, 
+                                  timeout=5)
+            return result.returncode == 0
+        except subprocess.SubprocessError:
+            return False
+    
+    @staticmethod
+    def check_password_required():
+        """Check if sudo requires password (Linux only)"""
+        if IS_WINDOWS:
+            return False
+        try:
+            result = subprocess.run(['sudo', '-n', 'true'], 
+                                  stdout=subprocess.PIPE, 
+                                  stderr=subprocess.PIPE, 
+                                  timeout=5)
+            return result.returncode != 0
+        except subprocess.SubprocessError:
+            return True
+    
+    @classmethod
+    def shutdown_system(cls):
+        """Shutdown the system using the best available method (cross-platform)"""
+        if IS_WINDOWS:
+            return cls._shutdown_windows()
+        else:
+            return cls._shutdown_linux()
+    
+    @classmethod
+    def _shutdown_windows(cls):
+        """Shutdown Windows system"""
+        try:
+            # Windows shutdown command: /s = shutdown, /t 0 = immediately
+            subprocess.Popen(
+                ['shutdown', '/s', '/t', '0'],
+                creationflags=subprocess.CREATE_NO_WINDOW if hasattr(subprocess, 'CREATE_NO_WINDOW') else 0
+            )
+            logger.info("System shutdown initiated (Windows)")
+            return True
+        except Exception as e:
+            logger.error(f"Windows shutdown failed: {e}")
+            return False
+    
+    @classmethod
+    def _shutdown_linux(cls):
+        """Shutdown Linux system"""
+        commands = []
+        
+        if cls.check_sudo_available():
+            if not cls.check_password_required():
+                commands.extend([
+                    ['sudo', 'shutdown', '-h', 'now'],
+                    ['sudo', 'poweroff'],
+                    ['sudo', 'halt', '-p']
+                ])
+            else:
+                commands.extend([
+                    ['shutdown', '-h', 'now'],
                     ['poweroff'],
                     ['halt', '-p']
                 ])
@@ -444,90 +1799,1516 @@ class SystemController:
     def restart_system(cls):
         """Restart the system using the best available method (cross-platform)"""
         if IS_WINDOWS:
-            return cls._restart_windows()
+            return cls._restart_windows()
+        else:
+            return cls._restart_linux()
+    
+    @classmethod
+    def _restart_windows(cls):
+        """Restart Windows system"""
+        try:
+            # Windows restart command: /r = restart, /t 0 = immediately
+            subprocess.Popen(
+                ['shutdown', '/r', '/t', '0'],
+                creationflags=subprocess.CREATE_NO_WINDOW if hasattr(subprocess, 'CREATE_NO_WINDOW') else 0
+            )
+            logger.info("System restart initiated (Windows)")
+            return True
+        except Exception as e:
+            logger.error(f"Windows restart failed: {e}")
+            return False
+    
+    @classmethod
+    def _restart_linux(cls):
+        """Restart Linux system"""
+        commands = []
+        
+        if cls.check_sudo_available():
+            if not cls.check_password_required():
+                commands.extend([
+                    ['sudo', 'reboot'],
+                    ['sudo', 'shutdown', '-r', 'now']
+                ])
+            else:
+                commands.extend([
+                    ['reboot'],
+                    ['shutdown', '-r', 'now']
+                ])
+        else:
+            commands.extend([
+                ['reboot'],
+                ['shutdown', '-r', 'now']
+            ])
+        
+        return cls._execute_linux_command(commands, "restart")
+    
+    @staticmethod
+    def _execute_linux_command(commands, action):
+        """Execute Linux system commands with fallbacks"""
+        for cmd in commands:
+            try:
+                # Check if command exists
+                result = subprocess.run(['which', cmd[0]], 
+                                      stdout=subprocess.PIPE, 
+                                      stderr=subprocess.PIPE, 
+                                      timeout=5)
+                if result.returncode == 0:
+                    subprocess.Popen(cmd)
+                    logger.info(f"System {action} initiated with command: {' '.join(cmd)}")
+                    return True
+            except subprocess.SubprocessError as e:
+                logger.warning(f"Command {' '.join(cmd)} failed: {e}")
+                continue
+        
+        logger.error(f"All {action} commands failed")
+        return False
+
+
+class OutputRingBuffer:
+    """Bounded, thread-safe buffer of the most recent output lines"""
+
+    def __init__(self, max_lines=5000):
+        self._lines = deque(maxlen=max_lines)
+        self._next_seq = 0
+        self._lock = threading.Lock()
+
+    def append(self, stream, line):
+        with self._lock:
+            self._lines.append((stream, line))
+            self._next_seq += 1
+
+    def since(self, seq):
+        """Return (next_seq, lines) with the (stream, line) pairs appended after sequence number seq"""
+        with self._lock:
+            first_seq = self._next_seq - len(self._lines)
+            start = max(seq, first_seq) - first_seq
+            return self._next_seq, list(itertools.islice(self._lines, start, None))
+
+    def clear(self):
+        """Drop buffered lines, sequence numbers keep increasing"""
+        with self._lock:
+            self._lines.clear()
+
+
+class RotatingOutputLog:
+    """Output log file of one launch, rotated by size"""
+
+    def __init__(self, path, max_bytes=5 * 1024 * 1024, backup_count=3):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8', errors='replace')
+        self._size = self._file.tell()
+        self._stamp_second = None
+        self._stamp = ''
+
+    def write(self, stream, line):
+        with self._lock:
+            if self._file is None:
+                return
+            # Formatting the time once per second keeps chatty children cheap to log
+            now = int(time.time())
+            if now != self._stamp_second:
+                self._stamp_second = now
+                self._stamp = time.strftime('%H:%M:%S', time.localtime(now))
+            entry = f"{self._stamp} [{stream}] {line}\n"
+            if self._size + len(entry) > self.max_bytes:
+                self._rotate()
+            self._file.write(entry)
+            self._size += len(entry)
+
+    def _rotate(self):
+        self._file.close()
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        self._file = open(self.path, 'w', encoding='utf-8', errors='replace')
+        self._size = 0
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class ResourceRing:
+    """Fixed-size ring of resource samples, one array per field"""
+
+    FIELDS = ('timestamp', 'cpu_percent', 'rss_bytes', 'read_bytes_per_s', 'write_bytes_per_s')
+
+    def __init__(self, capacity=600):
+        self.capacity = capacity
+        self.count = 0
+        self._columns = {field: array('d', [0.0]) * capacity for field in self.FIELDS}
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def append(self, *values):
+        """Add one sample given in FIELDS order, overwriting the oldest when full"""
+        with self._lock:
+            for field, value in zip(self.FIELDS, values):
+                self._columns[field][self._next] = value
+            self._next = (self._next + 1) % self.capacity
+            self.count = min(self.count + 1, self.capacity)
+
+    def values(self, field, last=None):
+        """Return the samples of one field, oldest first"""
+        with self._lock:
+            count = self.count if last is None else min(last, self.count)
+            column = self._columns[field]
+            start = (self._next - count) % self.capacity
+            if start + count <= self.capacity:
+                return column[start:start + count].tolist()
+            return column[start:].tolist() + column[:self._next].tolist()
+
+    def latest(self):
+        """Return the newest sample as a dict, None if there is none yet"""
+        with self._lock:
+            if not self.count:
+                return None
+            index = (self._next - 1) % self.capacity
+            return {field: self._columns[field][index] for field in self.FIELDS}
+
+
+class ProcessSampler:
+    """Sample CPU, RSS and I/O of process trees from /proc on a MonitorCore loop.
+
+    Every watched root pid gets a ResourceRing summing the root and all its
+    descendants. Descendants are found through /proc/<pid>/task/<tid>/children,
+    or by scanning /proc for parent pids on kernels built without it.
+    """
+
+    def __init__(self, core, interval=1.0, capacity=600):
+        self.core = core
+        self.interval = interval
+        self.capacity = capacity
+        self.rings = {}
+        # Called on the event loop as on_sample(root_pid, ring) after every sample
+        self.on_sample = None
+        # root pid -> (timestamp, {pid: (cpu_ticks, read_bytes, write_bytes)}), only touched on the event loop
+        self._previous = {}
+        self._handle = None
+        self._children_supported = True
+        if self.available():
+            self._clock_ticks = os.sysconf('SC_CLK_TCK')
+            self._page_size = os.sysconf('SC_PAGE_SIZE')
+
+    @staticmethod
+    def available():
+        return IS_LINUX and os.path.exists('/proc/self/stat')
+
+    def watch(self, pid):
+        """Start sampling pid and its descendants, returns the ResourceRing receiving the samples"""
+        ring = ResourceRing(self.capacity)
+        # Keep the rings of finished processes only until the next launch
+        active = set(self._previous)
+        for old_pid in [old_pid for old_pid in self.rings if old_pid not in active]:
+            self.rings.pop(old_pid, None)
+        self.rings[pid] = ring
+        if self.available():
+            self.core.start()
+            self.core.call_soon(self._add_root, pid)
+        return ring
+
+    def unwatch(self, pid):
+        """Stop sampling pid, its ring stays readable until the next watch()"""
+        if self.available() and self.core.is_alive():
+            self.core.call_soon(self._previous.pop, pid, None)
+
+    def _add_root(self, pid):
+        self._previous[pid] = (time.monotonic(), {})
+        if self._handle is None:
+            self._tick()
+
+    def _tick(self):
+        self._handle = None
+        for root in list(self._previous):
+            try:
+                self.sample(root)
+            except Exception as e:
+                logger.error(f"Resource sampling of {root} failed: {e}")
+        if self._previous:
+            self._handle = self.core.loop.call_later(self.interval, self._tick)
+
+    def sample(self, root):
+        """Take one sample of the tree below root and append it to its ring"""
+        now = time.monotonic()
+        previous_time, previous = self._previous.get(root, (now, {}))
+        current = {}
+        rss_pages = 0
+        for pid in self.process_tree(root):
+            counters = self._read_process(pid)
+            if counters is not None:
+                ticks, pages, read_bytes, write_bytes = counters
+                current[pid] = (ticks, read_bytes, write_bytes)
+                rss_pages += pages
+        self._previous[root] = (now, current)
+        if not previous:
+            # The first reading only establishes the baseline of the counters
+            return
+        elapsed = max(now - previous_time, 1e-6)
+        ticks_delta = read_delta = write_delta = 0
+        for pid, (ticks, read_bytes, write_bytes) in current.items():
+            # Descendants born since the last sample count from zero
+            last_ticks, last_read, last_write = previous.get(pid, (0, 0, 0))
+            ticks_delta += max(ticks - last_ticks, 0)
+            read_delta += max(read_bytes - last_read, 0)
+            write_delta += max(write_bytes - last_write, 0)
+        ring = self.rings.get(root)
+        if ring is None:
+            return
+        ring.append(time.time(), ticks_delta / self._clock_ticks / elapsed * 100,
+                    rss_pages * self._page_size, read_delta / elapsed, write_delta / elapsed)
+        if self.on_sample is not None:
+            self.on_sample(root, ring)
+
+    def process_tree(self, root):
+        """Return root and the pids of all its descendants"""
+        if self._children_supported:
+            tree = [root]
+            for pid in tree:
+                children = self._read_children(pid)
+                if children is None:
+                    self._children_supported = False
+                    break
+                tree.extend(children)
+            else:
+                return tree
+        return self._scan_process_tree(root)
+
+    def _read_children(self, pid):
+        """Children of pid from /proc, None if the kernel does not provide the children file"""
+        try:
+            tids = os.listdir(f'/proc/{pid}/task')
+        except OSError:
+            return []
+        children = []
+        for tid in tids:
+            try:
+                with open(f'/proc/{pid}/task/{tid}/children', 'rb') as f:
+                    children.extend(int(child) for child in f.read().split())
+            except FileNotFoundError:
+                if not os.path.exists(f'/proc/{pid}/task/{tid}'):
+                    continue
+                return None
+            except OSError:
+                continue
+        return children
+
+    def _scan_process_tree(self, root):
+        """Find descendants through the parent pid of every process"""
+        children = {}
+        for entry in os.listdir('/proc'):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f'/proc/{entry}/stat', 'rb') as f:
+                    stat = f.read()
+            except OSError:
+                continue
+            parent = int(stat[stat.rindex(b')') + 2:].split()[1])
+            children.setdefault(parent, []).append(int(entry))
+        tree = [root]
+        for pid in tree:
+            tree.extend(children.get(pid, ()))
+        return tree
+
+    @staticmethod
+    def _read_process(pid):
+        """Return (cpu_ticks, rss_pages, read_bytes, write_bytes) of one process, None if it is gone"""
+        try:
+            with open(f'/proc/{pid}/stat', 'rb') as f:
+                stat = f.read()
+        except OSError:
+            return None
+        # Fields after the command name, which may itself contain spaces and parentheses
+        fields = stat[stat.rindex(b')') + 2:].split()
+        ticks = int(fields[11]) + int(fields[12])
+        rss_pages = int(fields[21])
+        read_bytes = write_bytes = 0
+        try:
+            with open(f'/proc/{pid}/io', 'rb') as f:
+                for line in f:
+                    if line.startswith(b'read_bytes:'):
+                        read_bytes = int(line.split()[1])
+                    elif line.startswith(b'write_bytes:'):
+                        write_bytes = int(line.split()[1])
+        except OSError:
+            # io is only readable for processes of the same user
+            pass
+        return ticks, rss_pages, read_bytes, write_bytes
+
+
+# Syscall numbers of ioprio_set, which has no libc wrapper
+IOPRIO_SET_SYSCALLS = {'x86_64': 251, 'i386': 289, 'i686': 289, 'aarch64': 30, 'ppc64le': 273, 's390x': 282}
+IOPRIO_WHO_PROCESS = 1
+IOPRIO_CLASS_SHIFT = 13
+
+# Windows priority classes used in place of nice levels
+BELOW_NORMAL_PRIORITY_CLASS = 0x4000
+IDLE_PRIORITY_CLASS = 0x40
+ABOVE_NORMAL_PRIORITY_CLASS = 0x8000
+
+# CPUs left to launched applications once the monitor is pinned (see pin_monitor_to_cpu)
+CHILD_CPUS = None
+
+
+def get_ioprio_set():
+    """Return a function(pid, io_class, level) setting a thread's I/O priority (pid 0 is the caller), None if unsupported"""
+    number = IOPRIO_SET_SYSCALLS.get(os.uname().machine) if IS_LINUX else None
+    if number is None or not ctypes.available():
+        return None
+    libc = ctypes.CDLL(None, use_errno=True)
+
+    def ioprio_set(pid, io_class, level):
+        if libc.syscall(number, IOPRIO_WHO_PROCESS, pid, (io_class << IOPRIO_CLASS_SHIFT) | level) != 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+
+    return ioprio_set
+
+
+def find_cgroup2_root():
+    """Return the cgroup v2 mount point, also on hybrid hierarchies, None if there is none"""
+    try:
+        with open('/proc/self/mounts') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) > 2 and fields[2] == 'cgroup2':
+                    return fields[1]
+    except OSError:
+        pass
+    return None
+
+
+def cgroup_procs_path(cgroup):
+    """Return the cgroup.procs file of a cgroup v2 directory, created if needed, relative paths are below the mount point"""
+    if not os.path.isabs(cgroup):
+        root = find_cgroup2_root()
+        if root is None:
+            raise OSError(f"No cgroup v2 hierarchy mounted for {cgroup}")
+        cgroup = os.path.join(root, cgroup)
+    os.makedirs(cgroup, exist_ok=True)
+    procs = os.path.join(cgroup, 'cgroup.procs')
+    if not os.access(procs, os.W_OK):
+        raise PermissionError(errno.EACCES, "Cannot move processes into the cgroup", procs)
+    return procs
+
+
+def pin_monitor_to_cpu(cpu):
+    """Pin all threads of this process to one CPU and keep launched applications off it.
+
+    Affinity is per thread on Linux, so threads that already run (the log
+    listener) are pinned through /proc/self/task, threads started later
+    inherit it.
+    """
+    global CHILD_CPUS
+    if not hasattr(os, 'sched_setaffinity'):
+        raise OSError("CPU affinity is not supported on this platform")
+    available = os.sched_getaffinity(0)
+    if cpu not in available:
+        raise ValueError(f"CPU {cpu} is not available, choose from {sorted(available)}")
+    try:
+        thread_ids = [int(name) for name in os.listdir('/proc/self/task')]
+    except OSError:
+        thread_ids = [0]
+    for thread_id in thread_ids:
+        try:
+            os.sched_setaffinity(thread_id, {cpu})
+        except ProcessLookupError:
+            # Thread exited meanwhile
+            pass
+    CHILD_CPUS = (available - {cpu}) or available
+    logger.info(f"Monitor pinned to CPU {cpu}, applications use CPUs {sorted(CHILD_CPUS)}")
+
+
+ELF_MAGIC = b'\x7fELF'
+PT_LOAD, PT_DYNAMIC, PT_INTERP = 1, 2, 3
+DT_NULL, DT_NEEDED, DT_STRTAB, DT_RPATH, DT_RUNPATH = 0, 1, 5, 15, 29
+DEFAULT_LIBRARY_DIRS = ('/lib64', '/usr/lib64', '/lib', '/usr/lib')
+_ld_so_conf_dirs = None
+
+
+def _read_c_string(f, offset, limit=4096):
+    f.seek(offset)
+    return f.read(limit).split(b'\0', 1)[0].decode('utf-8', errors='replace')
+
+
+def parse_elf_dependencies(path):
+    """Read the interpreter, DT_NEEDED libraries and library search paths of an ELF file.
+
+    Returns (interpreter, needed, rpath, runpath), interpreter is None for
+    shared libraries and static executables. $ORIGIN in DT_RPATH/DT_RUNPATH
+    is expanded to the file's directory.
+    """
+    with open(path, 'rb') as f:
+        header = f.read(64)
+        if len(header) < 52 or header[:4] != ELF_MAGIC:
+            raise ValueError(f"{path} is not an ELF file")
+        is_64 = header[4] == 2
+        endian = '<' if header[5] == 1 else '>'
+        if is_64:
+            phoff = struct.unpack_from(endian + 'Q', header, 32)[0]
+            phentsize, phnum = struct.unpack_from(endian + 'HH', header, 54)
+        else:
+            phoff = struct.unpack_from(endian + 'I', header, 28)[0]
+            phentsize, phnum = struct.unpack_from(endian + 'HH', header, 42)
+        f.seek(phoff)
+        table = f.read(phentsize * phnum)
+
+        loads = []
+        dynamic = None
+        interpreter = None
+        for index in range(min(phnum, len(table) // max(phentsize, 1))):
+            if is_64:
+                p_type, _, p_offset, p_vaddr, _, p_filesz = struct.unpack_from(
+                    endian + 'IIQQQQ', table, index * phentsize)
+            else:
+                p_type, p_offset, p_vaddr, _, p_filesz = struct.unpack_from(
+                    endian + 'IIIII', table, index * phentsize)
+            if p_type == PT_LOAD:
+                loads.append((p_vaddr, p_offset, p_filesz))
+            elif p_type == PT_DYNAMIC:
+                dynamic = (p_offset, p_filesz)
+            elif p_type == PT_INTERP:
+                interpreter = _read_c_string(f, p_offset, p_filesz)
+        if dynamic is None:
+            return interpreter, [], [], []
+
+        f.seek(dynamic[0])
+        data = f.read(dynamic[1])
+        entry_format = endian + ('qQ' if is_64 else 'iI')
+        entry_size = struct.calcsize(entry_format)
+        entries = []
+        for offset in range(0, len(data) - entry_size + 1, entry_size):
+            tag, value = struct.unpack_from(entry_format, data, offset)
+            if tag == DT_NULL:
+                break
+            entries.append((tag, value))
+
+        # DT_STRTAB is a virtual address, the file offset comes from the PT_LOAD covering it
+        strtab = None
+        strtab_address = dict(entries).get(DT_STRTAB)
+        for vaddr, offset, filesz in loads:
+            if strtab_address is not None and vaddr <= strtab_address < vaddr + filesz:
+                strtab = strtab_address - vaddr + offset
+        if strtab is None:
+            return interpreter, [], [], []
+
+        needed = [_read_c_string(f, strtab + value) for tag, value in entries if tag == DT_NEEDED]
+        paths = {tag: _read_c_string(f, strtab + value) for tag, value in entries if tag in (DT_RPATH, DT_RUNPATH)}
+
+    origin = os.path.dirname(os.path.abspath(path))
+    rpath, runpath = [[directory.replace('${ORIGIN}', origin).replace('$ORIGIN', origin)
+                       for directory in paths.get(tag, '').split(':') if directory]
+                      for tag in (DT_RPATH, DT_RUNPATH)]
+    return interpreter, needed, rpath, runpath
+
+
+def parse_pe_imports(path):
+    """Return the DLL names of the import table of a PE (Windows) executable"""
+    with open(path, 'rb') as f:
+        dos_header = f.read(64)
+        if len(dos_header) < 64 or dos_header[:2] != b'MZ':
+            raise ValueError(f"{path} is not a PE file")
+        f.seek(struct.unpack_from('<I', dos_header, 0x3C)[0])
+        coff_header = f.read(24)
+        if len(coff_header) < 24 or coff_header[:4] != b'PE\0\0':
+            raise ValueError(f"{path} is not a PE file")
+        section_count = struct.unpack_from('<H', coff_header, 6)[0]
+        optional_size = struct.unpack_from('<H', coff_header, 20)[0]
+        optional_header = f.read(optional_size)
+        # The data directories follow the PE32 or PE32+ optional header fields, the import table is entry 1
+        directories = 96 if struct.unpack_from('<H', optional_header, 0)[0] == 0x10b else 112
+        if len(optional_header) < directories + 16:
+            return []
+        import_rva = struct.unpack_from('<I', optional_header, directories + 8)[0]
+        sections = f.read(40 * section_count)
+
+        def rva_to_offset(rva):
+            for index in range(len(sections) // 40):
+                virtual_size, virtual_address, raw_size, raw_pointer = struct.unpack_from(
+                    '<IIII', sections, index * 40 + 8)
+                if virtual_address <= rva < virtual_address + max(virtual_size, raw_size):
+                    return rva - virtual_address + raw_pointer
+            return None
+
+        names = []
+        offset = rva_to_offset(import_rva) if import_rva else None
+        while offset is not None and len(names) < 512:
+            f.seek(offset)
+            descriptor = f.read(20)
+            if len(descriptor) < 20 or descriptor == bytes(20):
+                break
+            name_offset = rva_to_offset(struct.unpack_from('<I', descriptor, 12)[0])
+            if name_offset is not None:
+                names.append(_read_c_string(f, name_offset, 256))
+            offset += 20
+    return names
+
+
+def ld_so_conf_dirs(path='/etc/ld.so.conf'):
+    """Library directories listed in ld.so.conf and its includes, read once"""
+    global _ld_so_conf_dirs
+    if _ld_so_conf_dirs is not None and path == '/etc/ld.so.conf':
+        return _ld_so_conf_dirs
+    directories = []
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            lines = [line.split('#', 1)[0].strip() for line in f]
+    except OSError:
+        lines = []
+    for line in lines:
+        if line.startswith('include '):
+            pattern = line.split(None, 1)[1]
+            if not os.path.isabs(pattern):
+                pattern = os.path.join(os.path.dirname(path), pattern)
+            include_dir = os.path.dirname(pattern)
+            try:
+                names = sorted(fnmatch.filter(os.listdir(include_dir), os.path.basename(pattern)))
+            except OSError:
+                names = []
+            for name in names:
+                directories.extend(ld_so_conf_dirs(os.path.join(include_dir, name)))
+        elif line:
+            directories.append(line)
+    if path == '/etc/ld.so.conf':
+        _ld_so_conf_dirs = directories
+    return directories
+
+
+def _resolve_library(name, search_path):
+    if os.sep in name or (os.altsep and os.altsep in name):
+        return name if os.path.isfile(name) else None
+    for directory in search_path:
+        candidate = os.path.join(directory, name)
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+def find_dependencies(executable_path, max_files=64):
+    """Return the executable and the files it loads at startup, as far as they can be found.
+
+    ELF files are followed through their interpreter and DT_NEEDED entries
+    in the dynamic loader's order: DT_RPATH (only without DT_RUNPATH),
+    LD_LIBRARY_PATH, DT_RUNPATH, ld.so.conf, default directories. DT_RPATH
+    of the objects that load a library is not inherited. PE files are
+    followed through their import table (executable directory, then PATH)
+    and scripts through their #! interpreter.
+    """
+    environment_path = [d for d in os.environ.get('LD_LIBRARY_PATH', '').split(':') if d]
+    files = []
+    seen = set()
+    pending = [os.path.abspath(executable_path)]
+    while pending and len(files) < max_files:
+        path = pending.pop(0)
+        real_path = os.path.realpath(path)
+        if real_path in seen:
+            continue
+        seen.add(real_path)
+        files.append(path)
+        try:
+            with open(path, 'rb') as f:
+                magic = f.read(256)
+            if magic.startswith(b'#!'):
+                interpreter = magic[2:].split(b'\n', 1)[0].split()
+                if interpreter:
+                    pending.append(interpreter[0].decode('utf-8', errors='replace'))
+            elif magic.startswith(ELF_MAGIC):
+                interpreter, needed, rpath, runpath = parse_elf_dependencies(path)
+                if interpreter:
+                    pending.append(interpreter)
+                if runpath:
+                    directories = environment_path + runpath
+                else:
+                    directories = rpath + environment_path
+                directories += ld_so_conf_dirs() + list(DEFAULT_LIBRARY_DIRS)
+                for name in needed:
+                    library = _resolve_library(name, directories)
+                    if library is not None:
+                        pending.append(library)
+            elif magic.startswith(b'MZ'):
+                directories = [os.path.dirname(path)] + os.environ.get('PATH', '').split(os.pathsep)
+                for name in parse_pe_imports(path):
+                    # API set names are virtual, system DLLs are usually cached already
+                    if name.lower().startswith(('api-ms-', 'ext-ms-')):
+                        continue
+                    library = _resolve_library(name, [d for d in directories if d])
+                    if library is not None:
+                        pending.append(library)
+        except (OSError, ValueError, struct.error) as e:
+            logger.debug(f"Cannot read dependencies of {path}: {e}")
+    return files
+
+
+def prefetch_file(path):
+    """Start reading a file into the page cache in the background, returns its size"""
+    with open(path, 'rb', buffering=0) as f:
+        size = os.fstat(f.fileno()).st_size
+        if hasattr(os, 'posix_fadvise'):
+            # Queues readahead of the whole file and returns without waiting for it
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+        else:
+            # Windows: read it through once, the file cache keeps it
+            buffer = bytearray(1024 * 1024)
+            while f.readinto(buffer):
+                pass
+    return size
+
+
+def prefetch_executable(executable_path):
+    """Prefetch an executable and its shared libraries so that launching it starts from the page cache"""
+    started = time.monotonic()
+    total = 0
+    files = find_dependencies(executable_path)
+    for path in files:
+        try:
+            total += prefetch_file(path)
+        except OSError as e:
+            logger.debug(f"Cannot prefetch {path}: {e}")
+    PREFETCH_BYTES.inc(total)
+    logger.info(f"Prefetched {executable_path} and {len(files) - 1} dependencies, "
+                f"{total / 1024 ** 2:.1f} MB in {(time.monotonic() - started) * 1000:.0f} ms")
+    return files
+
+
+class LaunchPolicy:
+    """Scheduling policy of a launched application.
+
+    nice is added to the child's niceness, ioprio_class is 'realtime',
+    'best-effort' or 'idle' with ioprio_level 0-7 (0 is highest), cpus is
+    the list of CPUs of the affinity mask and cgroup a cgroup v2 directory,
+    relative to the cgroup2 mount unless absolute. stage runs a copy of the
+    executable's directory from the StagingCache instead of the original on
+    removable media. None leaves a setting alone.
+    """
+
+    FIELDS = ('nice', 'ioprio_class', 'ioprio_level', 'cpus', 'cgroup', 'stage')
+    IOPRIO_CLASSES = {'realtime': 1, 'best-effort': 2, 'idle': 3}
+
+    def __init__(self, nice=None, ioprio_class=None, ioprio_level=None, cpus=None, cgroup=None, stage=None):
+        if nice is not None and not -20 <= int(nice) <= 19:
+            raise ValueError(f"nice must be between -20 and 19, not {nice}")
+        if ioprio_class is not None and ioprio_class not in self.IOPRIO_CLASSES:
+            raise ValueError(f"ioprio_class must be one of {', '.join(self.IOPRIO_CLASSES)}, not {ioprio_class}")
+        if ioprio_level is not None and not 0 <= int(ioprio_level) <= 7:
+            raise ValueError(f"ioprio_level must be between 0 and 7, not {ioprio_level}")
+        if stage is not None and not isinstance(stage, bool):
+            raise ValueError(f"stage must be true or false, not {stage}")
+        self.nice = int(nice) if nice is not None else None
+        self.ioprio_class = ioprio_class
+        self.ioprio_level = int(ioprio_level) if ioprio_level is not None else None
+        self.cpus = sorted(int(cpu) for cpu in cpus) if cpus is not None else None
+        self.cgroup = cgroup
+        self.stage = stage
+
+    @classmethod
+    def from_dict(cls, data):
+        unknown = set(data) - set(cls.FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown launch policy settings: {', '.join(sorted(unknown))}")
+        return cls(**data)
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS if getattr(self, field) is not None}
+
+    def merged(self, other):
+        """Return this policy with the settings of other taking precedence"""
+        return LaunchPolicy(**dict(self.to_dict(), **other.to_dict()))
+
+    def creationflags(self):
+        """Windows priority class flags standing in for the nice level"""
+        if self.nice is None or self.nice == 0:
+            return 0
+        if self.nice < 0:
+            return ABOVE_NORMAL_PRIORITY_CLASS
+        return IDLE_PRIORITY_CLASS if self.nice >= 15 else BELOW_NORMAL_PRIORITY_CLASS
+
+    def __repr__(self):
+        settings = ', '.join(f"{key}={value!r}" for key, value in self.to_dict().items())
+        return f"LaunchPolicy({settings})"
+
+
+class LaunchPolicyStore:
+    """Per-executable launch policies read from a JSON file, reloaded when it changes.
+
+    {"default": {"nice": 10},
+     "executables": {"/opt/tools/flash_4761": {"cpus": [2, 3]}, "calib*": {"ioprio_class": "idle", "stage": true}}}
+
+    Keys match the absolute path or the file name of the executable and may use
+    shell wildcards, the first match in file order is merged over the default.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._mtime = None
+        self._default = LaunchPolicy()
+        self._rules = []
+        self._lock = threading.Lock()
+
+    def _reload(self):
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            self._mtime, self._default, self._rules = None, LaunchPolicy(), []
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            default = LaunchPolicy.from_dict(data.get('default', {}))
+            rules = [(pattern, LaunchPolicy.from_dict(settings))
+                     for pattern, settings in data.get('executables', {}).items()]
+        except (OSError, ValueError, TypeError) as e:
+            logger.error(f"Invalid launch policies in {self.path}, keeping the previous ones: {e}")
+            self._mtime = mtime
+            return
+        self._mtime, self._default, self._rules = mtime, default, rules
+
+    def lookup(self, executable_path):
+        """Return the LaunchPolicy of an executable"""
+        path = os.path.abspath(executable_path)
+        name = os.path.basename(path)
+        with self._lock:
+            self._reload()
+            for pattern, policy in self._rules:
+                if fnmatch.fnmatch(path, pattern) or fnmatch.fnmatch(name, pattern):
+                    return self._default.merged(policy)
+            return self._default
+
+
+STAGE_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def _kernel_copy(src_fd, dst_fd, size, chunk_size):
+    """Copy size bytes between file descriptors without a trip through user space.
+
+    Returns the bytes copied, or None if neither copy_file_range (Python 3.8)
+    nor sendfile can copy between these two files.
+    """
+    for method in ('copy_file_range', 'sendfile'):
+        if not hasattr(os, method):
+            continue
+        copied = 0
+        try:
+            while copied < size:
+                count = min(chunk_size, size - copied)
+                if method == 'copy_file_range':
+                    sent = os.copy_file_range(src_fd, dst_fd, count)
+                else:
+                    sent = os.sendfile(dst_fd, src_fd, copied, count)
+                if sent == 0:
+                    break
+                copied += sent
+            return copied
+        except OSError as e:
+            # Unsupported for this pair of file systems, nothing was written yet
+            if copied or e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF):
+                raise
+    return None
+
+
+def copy_file_chunked(source, destination, chunk_size=STAGE_CHUNK_SIZE):
+    """Copy source to a new file in chunks, in the kernel where possible, returns the bytes copied"""
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+        size = os.fstat(src.fileno()).st_size
+        copied = None if IS_WINDOWS else _kernel_copy(src.fileno(), dst.fileno(), size, chunk_size)
+        if copied is None:
+            shutil.copyfileobj(src, dst, chunk_size)
+            copied = dst.tell()
+    return copied
+
+
+HASH_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def hash_file(path, progress=None, chunk_size=HASH_CHUNK_SIZE):
+    """SHA-256 hex digest of a file, progress(done_bytes, total_bytes) is called after every chunk.
+
+    Reads go through one large reused buffer rather than mmap: reading a
+    mapping of a stick that is pulled meanwhile raises SIGBUS and kills the
+    whole process, a read() just fails.
+    """
+    digest = hashlib.sha256()
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as f:
+        total = os.fstat(f.fileno()).st_size
+        if hasattr(os, 'posix_fadvise'):
+            try:
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            except OSError:
+                pass
+        done = 0
+        while True:
+            count = f.readinto(buffer)
+            if not count:
+                break
+            # hashlib releases the GIL for large updates
+            digest.update(view[:count])
+            done += count
+            if progress is not None:
+                progress(done, total)
+    return digest.hexdigest()
+
+
+class ExecutableVerifier:
+    """Check executables against an allow-list of SHA-256 digests before they are launched.
+
+    The allow-list is a JSON file {"sha256": {"<hex digest>": "description"}}
+    reloaded when it changes, without it every executable is allowed. Digests
+    are cached by (device, inode, size, mtime), so unchanged files are hashed
+    once. Removable media can reuse device numbers and invent inode numbers
+    (vfat), so their digests are kept only in memory until forget_device()
+    is called on unmount, the others are saved in cache_path.
+    """
+
+    def __init__(self, allowlist_path, cache_path=None, max_cached=4096):
+        self.allowlist_path = allowlist_path
+        self.cache_path = cache_path
+        self.max_cached = max_cached
+        self._allowed = None
+        self._mtime = None
+        self._digests = None
+        # st_dev -> whether it is removable media
+        self._removable = {}
+        # file key -> Future of a hash in progress, so a file is hashed once at a time
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def file_key(st):
+        return f"{st.st_dev}:{st.st_ino}:{st.st_size}:{st.st_mtime_ns}"
+
+    @classmethod
+    def unchanged(cls, path, st):
+        """Check that path is still the file st was taken of, ctime catches a reset mtime"""
+        try:
+            current = os.stat(path)
+        except OSError:
+            return False
+        return cls.file_key(current) == cls.file_key(st) and current.st_ctime_ns == st.st_ctime_ns
+
+    def _reload(self):
+        try:
+            mtime = os.stat(self.allowlist_path).st_mtime
+        except OSError:
+            self._mtime, self._allowed = None, None
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.allowlist_path, 'r', encoding='utf-8') as f:
+                allowed = set(digest.lower() for digest in json.load(f)['sha256'])
+        except (OSError, ValueError, TypeError, KeyError, AttributeError) as e:
+            # Fail closed, an unreadable allow-list allows nothing
+            logger.error(f"Invalid executable allow-list {self.allowlist_path}: {e}")
+            allowed = set()
+        self._mtime, self._allowed = mtime, allowed
+
+    def enabled(self):
+        """Check whether an allow-list is configured"""
+        with self._lock:
+            self._reload()
+            return self._allowed is not None
+
+    def _load_cache(self):
+        if self._digests is not None:
+            return
+        self._digests = OrderedDict()
+        if not self.cache_path:
+            return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                self._digests.update(json.load(f))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable hash cache {self.cache_path}: {e}")
+
+    def _save_cache(self):
+        if not self.cache_path:
+            return
+        digests = {key: digest for key, digest in self._digests.items()
+                   if not self._removable.get(int(key.split(':', 1)[0]))}
+        temp_path = f"{self.cache_path}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(digests, f)
+            os.replace(temp_path, self.cache_path)
+        except OSError as e:
+            logger.warning(f"Cannot save hash cache {self.cache_path}: {e}")
+
+    def cached_digest(self, path):
+        """Return the cached digest of path, None if the file is new or changed"""
+        key = self.file_key(os.stat(path))
+        with self._lock:
+            self._load_cache()
+            return self._digests.get(key)
+
+    def digest(self, path, progress=None, st=None):
+        """SHA-256 of path, hashed only if the file changed since it was last hashed, st is its os.stat()"""
+        if st is None:
+            st = os.stat(path)
+        key = self.file_key(st)
+        with self._lock:
+            if IS_LINUX and st.st_dev not in self._removable:
+                self._removable[st.st_dev] = is_removable_device(f"{os.major(st.st_dev)}:{os.minor(st.st_dev)}")
+            self._load_cache()
+            digest = self._digests.get(key)
+            if digest is not None:
+                self._digests.move_to_end(key)
+                return digest
+            pending = self._in_flight.get(key)
+            hashing = pending is None
+            if hashing:
+                pending = self._in_flight[key] = futures.Future()
+        if not hashing:
+            # Hashed by another thread right now, e.g. selection and launch of the same file
+            return pending.result()
+
+        try:
+            started = time.monotonic()
+            digest = hash_file(path, progress)
+            EXECUTABLE_HASH_SECONDS.observe(time.monotonic() - started)
+            pending.set_result(digest)
+        except BaseException as e:
+            pending.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+        # A file modified while it was hashed is not cached
+        if self.file_key(os.stat(path)) == key:
+            with self._lock:
+                self._digests[key] = digest
+                while len(self._digests) > self.max_cached:
+                    self._digests.popitem(last=False)
+                self._save_cache()
+        return digest
+
+    def forget_device(self, device):
+        """Drop the digests of files on a device ("major:minor") that was unmounted"""
+        major, minor = device.split(':')
+        device_number = os.makedev(int(major), int(minor))
+        prefix = f"{device_number}:"
+        with self._lock:
+            # The device number may come back as different media
+            self._removable.pop(device_number, None)
+            self._load_cache()
+            for key in [key for key in self._digests if key.startswith(prefix)]:
+                del self._digests[key]
+
+    def allows(self, digest):
+        """Check a digest against the allow-list, anything is allowed without one"""
+        with self._lock:
+            self._reload()
+            return self._allowed is None or digest in self._allowed
+
+    def verify(self, path, progress=None, st=None):
+        """Return (allowed, digest), digest is None when no allow-list is configured"""
+        with self._lock:
+            self._reload()
+            allowed = self._allowed
+        if allowed is None:
+            return True, None
+        digest = self.digest(path, progress, st)
+        return digest in allowed, digest
+
+
+class StagingCache:
+    """Local copies of application directories, stored once per file content.
+
+    Files live under objects/ named by the SHA-256 of their content and
+    are put together into one tree per version of a staged directory under
+    trees/. The launched executable is hard-linked to its read-only object,
+    so the bytes that run are the ones its name vouches for; every other
+    file gets a private writable copy (a reflink where the file system
+    supports it), as the application may write into its directory and must
+    not change objects shared with other trees. index.json remembers size,
+    mtime and inode of every source file already copied, so relaunching from
+    an unchanged stick only stats its files. When objects and tree copies
+    exceed budget_bytes the least recently used trees of applications that
+    are not running are removed, with files the applications wrote into them.
+    """
+
+    def __init__(self, root, budget_bytes=2 * 1024 ** 3, workers=4):
+        self.root = root
+        self.budget_bytes = budget_bytes
+        self.workers = workers
+        self._index = None
+        self._pinned = {}
+        # Objects a running stage() reuses, kept by _evict until its tree is pinned
+        self._reserved = {}
+        self._lock = threading.Lock()
+
+    @property
+    def index_path(self):
+        return os.path.join(self.root, 'index.json')
+
+    def _load_index(self):
+        if self._index is not None:
+            return self._index
+        index = {'files': {}, 'objects': {}, 'trees': {}}
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            for key in index:
+                index[key] = dict(data.get(key, {}))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            logger.warning(f"Ignoring unreadable staging index {self.index_path}: {e}")
+        # Trees left half built by an interrupted run
+        try:
+            for name in os.listdir(os.path.join(self.root, 'trees')):
+                if name.endswith('.tmp'):
+                    shutil.rmtree(os.path.join(self.root, 'trees', name), ignore_errors=True)
+        except OSError:
+            pass
+        self._index = index
+        return index
+
+    def _save_index(self):
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def _object_path(self, name):
+        return os.path.join(self.root, 'objects', name[:2], name)
+
+    def _tree_path(self, key):
+        return os.path.join(self.root, 'trees', key)
+
+    @staticmethod
+    def _signature(st):
+        return [st.st_size, st.st_mtime_ns, st.st_ino]
+
+    def _scan(self, directory):
+        """List the regular files below directory as (relative path, path, stat)"""
+        files = []
+        for dirpath, dirnames, filenames in os.walk(directory):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if stat.S_ISREG(st.st_mode):
+                    files.append((os.path.relpath(path, directory), path, st))
+        return files
+
+    def _store(self, path, st):
+        """Copy one file into objects/, returns its object name"""
+        tmp_dir = os.path.join(self.root, 'objects', 'tmp')
+        os.makedirs(tmp_dir, exist_ok=True)
+        tmp_path = os.path.join(tmp_dir, f"{threading.get_ident()}-{os.path.basename(path)}")
+        try:
+            STAGE_COPIED_BYTES.inc(copy_file_chunked(path, tmp_path))
+            # Hashed from the local copy, the stick is read only once
+            name = hash_file(tmp_path) + ('-x' if st.st_mode & 0o111 else '')
+            object_path = self._object_path(name)
+            if os.path.exists(object_path):
+                os.unlink(tmp_path)
+            else:
+                os.chmod(tmp_path, 0o555 if name.endswith('-x') else 0o444)
+                os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                os.replace(tmp_path, object_path)
+            return name
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def _build_tree(self, key, manifest, linked):
+        """Put the objects of manifest together in trees/key, returns (tree path, bytes copied)
+
+        Paths in linked are hard links to their objects, the rest are copies.
+        """
+        tree_path = self._tree_path(key)
+        if os.path.isdir(tree_path):
+            return tree_path, None
+        tmp_path = f"{tree_path}.{threading.get_ident()}.tmp"
+        copied = 0
+        try:
+            for relative_path, name in manifest.items():
+                target = os.path.join(tmp_path, relative_path)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                if relative_path in linked:
+                    try:
+                        os.link(self._object_path(name), target)
+                        continue
+                    except OSError:
+                        # No hard links on this file system
+                        pass
+                copied += copy_file_chunked(self._object_path(name), target)
+                os.chmod(target, 0o755 if name.endswith('-x') else 0o644)
+            os.makedirs(tmp_path, exist_ok=True)
+            try:
+                os.replace(tmp_path, tree_path)
+            except OSError:
+                if not os.path.isdir(tree_path):
+                    raise
+                # Built by a concurrent stage() of the same version meanwhile
+                shutil.rmtree(tmp_path, ignore_errors=True)
+                return tree_path, None
+        except BaseException:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+        return tree_path, copied
+
+    def stage(self, directory, executable_path):
+        """Stage directory and return (tree key, local path of executable_path), None if it does not fit
+
+        Raises OSError for the mount point of a medium, which would copy all of it.
+        """
+        started = time.monotonic()
+        directory = os.path.abspath(directory)
+        if os.path.ismount(directory):
+            raise OSError(f"{directory} is a mount point, staging it would copy the whole medium")
+        relative_executable = os.path.relpath(os.path.abspath(executable_path), directory)
+        files = self._scan(directory)
+        # Objects plus the tree's private copies
+        if 2 * sum(st.st_size for _, _, st in files) > self.budget_bytes:
+            return None
+
+        manifest = {}
+        missing = []
+        with self._lock:
+            index = self._load_index()
+            for relative_path, path, st in files:
+                known = index['files'].get(path)
+                if (known is not None and known[:3] == self._signature(st)
+                        and os.path.exists(self._object_path(known[3]))):
+                    manifest[relative_path] = known[3]
+                else:
+                    missing.append((relative_path, path, st))
+            for name in manifest.values():
+                self._reserved[name] = self._reserved.get(name, 0) + 1
+        reserved = list(manifest.values())
+
+        try:
+            # Copied without the lock, release() and other stages go on meanwhile
+            if missing:
+                executor = futures.ThreadPoolExecutor(max_workers=self.workers)
+                try:
+                    stored = list(executor.map(lambda item: self._store(item[1], item[2]), missing))
+                finally:
+                    executor.shutdown(wait=True)
+            else:
+                stored = []
+
+            with self._lock:
+                for (relative_path, path, st), name in zip(missing, stored):
+                    manifest[relative_path] = name
+                    index['files'][path] = self._signature(st) + [name]
+                    index['objects'][name] = st.st_size
+                key = hashlib.sha256(json.dumps(sorted(manifest.items())).encode('utf-8')).hexdigest()[:32]
+                tree = index['trees'].setdefault(key, {'source': directory, 'files': manifest})
+                tree['used'] = time.time()
+                self._pinned[key] = self._pinned.get(key, 0) + 1
+        finally:
+            with self._lock:
+                for name in reserved:
+                    count = self._reserved.get(name, 0) - 1
+                    if count > 0:
+                        self._reserved[name] = count
+                    else:
+                        self._reserved.pop(name, None)
+
+        try:
+            tree_path, copied = self._build_tree(key, manifest, {relative_executable})
+        except BaseException:
+            self.release(key)
+            raise
+        with self._lock:
+            if copied is not None:
+                tree['bytes'] = copied
+            self._evict()
+            self._save_index()
+
+        STAGE_SECONDS.observe(time.monotonic() - started)
+        if missing:
+            logger.info(f"Staged {directory}: {len(missing)} of {len(files)} files copied")
+        return key, os.path.join(tree_path, relative_executable)
+
+    def digest(self, key, path):
+        """SHA-256 of a file staged in trees/key, taken from the name of its object"""
+        relative_path = os.path.relpath(path, self._tree_path(key))
+        with self._lock:
+            name = self._load_index()['trees'][key]['files'][relative_path]
+        return name[:-2] if name.endswith('-x') else name
+
+    def release(self, key):
+        """Allow eviction of a tree returned by stage() once its application has exited"""
+        with self._lock:
+            count = self._pinned.get(key, 0) - 1
+            if count > 0:
+                self._pinned[key] = count
+            else:
+                self._pinned.pop(key, None)
+
+    def size(self):
+        """Bytes of all stored objects and tree copies"""
+        with self._lock:
+            index = self._load_index()
+            return sum(index['objects'].values()) + sum(tree.get('bytes', 0) for tree in index['trees'].values())
+
+    def _evict(self):
+        """Remove least recently used trees until the objects fit the budget"""
+        index = self._index
+        total = sum(index['objects'].values()) + sum(tree.get('bytes', 0) for tree in index['trees'].values())
+        candidates = sorted((tree['used'], key) for key, tree in index['trees'].items() if key not in self._pinned)
+        for used, key in candidates:
+            if total <= self.budget_bytes:
+                break
+            tree = index['trees'].pop(key)
+            shutil.rmtree(self._tree_path(key), ignore_errors=True)
+            total -= tree.get('bytes', 0)
+            referenced = set(self._reserved)
+            for other in index['trees'].values():
+                referenced.update(other['files'].values())
+            for name in set(tree['files'].values()) - referenced:
+                total -= index['objects'].pop(name, 0)
+                try:
+                    os.chmod(self._object_path(name), 0o644)
+                    os.unlink(self._object_path(name))
+                except OSError:
+                    pass
+            index['files'] = {path: known for path, known in index['files'].items() if known[3] in index['objects']}
+            logger.info(f"Evicted staged copy of {tree['source']}")
+
+
+ProcessExit = namedtuple('ProcessExit', 'pid exit_code signal rusage')
+
+
+class ProcessSupervisor:
+    """Watch many child processes from one MonitorCore event loop.
+
+    On Linux each child gets a pidfd (os.pidfd_open, Python 3.9 and kernel
+    5.3 or newer) registered as a reader on the loop. Without pidfds children
+    are reaped with waitpid(WNOHANG) when SIGCHLD arrives, plus a slow poll as
+    a safety net because the signal handler can only be installed from the
+    main thread. Windows children are polled. The supervisor is the only
+    one to reap a child and sets its Popen.returncode, signals go through
+    send_signal() because Popen.send_signal() polls and may reap the child
+    itself, taking its rusage.
+    """
+
+    POLL_INTERVAL = 0.1
+    SIGCHLD_POLL_INTERVAL = 1.0
+
+    def __init__(self, core):
+        self.core = core
+        # pid -> (process, on_exit, pidfd), only touched on the event loop
+        self._children = {}
+        self._poll_handle = None
+        self._sigchld_installed = False
+        # Held while reaping, a child that is signalled under it cannot be reaped and its pid reused meanwhile
+        self._reap_lock = threading.Lock()
+
+    def watch(self, process, on_exit):
+        """Report the exit of a Popen child as a ProcessExit to on_exit, called on the event loop"""
+        pidfd = None
+        if IS_LINUX and hasattr(os, 'pidfd_open'):
+            try:
+                pidfd = os.pidfd_open(process.pid)
+            except OSError as e:
+                logger.debug(f"pidfd_open unavailable, reaping on SIGCHLD: {e}")
+        if pidfd is None and not IS_WINDOWS:
+            self._install_sigchld_handler()
+        self.core.start()
+        self.core.call_soon(self._add_child, process, on_exit, pidfd)
+
+    def active_count(self):
+        return len(self._children)
+
+    def send_signal(self, process, signum):
+        """Send signum to a child unless it has been reaped already, any thread"""
+        if IS_WINDOWS:
+            # No reaping race with handles, and TerminateProcess is all Windows offers
+            process.terminate()
+            return
+        with self._reap_lock:
+            if process.returncode is None:
+                os.kill(process.pid, signum)
+
+    def _install_sigchld_handler(self):
+        if self._sigchld_installed or threading.current_thread() is not threading.main_thread():
+            return
+        previous = signal.getsignal(signal.SIGCHLD)
+
+        def on_sigchld(signum, frame):
+            if self.core.is_alive():
+                self.core.call_soon(self._reap_all)
+            if callable(previous):
+                previous(signum, frame)
+
+        signal.signal(signal.SIGCHLD, on_sigchld)
+        self._sigchld_installed = True
+
+    def _add_child(self, process, on_exit, pidfd):
+        self._children[process.pid] = (process, on_exit, pidfd)
+        if pidfd is not None:
+            self.core.loop.add_reader(pidfd, self._reap, process.pid)
+        else:
+            # The child may have exited before it was registered
+            self._reap(process.pid)
+            self._schedule_poll()
+
+    def _schedule_poll(self):
+        if self._poll_handle is not None:
+            return
+        if not any(pidfd is None for _, _, pidfd in self._children.values()):
+            return
+        interval = self.SIGCHLD_POLL_INTERVAL if self._sigchld_installed else self.POLL_INTERVAL
+        self._poll_handle = self.core.loop.call_later(interval, self._poll)
+
+    def _poll(self):
+        self._poll_handle = None
+        self._reap_all()
+        self._schedule_poll()
+
+    def _reap_all(self):
+        for pid, (_, _, pidfd) in list(self._children.items()):
+            if pidfd is None:
+                self._reap(pid)
+
+    def _reap(self, pid):
+        """Collect the child's exit status and rusage if it has exited"""
+        child = self._children.get(pid)
+        if child is None:
+            return
+        process, on_exit, pidfd = child
+        if IS_WINDOWS:
+            if process.poll() is None:
+                return
+            process_exit = ProcessExit(pid, process.returncode, None, None)
         else:
-            return cls._restart_linux()
-    
-    @classmethod
-    def _restart_windows(cls):
-        """Restart Windows system"""
+            with self._reap_lock:
+                try:
+                    reaped_pid, status, rusage = os.wait4(pid, os.WNOHANG)
+                except ChildProcessError:
+                    # Reaped behind the supervisor's back, the status and rusage are lost
+                    logger.warning(f"Application {pid} was reaped elsewhere, exit status unknown")
+                    reaped_pid, status, rusage = pid, None, None
+                if reaped_pid == 0:
+                    return
+                process_exit = self._make_exit(process, status, rusage)
+        del self._children[pid]
+        if pidfd is not None:
+            self.core.loop.remove_reader(pidfd)
+            os.close(pidfd)
         try:
-            # Windows restart command: /r = restart, /t 0 = immediately
-            subprocess.Popen(
-                ['shutdown', '/r', '/t', '0'],
-                creationflags=subprocess.CREATE_NO_WINDOW if hasattr(subprocess, 'CREATE_NO_WINDOW') else 0
-            )
-            logger.info("System restart initiated (Windows)")
-            return True
+            on_exit(process_exit)
         except Exception as e:
-            logger.error(f"Windows restart failed: {e}")
-            return False
-    
-    @classmethod
-    def _restart_linux(cls):
-        """Restart Linux system"""
-        commands = []
-        
-        if cls.check_sudo_available():
-            if not cls.check_password_required():
-                commands.extend([
-                    ['sudo', 'reboot'],
-                    ['sudo', 'shutdown', '-r', 'now']
-                ])
-            else:
-                commands.extend([
-                    ['reboot'],
-                    ['shutdown', '-r', 'now']
-                ])
-        else:
-            commands.extend([
-                ['reboot'],
-                ['shutdown', '-r', 'now']
-            ])
-        
-        return cls._execute_linux_command(commands, "restart")
-    
+            logger.error(f"Process exit handler error: {e}")
+
     @staticmethod
-    def _execute_linux_command(commands, action):
-        """Execute Linux system commands with fallbacks"""
-        for cmd in commands:
-            try:
-                # Check if command exists
-                result = subprocess.run(['which', cmd[0]], 
-                                      stdout=subprocess.PIPE, 
-                                      stderr=subprocess.PIPE, 
-                                      timeout=5)
-                if result.returncode == 0:
-                    subprocess.Popen(cmd)
-                    logger.info(f"System {action} initiated with command: {' '.join(cmd)}")
-                    return True
-            except subprocess.SubprocessError as e:
-                logger.warning(f"Command {' '.join(cmd)} failed: {e}")
-                continue
-        
-        logger.error(f"All {action} commands failed")
-        return False
+    def _make_exit(process, status, rusage):
+        if status is None:
+            return ProcessExit(process.pid, process.returncode, None, None)
+        if os.WIFSIGNALED(status):
+            signal_number = os.WTERMSIG(status)
+            exit_code = -signal_number
+        else:
+            signal_number = None
+            exit_code = os.WEXITSTATUS(status)
+        # The supervisor owns reaping, Popen learns the exit status from here
+        process.returncode = exit_code
+        usage = {
+            'user_seconds': rusage.ru_utime,
+            'system_seconds': rusage.ru_stime,
+            'max_rss_kb': rusage.ru_maxrss,
+        }
+        return ProcessExit(process.pid, exit_code, signal_number, usage)
+
+
+class LaunchedProcess:
+    """A child started by ApplicationLauncher and its output capture"""
+
+    def __init__(self, process, executable_path):
+        self.process = process
+        self.pid = process.pid
+        self.executable_path = executable_path
+        self.started_at = time.monotonic()
+        self.output_log = None
+        # StagingCache tree the child runs from, None when it runs in place
+        self.staged_tree = None
+        self.reader_threads = []
+        self.exit = None
+        self.exited = threading.Event()
 
 
 class ApplicationLauncher:
     """Handle application launching and monitoring (cross-platform)"""
     
-    def __init__(self):
+    MAX_LINE_LENGTH = 64 * 1024
+    TERMINATE_TIMEOUT = 5
+    
+    def __init__(self, core=None, max_processes=1, sample_interval=1.0):
+        # Children are supervised on the core's event loop, without a shared core the launcher runs its own
+        self._owns_core = core is None
+        self.core = core if core is not None else MonitorCore()
+        self.supervisor = ProcessSupervisor(self.core)
+        self.sampler = ProcessSampler(self.core, interval=sample_interval)
+        self.sampler.on_sample = self._on_sample
+        self.max_processes = max_processes
+        # LaunchPolicyStore with per-executable nice, I/O priority, affinity and cgroup
+        self.policies = None
+        # StagingCache for executables whose policy asks for staging
+        self.staging = None
+        # ExecutableVerifier checking executables against the allow-list
+        self.verifier = None
+        self.processes = OrderedDict()
         self.current_process = None
-        self.process_monitor_thread = None
-        self.is_running = False
+        self.last_exit = None
         self.callbacks = {}
         self._lock = threading.Lock()
+        # stdout/stderr of the children are drained continuously so their pipes never fill up
+        self.output_buffer = OutputRingBuffer()
+        self.output_log_dir = None
+    
+    @property
+    def is_running(self):
+        return bool(self.processes)
+    
+    def can_launch(self):
+        """Check whether another application may be started"""
+        with self._lock:
+            return len(self.processes) < self.max_processes
     
     def set_callback(self, event, callback):
-        """Set callback for events (started, finished, error)"""
+        """Set callback for events (started, finished, exited, error, output, sample, verify_progress)"""
         self.callbacks[event] = callback
     
+    def resource_usage(self, pid=None):
+        """Return the latest resource sample of pid or the current process, None without samples"""
+        if pid is None:
+            process = self.current_process
+            pid = process.pid if process is not None else None
+        ring = self.sampler.rings.get(pid)
+        return ring.latest() if ring is not None else None
+    
+    def _on_sample(self, pid, ring):
+        if 'sample' in self.callbacks:
+            self.callbacks['sample'](pid, ring)
+    
     def launch_application(self, executable_path):
         """Launch external application (cross-platform)"""
-        with self._lock:
-            if self.is_running:
+        if not self.can_launch():
+            if self.max_processes == 1:
                 raise RuntimeError("Another application is already running")
+            raise RuntimeError(f"Application limit reached ({self.max_processes} running)")
         
         if not os.path.exists(executable_path):
             raise FileNotFoundError(f"Executable not found: {executable_path}")
@@ -536,103 +3317,1171 @@ class ApplicationLauncher:
         if IS_LINUX and not os.access(executable_path, os.X_OK):
             raise PermissionError(f"File is not executable: {executable_path}")
         
+        staged = child = None
         try:
             # Set working directory to executable's directory
             working_dir = os.path.dirname(os.path.abspath(executable_path))
+            policy = self.policies.lookup(executable_path) if self.policies is not None else LaunchPolicy()
+            launch_path = executable_path
+            if policy.stage and self.staging is not None:
+                try:
+                    staged = self.staging.stage(working_dir, executable_path)
+                    if staged is None:
+                        logger.warning(f"{working_dir} exceeds the staging budget, running it in place")
+                except OSError as e:
+                    logger.warning(f"Cannot stage {working_dir}, running it in place: {e}")
+                if staged is not None:
+                    launch_path = staged[1]
+                    working_dir = os.path.dirname(launch_path)
+            verified_stat = None
+            if self.verifier is not None:
+                if staged is not None:
+                    # The staged executable is a link to the object named by its digest, nothing to hash
+                    digest = self.staging.digest(*staged)
+                    allowed = self.verifier.allows(digest)
+                else:
+                    progress = self.callbacks.get('verify_progress')
+                    verified_stat = os.stat(executable_path)
+                    allowed, digest = self.verifier.verify(
+                        executable_path, progress and (lambda done, total: progress(executable_path, done, total)),
+                        verified_stat)
+                if not allowed:
+                    raise PermissionError(f"{os.path.basename(executable_path)} is not in the allow-list "
+                                          f"(sha256 {digest})")
+            if verified_stat is not None and not ExecutableVerifier.unchanged(launch_path, verified_stat):
+                raise PermissionError(f"{os.path.basename(executable_path)} changed after it was verified")
+            spawn_started = time.monotonic()
             
             # Platform-specific process creation
             if IS_WINDOWS:
-                # Windows: use CREATE_NO_WINDOW flag to hide console
-                self.current_process = subprocess.Popen(
-                    [executable_path],
+                # Windows: use CREATE_NO_WINDOW flag to hide console, the nice level maps to a priority class
+                process = subprocess.Popen(
+                    [launch_path],
                     cwd=working_dir,
                     stdout=subprocess.PIPE,
                     stderr=subprocess.PIPE,
-                    creationflags=subprocess.CREATE_NO_WINDOW if hasattr(subprocess, 'CREATE_NO_WINDOW') else 0
+                    creationflags=(subprocess.CREATE_NO_WINDOW if hasattr(subprocess, 'CREATE_NO_WINDOW') else 0)
+                    | policy.creationflags()
                 )
             else:
-                # Linux
-                self.current_process = subprocess.Popen(
-                    [executable_path],
+                # Linux: the child inherits nice, I/O priority, affinity and cgroup from the fork on
+                process = self._spawn_with_policy(
+                    policy,
+                    [launch_path],
                     cwd=working_dir,
                     stdout=subprocess.PIPE,
                     stderr=subprocess.PIPE
                 )
             
+            child = LaunchedProcess(process, executable_path)
+            child.staged_tree = staged[0] if staged is not None else None
+            APP_SPAWN_SECONDS.observe(child.started_at - spawn_started)
+            if policy.to_dict():
+                logger.info(f"Application {child.pid} launched with {policy}")
+            
             with self._lock:
-                self.is_running = True
+                first = not self.processes
+                self.processes[child.pid] = child
+                self.current_process = process
             
-            # Start monitoring thread
-            self.process_monitor_thread = threading.Thread(
-                target=self._monitor_process,
-                daemon=True
-            )
-            self.process_monitor_thread.start()
+            self._start_output_capture(child, clear=first)
+            self.supervisor.watch(process, lambda process_exit: self._on_process_exit(child, process_exit))
+            self.sampler.watch(child.pid)
             
             if 'started' in self.callbacks:
                 self.callbacks['started']()
             
-            logger.info(f"Application launched: {executable_path}")
+            logger.info(f"Application launched: {executable_path} (pid {child.pid})")
             return True
             
         except Exception as e:
             logger.error(f"Failed to launch application: {e}")
+            if staged is not None and child is None:
+                self.staging.release(staged[0])
+            if 'error' in self.callbacks:
+                self.callbacks['error'](str(e))
+            return False
+    
+    def _spawn_with_policy(self, policy, args, **kwargs):
+        """Popen from a short-lived thread that has the launch policy applied (Linux only).
+
+        Nice, I/O priority and affinity are per thread and inherited at fork, so
+        the child runs with them before its first instruction, and so does
+        every thread or process it creates. The spawn thread exits afterwards,
+        nothing has to be restored. A cgroup is joined by a shell that writes
+        its own pid to cgroup.procs and then execs the application.
+        """
+        if policy.cgroup:
+            try:
+                procs = cgroup_procs_path(policy.cgroup)
+                args = ['/bin/sh', '-c', 'echo $$ > "$0"; exec "$@"', procs] + list(args)
+            except OSError as e:
+                logger.warning(f"Cannot move the application to cgroup {policy.cgroup}: {e}")
+        result = {}
+        
+        def spawn():
+            try:
+                self._apply_thread_policy(policy)
+                result['process'] = subprocess.Popen(args, **kwargs)
+            except BaseException as e:
+                result['error'] = e
+        
+        thread = threading.Thread(target=spawn, name="ApplicationSpawn")
+        thread.start()
+        thread.join()
+        if 'error' in result:
+            raise result['error']
+        return result['process']
+    
+    def _apply_thread_policy(self, policy):
+        """Apply nice, I/O priority and affinity to the calling thread, settings that fail are logged and skipped"""
+        if policy.nice:
+            try:
+                os.setpriority(os.PRIO_PROCESS, 0, os.getpriority(os.PRIO_PROCESS, 0) + policy.nice)
+            except OSError as e:
+                logger.warning(f"Nice level {policy.nice} was not applied to the application: {e}")
+        io_class = LaunchPolicy.IOPRIO_CLASSES.get(policy.ioprio_class)
+        if io_class is not None:
+            ioprio_set = get_ioprio_set()
+            level = policy.ioprio_level if policy.ioprio_level is not None else 4
+            if ioprio_set is None:
+                logger.warning("I/O priority is not supported here, not applied to the application")
+            else:
+                try:
+                    ioprio_set(0, io_class, level)
+                except OSError as e:
+                    logger.warning(f"I/O priority {policy.ioprio_class} was not applied to the application: {e}")
+        cpus = policy.cpus if policy.cpus is not None else CHILD_CPUS
+        if cpus is not None:
+            try:
+                os.sched_setaffinity(0, set(cpus))
+            except (OSError, ValueError) as e:
+                logger.warning(f"CPU affinity {sorted(cpus)} was not applied to the application: {e}")
+    
+    def _start_output_capture(self, child, clear=True):
+        """Start reader threads draining the child's stdout and stderr"""
+        if clear:
+            self.output_buffer.clear()
+        if self.output_log_dir:
+            try:
+                os.makedirs(self.output_log_dir, exist_ok=True)
+                name = os.path.splitext(os.path.basename(child.executable_path))[0]
+                log_name = f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{child.pid}.log"
+                child.output_log = RotatingOutputLog(os.path.join(self.output_log_dir, log_name))
+            except OSError as e:
+                logger.warning(f"Cannot create application output log: {e}")
+        
+        for stream_name, pipe in (('stdout', child.process.stdout),
+                                  ('stderr', child.process.stderr)):
+            reader = threading.Thread(
+                target=self._read_output,
+                args=(pipe, stream_name, child.output_log),
+                daemon=True
+            )
+            reader.start()
+            child.reader_threads.append(reader)
+    
+    def _read_output(self, pipe, stream_name, output_log):
+        """Read one pipe line by line until the child closes it"""
+        try:
+            for raw_line in iter(lambda: pipe.readline(self.MAX_LINE_LENGTH), b''):
+                line = raw_line.decode('utf-8', errors='replace').rstrip('\r\n')
+                self.output_buffer.append(stream_name, line)
+                if output_log is not None:
+                    output_log.write(stream_name, line)
+                if 'output' in self.callbacks:
+                    self.callbacks['output'](stream_name, line)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Application {stream_name} capture stopped: {e}")
+        finally:
+            try:
+                pipe.close()
+            except OSError:
+                pass
+    
+    def _finish_output_capture(self, child):
+        """Wait for the readers to drain the pipes and close the output log"""
+        for reader in child.reader_threads:
+            # Grandchildren may keep the pipes open, so do not wait forever
+            reader.join(timeout=2)
+        child.reader_threads = []
+        if child.output_log is not None:
+            child.output_log.close()
+            child.output_log = None
+    
+    def _on_process_exit(self, child, process_exit):
+        """Supervisor callback on the core's event loop"""
+        # Draining the output pipes may block briefly, keep it off the event loop
+        self.core.loop.run_in_executor(None, self._finish_process, child, process_exit)
+    
+    def _finish_process(self, child, process_exit):
+        """Close out an exited child and report it"""
+        try:
+            APP_LIFETIME_SECONDS.observe(time.monotonic() - child.started_at)
+            self.sampler.unwatch(child.pid)
+            self._finish_output_capture(child)
+            if child.staged_tree is not None:
+                self.staging.release(child.staged_tree)
+            
+            with self._lock:
+                self.processes.pop(child.pid, None)
+                self.last_exit = process_exit
+            child.exit = process_exit
+            child.exited.set()
+            
+            if 'exited' in self.callbacks:
+                self.callbacks['exited'](process_exit)
+            if 'finished' in self.callbacks:
+                self.callbacks['finished'](process_exit.exit_code)
+            
+            if process_exit.signal is not None:
+                logger.info(f"Application {child.pid} killed by signal {process_exit.signal}")
+            else:
+                logger.info(f"Application {child.pid} finished with exit code: {process_exit.exit_code}")
+            if process_exit.rusage is not None:
+                usage = process_exit.rusage
+                logger.info(f"Application {child.pid} used {usage['user_seconds']:.2f}s user, "
+                            f"{usage['system_seconds']:.2f}s system, {usage['max_rss_kb']} KB max RSS")
+            
+        except Exception as e:
+            logger.error(f"Process monitoring error: {e}")
+            with self._lock:
+                self.processes.pop(child.pid, None)
+            child.exited.set()
             if 'error' in self.callbacks:
                 self.callbacks['error'](str(e))
+    
+    def terminate_application(self, pid=None):
+        """Terminate the running application with the given pid, or all of them"""
+        with self._lock:
+            children = [child for child in self.processes.values() if pid is None or child.pid == pid]
+        if not children:
+            return True
+        
+        try:
+            for child in children:
+                self.supervisor.send_signal(child.process, signal.SIGTERM)
+            
+            # Wait for graceful termination, the supervisor reaps the children
+            deadline = time.monotonic() + self.TERMINATE_TIMEOUT
+            for child in children:
+                if not child.exited.wait(max(0, deadline - time.monotonic())):
+                    # Force kill if not terminated gracefully
+                    self.supervisor.send_signal(child.process, getattr(signal, 'SIGKILL', signal.SIGTERM))
+            for child in children:
+                child.exited.wait(self.TERMINATE_TIMEOUT)
+            
+            logger.info("Application terminated")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Failed to terminate application: {e}")
             return False
     
-    def _monitor_process(self):
-        """Monitor the launched process"""
+    def stop(self):
+        """Stop the launcher's own event loop, a shared core is left running"""
+        if self._owns_core:
+            self.core.stop()
+
+
+def get_volume_id(path):
+    """Return an identifier of the filesystem holding path that survives re-mounting"""
+    try:
+        if IS_WINDOWS and ctypes.available():
+            drive = os.path.splitdrive(os.path.abspath(path))[0] + '\\'
+            serial = ctypes.c_ulong(0)
+            if ctypes.windll.kernel32.GetVolumeInformationW(
+                    ctypes.c_wchar_p(drive), None, 0, ctypes.byref(serial), None, None, None, 0):
+                return f"serial:{serial.value:08X}"
+        elif IS_LINUX:
+            st_dev = os.stat(path).st_dev
+            device_name = os.path.basename(os.path.realpath(
+                f"/sys/dev/block/{os.major(st_dev)}:{os.minor(st_dev)}"))
+            by_uuid = '/dev/disk/by-uuid'
+            if os.path.isdir(by_uuid):
+                for uuid in os.listdir(by_uuid):
+                    if os.path.basename(os.path.realpath(os.path.join(by_uuid, uuid))) == device_name:
+                        return f"uuid:{uuid}"
+        return f"dev:{os.stat(path).st_dev}"
+    except Exception as e:
+        logger.debug(f"Cannot determine volume of {path}: {e}")
+        return "unknown"
+
+
+class ExecutableIndexCache:
+    """Persistent index of executables per (volume, directory) with LRU eviction.
+
+    Each indexed tree stores, per relative directory, its mtime together with
+    its files and subdirectories. Every file is kept as [name, mode, mtime_ns,
+    executable], so that a chmod or an in-place rewrite, which leave the
+    directory mtime alone, is noticed with one stat per file. Directories whose
+    mtime is unchanged are reused without listing them again.
+    """
+
+    VERSION = 2
+
+    def __init__(self, path, max_roots=16, max_directories=20000):
+        self.path = path
+        self.max_roots = max_roots
+        self.max_directories = max_directories
+        self._roots = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(directory):
+        directory = os.path.abspath(directory)
+        return f"{get_volume_id(directory)}|{directory}"
+
+    def get_tree(self, key):
+        """Return the cached {relative_dir: [mtime_ns, files, subdirectories]} of a tree"""
+        with self._lock:
+            self._load()
+            tree = self._roots.get(key)
+            if tree is not None:
+                self._roots.move_to_end(key)
+            return tree
+
+    def put_tree(self, key, tree):
+        """Store a tree as most recently used, evicting the least recently used trees"""
+        if len(tree) > self.max_directories:
+            return
+        with self._lock:
+            self._load()
+            self._roots[key] = tree
+            self._roots.move_to_end(key)
+            while len(self._roots) > self.max_roots:
+                self._roots.popitem(last=False)
+            self._save()
+
+    def _load(self):
+        if self._roots is not None:
+            return
+        self._roots = OrderedDict()
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == self.VERSION:
+                for key, tree in data.get('roots', []):
+                    self._roots[key] = tree
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable executable index {self.path}: {e}")
+
+    def _save(self):
+        temp_path = f"{self.path}.tmp"
+        try:
+            # dumps() runs the C encoder, dump() streams through the much slower Python one
+            data = json.dumps({'version': self.VERSION, 'roots': list(self._roots.items())})
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Cannot save executable index {self.path}: {e}")
+
+
+class ExecutableScanner:
+    """Cancellable background search for executables using os.scandir.
+
+    Hidden and system directories and symlinked directories are pruned, and the
+    walk stops at max_depth / max_entries so huge media cannot stall it.
+    Found paths are collected in order and read with found_since() while the
+    walk is running, so the results can be shown more than once. With
+    an ExecutableIndexCache, directories with an unchanged mtime are taken
+    from the index instead of being listed, and only their files are stat'ed
+    again.
+    """
+
+    SKIPPED_DIRECTORIES = {
+        '$RECYCLE.BIN', 'System Volume Information', 'lost+found',
+        '__pycache__', 'node_modules'
+    }
+
+    def __init__(self, directory, max_depth=10, max_entries=200000, cache=None):
+        self.directory = directory
+        self.max_depth = max_depth
+        self.max_entries = max_entries
+        self.cache = cache
+        self.scanned_entries = 0
+        self.reused_directories = 0
+        self.truncated = False
+        self.error = None
+        self.done = threading.Event()
+        self._cancel = threading.Event()
+        self._found = []
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def is_cancelled(self):
+        return self._cancel.is_set()
+
+    def found_since(self, start):
+        """Return the executables found after the first start ones"""
+        return self._found[start:]
+
+    def _run(self):
+        try:
+            for executable in self.walk():
+                self._found.append(executable)
+        except Exception as e:
+            logger.error(f"Error finding executables: {e}")
+            self.error = e
+        finally:
+            self.done.set()
+
+    def walk(self):
+        """Yield executable paths below the directory, depth first"""
+        cache_key = self.cache.make_key(self.directory) if self.cache is not None else None
+        cached_tree = self.cache.get_tree(cache_key) if cache_key is not None else None
+        tree = {}
+        stack = [(self.directory, 0)]
+        while stack and not self._cancel.is_set():
+            path, depth = stack.pop()
+            relative_path = os.path.relpath(path, self.directory)
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                mtime = None
+            cached = cached_tree.get(relative_path) if cached_tree else None
+            if cached is not None and mtime is not None and cached[0] == mtime:
+                self.reused_directories += 1
+                files = self.revalidate_files(path, cached[1])
+                subdirectories = [os.path.join(path, name) for name in cached[2]]
+            else:
+                files, subdirectories = self.scan_directory(path)
+            tree[relative_path] = [mtime, files, [os.path.basename(p) for p in subdirectories]]
+            for name, mode, file_mtime, executable in files:
+                if executable:
+                    yield os.path.join(path, name)
+            if self.scanned_entries >= self.max_entries:
+                self.truncated = True
+                logger.warning(f"Executable search stopped after {self.scanned_entries} entries")
+                return
+            if depth < self.max_depth:
+                stack.extend((subdirectory, depth + 1) for subdirectory in reversed(subdirectories))
+            elif subdirectories:
+                self.truncated = True
+        
+        # Only complete walks are indexed, a partial tree would hide directories
+        if cache_key is not None and not stack and not self._cancel.is_set() and tree != cached_tree:
+            self.cache.put_tree(cache_key, tree)
+
+    def scan_directory(self, path):
+        """List one directory, returns (files, subdirectories) sorted by name.
+
+        files are [name, mode, mtime_ns, executable] records of the regular
+        files, subdirectories are full paths.
+        """
+        files = []
+        subdirectories = []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    self.scanned_entries += 1
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if not entry.name.startswith('.') and entry.name not in self.SKIPPED_DIRECTORIES:
+                                subdirectories.append(entry.path)
+                        elif entry.is_file():
+                            files.append(self.file_record(entry.name, entry.path, entry.stat()))
+                    except OSError:
+                        continue
+        except OSError as e:
+            logger.warning(f"Cannot read directory {path}: {e}")
+        files.sort()
+        subdirectories.sort()
+        return files, subdirectories
+
+    def revalidate_files(self, path, cached_files):
+        """Stat the cached files of an unchanged directory, re-checking those whose mode or mtime changed"""
+        files = []
+        # Relative to a directory fd the kernel does not resolve the whole path again for every file
+        dir_fd = None
+        if os.stat in os.supports_dir_fd:
+            try:
+                dir_fd = os.open(path, os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0))
+            except OSError:
+                return files
+        try:
+            for record in cached_files:
+                name, mode, mtime = record[:3]
+                self.scanned_entries += 1
+                try:
+                    st = os.stat(name, dir_fd=dir_fd) if dir_fd is not None else os.stat(os.path.join(path, name))
+                except OSError:
+                    continue
+                if st.st_mode == mode and st.st_mtime_ns == mtime:
+                    files.append(record)
+                elif stat.S_ISREG(st.st_mode):
+                    files.append(self.file_record(name, os.path.join(path, name), st))
+        finally:
+            if dir_fd is not None:
+                os.close(dir_fd)
+        return files
+
+    @classmethod
+    def file_record(cls, name, path, st):
+        return [name, st.st_mode, st.st_mtime_ns, cls.is_executable(name, path, st)]
+
+    @staticmethod
+    def is_executable(name, path, st):
+        """Check a regular file for an executable (cross-platform)"""
+        if IS_WINDOWS:
+            # On Windows, look for .exe files
+            return name.lower().endswith('.exe')
+        # On Linux, check executable permission
+        return bool(st.st_mode & (stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)) and os.access(path, os.X_OK)
+
+
+MountEntry = namedtuple('MountEntry', 'mount_id device mount_point fstype source')
+
+
+def _unescape_mount_field(field):
+    # mountinfo writes space, tab, newline and backslash as octal escapes
+    return re.sub(r'\\([0-7]{3})', lambda match: chr(int(match.group(1), 8)), field)
+
+
+def parse_mountinfo(text):
+    """Parse /proc/self/mountinfo into MountEntry tuples"""
+    mounts = []
+    for line in text.splitlines():
+        fields = line.split()
+        # Optional fields end with "-", followed by fstype and source
+        if '-' not in fields[6:]:
+            continue
+        separator = fields.index('-', 6)
+        if len(fields) < separator + 3:
+            continue
+        mounts.append(MountEntry(
+            mount_id=int(fields[0]),
+            device=fields[2],
+            mount_point=_unescape_mount_field(fields[4]),
+            fstype=fields[separator + 1],
+            source=_unescape_mount_field(fields[separator + 2])
+        ))
+    return mounts
+
+
+def is_removable_mount(entry, sysfs_root='/sys'):
+    """Check whether a mount is backed by removable media (sysfs removable flag or a USB block device)"""
+    return is_removable_device(entry.device, sysfs_root)
+
+
+def is_removable_device(device, sysfs_root='/sys'):
+    """Check whether a block device ("major:minor") is removable media"""
+    device_path = os.path.join(sysfs_root, 'dev', 'block', device)
+    if not os.path.exists(device_path):
+        return False
+    device_path = os.path.realpath(device_path)
+    # USB disks often report removable=0, but sit below a USB device in the sysfs tree
+    if '/usb' in device_path:
+        return True
+    # Partitions have no removable attribute of their own, their disk is the parent directory
+    for directory in (device_path, os.path.dirname(device_path)):
+        try:
+            with open(os.path.join(directory, 'removable')) as f:
+                return f.read().strip() == '1'
+        except OSError:
+            continue
+    return False
+
+
+class MountWatcher:
+    """Report removable media as it is mounted and unmounted (Linux only).
+
+    The kernel flags an open /proc/self/mountinfo with POLLPRI whenever the
+    mount table changes, so the watcher thread sleeps in poll() and re-reads
+    the table only after a change. on_mount(entry) and on_unmount(entry) are
+    called on the watcher thread, media already mounted at start() are
+    reported as mounted.
+    """
+
+    def __init__(self, on_mount=None, on_unmount=None, mountinfo_path='/proc/self/mountinfo',
+                 classify=is_removable_mount):
+        self.on_mount = on_mount
+        self.on_unmount = on_unmount
+        self.mountinfo_path = mountinfo_path
+        self.classify = classify
+        self._media = OrderedDict()
+        self._classified = {}
+        self._file = None
+        self._wake_fds = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def available(self):
+        """Check for a pollable mount table"""
+        return IS_LINUX and hasattr(select, 'poll') and os.path.exists(self.mountinfo_path)
+
+    def media(self):
+        """Mounted removable media in mount order"""
+        with self._lock:
+            return list(self._media.values())
+
+    def start(self):
+        """Start the watcher thread, returns False without a pollable mount table"""
+        if self._thread is not None or not self.available():
+            return False
+        try:
+            self._file = open(self.mountinfo_path, 'rb')
+        except OSError as e:
+            logger.warning(f"Cannot watch {self.mountinfo_path}: {e}")
+            return False
+        self._wake_fds = os.pipe()
+        self._refresh()
+        self._thread = threading.Thread(target=self._run, name='mount-watcher', daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        """Stop the watcher thread"""
+        if self._thread is None:
+            return
+        os.write(self._wake_fds[1], b'x')
+        self._thread.join(timeout=2)
+        self._thread = None
+        self._file.close()
+        for fd in self._wake_fds:
+            os.close(fd)
+
+    def _run(self):
+        poller = select.poll()
+        poller.register(self._file.fileno(), select.POLLPRI | select.POLLERR)
+        poller.register(self._wake_fds[0], select.POLLIN)
+        while True:
+            try:
+                events = poller.poll()
+            except InterruptedError:
+                continue
+            if any(fd == self._wake_fds[0] for fd, _ in events):
+                return
+            try:
+                self._refresh()
+            except Exception as e:
+                logger.error(f"Mount watcher error: {e}")
+
+    def _refresh(self):
+        """Re-read the mount table and report removable media that came or went"""
+        self._file.seek(0)
+        mounts = parse_mountinfo(self._file.read().decode('utf-8', errors='replace'))
+        current = OrderedDict()
+        for entry in mounts:
+            removable = self._classified.get(entry.mount_id)
+            if removable is None:
+                removable = self._classified[entry.mount_id] = self.classify(entry)
+            if removable:
+                current[entry.mount_point] = entry
+        live_ids = set(entry.mount_id for entry in mounts)
+        self._classified = {mount_id: removable for mount_id, removable in self._classified.items()
+                            if mount_id in live_ids}
+
+        with self._lock:
+            previous, self._media = self._media, current
+        for mount_point, entry in previous.items():
+            if current.get(mount_point) != entry:
+                logger.info(f"Removable media unmounted from {mount_point}")
+                if self.on_unmount is not None:
+                    self.on_unmount(entry)
+        for mount_point, entry in current.items():
+            if previous.get(mount_point) != entry:
+                logger.info(f"Removable media {entry.source} mounted at {mount_point}")
+                if self.on_mount is not None:
+                    self.on_mount(entry)
+
+
+class DeviceDaemon:
+    """Headless USBMonitor and ApplicationLauncher served over a Unix domain socket.
+
+    Clients send one JSON object per line, {"cmd": ...}, and get one JSON line
+    back with "ok" set. Commands are status, metrics, launch (with "path"),
+    terminate (optionally with "pid"), pause, resume and subscribe. A subscribed connection receives a stream of
+    {"event": ..., "data": ...} lines starting with a full device_status.
+    """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET_PATH, max_processes=1, sample_interval=1.0, debouncer=None,
+                 max_poll_interval=None):
+        self.socket_path = socket_path
+        self.device_queue = CoalescingChannel(name='daemon')
+        DEVICE_QUEUE_DEPTH.set_function(self.device_queue.qsize)
+        self.control_queue = queue.Queue()
+        self.core = MonitorCore()
+        self.usb_monitor = USBMonitor(self.device_queue, self.control_queue, core=self.core)
+        if debouncer is not None:
+            self.usb_monitor.debouncer = debouncer
+        if max_poll_interval is not None:
+            self.usb_monitor.max_monitoring_interval = max_poll_interval
+        self.app_launcher = ApplicationLauncher(core=self.core, max_processes=max_processes,
+                                                sample_interval=sample_interval)
+        self.app_launcher.set_callback('started', lambda: self.broadcast('app_started', self.executable))
+        self.app_launcher.set_callback('exited', lambda process_exit: self.broadcast('app_exited', process_exit._asdict()))
+        self.app_launcher.set_callback('finished', lambda exit_code: self.broadcast('app_finished', exit_code))
+        self.app_launcher.set_callback('error', lambda error_msg: self.broadcast('app_error', error_msg))
+        self.app_launcher.output_log_dir = os.path.join(guard_directory('log'), 'app_output')
+        self.app_launcher.policies = LaunchPolicyStore(
+            os.path.join(guard_directory('config'), 'launch_policies.json'))
+        self.app_launcher.staging = StagingCache(os.path.join(guard_directory('cache'), 'stage_cache'))
+        self.app_launcher.verifier = ExecutableVerifier(
+            os.path.join(guard_directory('config'), 'allowed_executables.json'),
+            os.path.join(guard_directory('cache'), 'hash_cache.json'))
+        self.usb_monitor.set_slot_map_path(os.path.join(guard_directory('state'), 'card_slots.json'))
+        self.usb_monitor.is_busy = lambda: self.app_launcher.is_running
+        self.device_status = {}
+        self.executable = None
+        self.server = None
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def serve_forever(self):
+        """Run until stop() is called or SIGTERM/SIGINT is received"""
+        self._prepare_socket_directory()
+        self._remove_stale_socket()
+        daemon = self
+
+        class RequestHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                daemon.handle_connection(self.rfile, self.wfile)
+
+        self.server = socketserver.ThreadingUnixStreamServer(self.socket_path, RequestHandler)
+        self.server.daemon_threads = True
+        os.chmod(self.socket_path, 0o660)
+        server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        server_thread.start()
+        dispatcher_thread = threading.Thread(target=self._dispatch_events, daemon=True)
+        dispatcher_thread.start()
+
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda signum, frame: self.stop())
+
+        self.usb_monitor.start_monitoring()
+        logger.info(f"Device daemon listening on {self.socket_path}")
+        while not self._stop_event.wait(1.0):
+            pass
+
+        logger.info("Device daemon stopping")
+        self.app_launcher.terminate_application()
+        self.usb_monitor.stop_monitoring()
+        self.core.stop()
+        self.server.shutdown()
+        self.server.server_close()
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _prepare_socket_directory(self):
+        """Create the socket's directory, refuse one that others could swap the socket in"""
+        directory = os.path.dirname(os.path.abspath(self.socket_path))
+        try:
+            # Group members may connect, see the socket's 0o660
+            os.mkdir(directory, 0o750)
+        except FileExistsError:
+            pass
+        st = os.lstat(directory)
+        if not stat.S_ISDIR(st.st_mode):
+            raise RuntimeError(f"Socket directory {directory} is not a directory")
+        if st.st_mode & stat.S_IWOTH:
+            raise RuntimeError(f"Socket directory {directory} is world-writable, choose another with --socket")
+        if st.st_uid not in (os.geteuid(), 0):
+            raise RuntimeError(f"Socket directory {directory} belongs to another user")
+
+    def _remove_stale_socket(self):
+        """Remove a socket file left behind by a daemon that is no longer running"""
+        try:
+            st = os.lstat(self.socket_path)
+        except FileNotFoundError:
+            return
+        # Only our own dead socket is removed, never a file or another user's socket
+        if not stat.S_ISSOCK(st.st_mode) or st.st_uid != os.geteuid():
+            raise RuntimeError(f"{self.socket_path} exists and is not a socket of this user")
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.socket_path)
+        except ConnectionRefusedError:
+            os.unlink(self.socket_path)
+            return
+        except OSError as e:
+            raise RuntimeError(f"Cannot check {self.socket_path} for a running daemon: {e}")
+        finally:
+            probe.close()
+        raise RuntimeError(f"Another daemon is already listening on {self.socket_path}")
+
+    def handle_connection(self, rfile, wfile):
+        """Serve requests of one client connection"""
+        for raw_line in rfile:
+            try:
+                request = json.loads(raw_line.decode('utf-8'))
+                command = request.get('cmd')
+            except (ValueError, AttributeError) as e:
+                self._send(wfile, {'ok': False, 'error': f"Invalid request: {e}"})
+                continue
+
+            if command == 'subscribe':
+                self._subscribe(wfile)
+                return
+            self._send(wfile, self.handle_request(command, request))
+
+    def handle_request(self, command, request):
+        """Execute one command and return its response"""
         try:
-            exit_code = self.current_process.wait()
-            
-            with self._lock:
-                self.is_running = False
-            
-            if 'finished' in self.callbacks:
-                self.callbacks['finished'](exit_code)
-            
-            logger.info(f"Application finished with exit code: {exit_code}")
-            
+            if command == 'status':
+                return {'ok': True, **self.status()}
+            elif command == 'launch':
+                self.executable = request.get('path')
+                if not self.app_launcher.launch_application(self.executable):
+                    return {'ok': False, 'error': "Failed to launch application"}
+                return {'ok': True}
+            elif command == 'terminate':
+                return {'ok': self.app_launcher.terminate_application(request.get('pid'))}
+            elif command == 'metrics':
+                return {'ok': True, 'metrics': METRICS.to_dict()}
+            elif command == 'pause':
+                self.usb_monitor.pause_monitoring()
+                return {'ok': True}
+            elif command == 'resume':
+                self.usb_monitor.resume_monitoring()
+                return {'ok': True}
+            return {'ok': False, 'error': f"Unknown command: {command}"}
         except Exception as e:
-            logger.error(f"Process monitoring error: {e}")
+            logger.error(f"Daemon command {command} failed: {e}")
+            return {'ok': False, 'error': str(e)}
+
+    def status(self):
+        process = self.app_launcher.current_process
+        processes = [{'pid': child.pid, 'executable': child.executable_path}
+                     for child in list(self.app_launcher.processes.values())]
+        with self._lock:
+            devices = dict(self.device_status)
+        return {
+            'devices': devices,
+            'monitoring': {'running': bool(self.usb_monitor.is_running()), 'paused': self.usb_monitor.is_paused()},
+            'application': {
+                'running': self.app_launcher.is_running,
+                'executable': self.executable,
+                'pid': process.pid if process is not None else None,
+                'processes': processes,
+                'max_processes': self.app_launcher.max_processes,
+                'resources': self.app_launcher.resource_usage(),
+                'last_exit': self.app_launcher.last_exit._asdict() if self.app_launcher.last_exit else None
+            }
+        }
+
+    def _subscribe(self, wfile):
+        with self._lock:
+            snapshot = dict(self.device_status)
+            subscriber = (wfile, threading.Lock())
+            self._subscribers.append(subscriber)
+        if not self._send_event(subscriber, 'device_status', snapshot):
+            return
+        # Keep the handler thread alive for the lifetime of the subscription
+        while not self._stop_event.wait(1.0):
             with self._lock:
-                self.is_running = False
-            if 'error' in self.callbacks:
-                self.callbacks['error'](str(e))
-    
-    def terminate_application(self):
-        """Terminate the running application"""
+                if subscriber not in self._subscribers:
+                    return
+
+    def broadcast(self, event, data):
+        """Send an event to every subscriber, dropping the ones that went away"""
         with self._lock:
-            if not self.current_process or not self.is_running:
-                return True
-        
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            if not self._send_event(subscriber, event, data):
+                with self._lock:
+                    if subscriber in self._subscribers:
+                        self._subscribers.remove(subscriber)
+
+    def _send_event(self, subscriber, event, data):
+        wfile, write_lock = subscriber
+        with write_lock:
+            return self._send(wfile, {'event': event, 'data': data})
+
+    @staticmethod
+    def _send(wfile, message):
         try:
-            self.current_process.terminate()
-            
-            # Wait for graceful termination
-            try:
-                self.current_process.wait(timeout=5)
-            except subprocess.TimeoutExpired:
-                # Force kill if not terminated gracefully
-                self.current_process.kill()
-                self.current_process.wait()
-            
-            with self._lock:
-                self.is_running = False
-            
-            logger.info("Application terminated")
+            wfile.write(json.dumps(message).encode('utf-8') + b'\n')
+            wfile.flush()
             return True
-            
-        except Exception as e:
+        except (OSError, ValueError):
+            return False
+
+    def _dispatch_events(self):
+        """Fold monitor messages into the device status and forward them with captured output"""
+        output_seq = 0
+        while not self._stop_event.is_set():
+            try:
+                message_type, data = self.device_queue.get(timeout=0.2)
+                with self._lock:
+                    apply_device_message(self.device_status, message_type, data)
+                self.broadcast(message_type, data)
+            except queue.Empty:
+                pass
+
+            output_seq, lines = self.app_launcher.output_buffer.since(output_seq)
+            if lines:
+                self.broadcast('app_output', lines)
+
+
+class DaemonClient:
+    """Client side of the DeviceDaemon JSON protocol"""
+
+    def __init__(self, socket_path=DEFAULT_SOCKET_PATH, timeout=10):
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        return sock
+
+    def request(self, command, **arguments):
+        """Send one command and return the daemon's response dict"""
+        sock = self._connect()
+        try:
+            sock.sendall(json.dumps(dict(arguments, cmd=command)).encode('utf-8') + b'\n')
+            with sock.makefile('rb') as reader:
+                line = reader.readline()
+        finally:
+            sock.close()
+        if not line:
+            raise ConnectionError("Daemon closed the connection")
+        return json.loads(line.decode('utf-8'))
+
+    def subscribe(self):
+        """Yield (event, data) pairs until the connection closes"""
+        sock = self._connect()
+        sock.settimeout(None)
+        try:
+            sock.sendall(b'{"cmd": "subscribe"}\n')
+            with sock.makefile('rb') as reader:
+                for line in reader:
+                    message = json.loads(line.decode('utf-8'))
+                    yield message['event'], message['data']
+        finally:
+            sock.close()
+
+
+class RemoteApplicationLauncher:
+    """ApplicationLauncher stand-in that launches through a DeviceDaemon"""
+
+    def __init__(self, client):
+        self.client = client
+        self.is_running = False
+        self.callbacks = {}
+        self.output_buffer = OutputRingBuffer()
+        self.output_log_dir = None
+
+    def set_callback(self, event, callback):
+        """Set callback for events (started, finished, error)"""
+        self.callbacks[event] = callback
+
+    def launch_application(self, executable_path):
+        # Marked running before the request so the daemon's app_started event is not taken as foreign
+        self.is_running = True
+        try:
+            response = self.client.request('launch', path=executable_path)
+        except OSError as e:
+            response = {'ok': False, 'error': str(e)}
+        if not response.get('ok'):
+            self.is_running = False
+            logger.error(f"Failed to launch application: {response.get('error')}")
+            if 'error' in self.callbacks:
+                self.callbacks['error'](response.get('error') or "Failed to launch application")
+            return False
+        self.output_buffer.clear()
+        if 'started' in self.callbacks:
+            self.callbacks['started']()
+        return True
+
+    def can_launch(self):
+        return not self.is_running
+
+    def terminate_application(self):
+        try:
+            return bool(self.client.request('terminate').get('ok'))
+        except OSError as e:
             logger.error(f"Failed to terminate application: {e}")
             return False
 
+    def handle_event(self, event, data):
+        """Apply an application event received from the daemon"""
+        if event == 'app_output':
+            for stream_name, line in data:
+                self.output_buffer.append(stream_name, line)
+        elif event == 'app_started':
+            if not self.is_running:
+                # Launched by another client of the daemon
+                self.is_running = True
+                if 'started' in self.callbacks:
+                    self.callbacks['started']()
+        elif event == 'app_finished':
+            self.is_running = False
+            if 'finished' in self.callbacks:
+                self.callbacks['finished'](data)
+        elif event == 'app_error':
+            self.is_running = False
+            if 'error' in self.callbacks:
+                self.callbacks['error'](data)
+
+
+class RemoteUSBMonitor:
+    """USBMonitor stand-in that relays the device events of a DeviceDaemon"""
+
+    RECONNECT_DELAY = 2.0
+
+    def __init__(self, client, device_queue, app_launcher):
+        self.client = client
+        self.device_queue = device_queue
+        self.app_launcher = app_launcher
+        self.running = False
+        self.paused = False
+        self.monitor_thread = None
+
+    def start_monitoring(self):
+        if self.running:
+            return False
+        self.running = True
+        self.monitor_thread = threading.Thread(target=self._relay_events, daemon=True)
+        self.monitor_thread.start()
+        logger.info(f"Attached to device daemon at {self.client.socket_path}")
+        return True
+
+    def stop_monitoring(self):
+        # The subscription thread is a daemon thread and ends with the process
+        self.running = False
+
+    def pause_monitoring(self):
+        self._command('pause')
+        self.paused = True
+
+    def resume_monitoring(self):
+        self._command('resume')
+        self.paused = False
+
+    def is_running(self):
+        return self.running and self.monitor_thread is not None and self.monitor_thread.is_alive()
+
+    def is_paused(self):
+        return self.paused
+
+    def _command(self, command):
+        try:
+            self.client.request(command)
+        except OSError as e:
+            logger.error(f"Daemon command {command} failed: {e}")
+
+    def _relay_events(self):
+        while self.running:
+            try:
+                for event, data in self.client.subscribe():
+                    if not self.running:
+                        return
+                    if event in DEVICE_DELTA_MESSAGES:
+                        data = tuple(data)
+                    if event == 'device_status' or event in DEVICE_DELTA_MESSAGES or event == 'error':
+                        self.device_queue.put((event, data))
+                    else:
+                        self.app_launcher.handle_event(event, data)
+            except (OSError, ValueError) as e:
+                logger.error(f"Lost connection to device daemon: {e}")
+                self.device_queue.put(('error', f"Lost connection to device daemon: {e}"))
+            time.sleep(self.RECONNECT_DELAY)
+
+
+class TkEventBridge(CoalescingChannel):
+    """CoalescingChannel whose put() wakes the Tk main loop to run handler on the Tk thread.
+
+    On POSIX a self-pipe is registered with createfilehandler, so messages are
+    handled as soon as they arrive. Where Tk has no file handlers (Windows)
+    the handler is polled with after(). Delivery latency of each wakeup is
+    kept in latencies (seconds).
+    """
+
+    def __init__(self, root, handler, poll_interval_ms=50, max_events=1000):
+        super().__init__(max_events, name='gui')
+        self.root = root
+        self.handler = handler
+        self.poll_interval_ms = poll_interval_ms
+        self.latencies = deque(maxlen=1000)
+        self._wake_lock = threading.Lock()
+        self._wake_time = None
+        self._read_fd = None
+        self._write_fd = None
+        if os.name == 'posix' and hasattr(root.tk, 'createfilehandler'):
+            self._read_fd, self._write_fd = os.pipe()
+            os.set_blocking(self._read_fd, False)
+            os.set_blocking(self._write_fd, False)
+            root.tk.createfilehandler(self._read_fd, tk.READABLE, self._on_readable)
+        else:
+            self.root.after(self.poll_interval_ms, self._poll)
+
+    def put(self, item, block=True, timeout=None):
+        super().put(item, block, timeout)
+        self.wake()
+
+    def wake(self):
+        """Request a handler run on the Tk thread, coalescing wakeups until it runs"""
+        with self._wake_lock:
+            if self._wake_time is not None:
+                return
+            self._wake_time = time.monotonic()
+        if self._write_fd is not None:
+            try:
+                os.write(self._write_fd, b'\0')
+            except (BlockingIOError, OSError):
+                pass
+
+    def oldest_age(self):
+        """Seconds the oldest undelivered message has been waiting, 0 if none"""
+        wake_time = self._wake_time
+        return time.monotonic() - wake_time if wake_time is not None else 0.0
+
+    def _on_readable(self, fd, mask):
+        try:
+            os.read(fd, 4096)
+        except (BlockingIOError, OSError):
+            pass
+        self._dispatch()
+
+    def _poll(self):
+        self._dispatch()
+        self.root.after(self.poll_interval_ms, self._poll)
+
+    def _dispatch(self):
+        with self._wake_lock:
+            wake_time, self._wake_time = self._wake_time, None
+        if wake_time is not None:
+            self.latencies.append(time.monotonic() - wake_time)
+        self.handler()
+
+    def close(self):
+        if self._read_fd is not None:
+            try:
+                self.root.tk.deletefilehandler(self._read_fd)
+            except Exception:
+                pass
+            os.close(self._read_fd)
+            os.close(self._write_fd)
+            self._read_fd = self._write_fd = None
+
 
 class DeviceMonitorGUI:
     """Main GUI Application"""
     
-    def __init__(self, root):
+    MAX_CONSOLE_LINES = 1000
+    DEVICE_BUTTON_COLUMNS = 4
+    SPARKLINE_SAMPLES = 120
+    
+    def __init__(self, root, daemon_client=None, max_processes=1, sample_interval=1.0, debouncer=None,
+                 max_poll_interval=None):
         self.root = root
         self.root.title("Device Monitor Application")
         self.root.geometry("800x600")
@@ -649,21 +4498,56 @@ class DeviceMonitorGUI:
         self.device_status = {}
         
         # Threading components
-        self.device_queue = queue.Queue()
+        # Messages put on device_queue wake the Tk loop directly, no polling
+        self.device_queue = TkEventBridge(self.root, self.update_device_status)
+        DEVICE_QUEUE_DEPTH.set_function(self.device_queue.qsize)
+        DEVICE_QUEUE_OLDEST_AGE.set_function(self.device_queue.oldest_age)
         self.control_queue = queue.Queue()
-        self.usb_monitor = USBMonitor(self.device_queue, self.control_queue)
+        self.core = None
+        if daemon_client is not None:
+            # Thin client: monitoring and launching happen in the daemon
+            self.app_launcher = RemoteApplicationLauncher(daemon_client)
+            self.usb_monitor = RemoteUSBMonitor(daemon_client, self.device_queue, self.app_launcher)
+        else:
+            self.core = MonitorCore()
+            self.usb_monitor = USBMonitor(self.device_queue, self.control_queue, core=self.core)
+            if debouncer is not None:
+                self.usb_monitor.debouncer = debouncer
+            if max_poll_interval is not None:
+                self.usb_monitor.max_monitoring_interval = max_poll_interval
+            self.app_launcher = ApplicationLauncher(core=self.core, max_processes=max_processes,
+                                                    sample_interval=sample_interval)
+            self.usb_monitor.is_busy = lambda: self.app_launcher.is_running
         
-        # Application launcher
-        self.app_launcher = ApplicationLauncher()
-        self.app_launcher.set_callback('started', self.on_app_started)
-        self.app_launcher.set_callback('finished', self.on_app_finished)
-        self.app_launcher.set_callback('error', self.on_app_error)
+        # Application launcher, callbacks arrive on other threads and are handed to the Tk thread
+        self.app_launcher.set_callback('started', lambda: self.device_queue.put(('app_started', None)))
+        self.app_launcher.set_callback('finished', lambda exit_code: self.device_queue.put(('app_finished', exit_code)))
+        self.app_launcher.set_callback('error', lambda error_msg: self.device_queue.put(('app_error', error_msg)))
+        self.app_launcher.set_callback('output', lambda stream_name, line: self.device_queue.wake())
+        self.app_launcher.set_callback('sample', lambda pid, ring: self.device_queue.put(('app_sample', pid)))
+        config_dir, cache_dir = guard_directory('config'), guard_directory('cache')
+        self.app_launcher.output_log_dir = os.path.join(guard_directory('log'), 'app_output')
+        self.app_launcher.policies = LaunchPolicyStore(os.path.join(config_dir, 'launch_policies.json'))
+        self.app_launcher.staging = StagingCache(os.path.join(cache_dir, 'stage_cache'))
+        self.verifier = ExecutableVerifier(os.path.join(config_dir, 'allowed_executables.json'),
+                                           os.path.join(cache_dir, 'hash_cache.json'))
+        self.app_launcher.verifier = self.verifier
+        self.app_launcher.set_callback(
+            'verify_progress', lambda path, done, total: self.device_queue.put(('verify_progress', (path, done, total))))
+        self.executable_index = ExecutableIndexCache(os.path.join(cache_dir, 'executable_index.json'))
+        if daemon_client is None:
+            self.usb_monitor.set_slot_map_path(os.path.join(guard_directory('state'), 'card_slots.json'))
+        # Removable media is indexed in the background as soon as it is mounted
+        self.media_scanners = {}
+        self.mount_watcher = MountWatcher(
+            on_mount=lambda entry: self.device_queue.put(('media_mounted', entry)),
+            on_unmount=lambda entry: self.device_queue.put(('media_unmounted', entry)))
         
-        # GUI setup
+        # GUI setup, monitoring starts once the first frame is drawn
         self.create_widgets()
-        self.start_monitoring()
+        self.root.after_idle(self.start_monitoring)
         
-        # Update loop
+        # Handle anything queued before the first wakeup
         self.update_device_status()
         
         # Cleanup on close
@@ -700,6 +4584,9 @@ class DeviceMonitorGUI:
         # System control frame
         self.create_system_frame(main_frame)
         
+        # Application output console
+        self.create_output_frame(main_frame)
+        
         # Status bar
         self.status_var = tk.StringVar(value="Ready")
         status_bar = tk.Label(
@@ -725,27 +4612,40 @@ class DeviceMonitorGUI:
         )
         device_frame.pack(fill='x', pady=(0, 10))
         
-        # Device buttons
-        button_frame = tk.Frame(device_frame, bg='#34495e')
-        button_frame.pack(fill='x')
+        # Device buttons, more are added when further card slots appear
+        self.device_button_frame = tk.Frame(device_frame, bg='#34495e')
+        self.device_button_frame.pack(fill='x')
         
         self.device_buttons = {}
-        devices = [('4750', 'Device 4750'), ('4761', 'Device 4761'), ('4761_1', 'Device 4761-1')]
-        
-        for i, (device_id, label) in enumerate(devices):
-            btn = tk.Button(
-                button_frame,
-                text=label,
-                font=('Arial', 12, 'bold'),
-                width=15,
-                height=2,
-                bg='#e74c3c',
-                fg='white',
-                relief='raised',
-                bd=3
-            )
-            btn.pack(side='left', padx=10, pady=5, expand=True)
-            self.device_buttons[device_id] = btn
+        for device_id in ('4750', '4761', '4761_1'):
+            self.add_device_button(device_id)
+    
+    @staticmethod
+    def device_label(device_id):
+        """Button label of a logical device ("4761_2" -> "Device 4761-2")"""
+        return f"Device {device_id.replace('_', '-')}"
+    
+    def add_device_button(self, device_id):
+        """Create the button of a logical device and re-grid all buttons in slot order"""
+        btn = tk.Button(
+            self.device_button_frame,
+            text=self.device_label(device_id),
+            font=('Arial', 12, 'bold'),
+            width=15,
+            height=2,
+            bg='#e74c3c',
+            fg='white',
+            relief='raised',
+            bd=3
+        )
+        self.device_buttons[device_id] = btn
+        
+        for i, name in enumerate(sorted(self.device_buttons, key=natural_key)):
+            row, column = divmod(i, self.DEVICE_BUTTON_COLUMNS)
+            self.device_buttons[name].grid(row=row, column=column, padx=10, pady=5, sticky='ew')
+        for column in range(min(len(self.device_buttons), self.DEVICE_BUTTON_COLUMNS)):
+            self.device_button_frame.grid_columnconfigure(column, weight=1)
+        return btn
     
     def create_control_frame(self, parent):
         """Create monitoring control frame"""
@@ -922,10 +4822,104 @@ class DeviceMonitorGUI:
         )
         exit_btn.pack(side='left', padx=10)
     
+    def create_output_frame(self, parent):
+        """Create live console showing the launched application's output"""
+        output_frame = tk.LabelFrame(
+            parent,
+            text="Application Output",
+            font=('Arial', 14, 'bold'),
+            bg='#34495e',
+            fg='white',
+            padx=10,
+            pady=10
+        )
+        output_frame.pack(fill='both', expand=True, pady=(0, 10))
+        
+        # CPU (green) and RSS (orange) sparkline of the current application
+        resource_frame = tk.Frame(output_frame, bg='#34495e')
+        resource_frame.pack(fill='x', pady=(0, 5))
+        self.resource_var = tk.StringVar(value="No application running")
+        tk.Label(
+            resource_frame,
+            textvariable=self.resource_var,
+            font=('Courier', 10),
+            bg='#34495e',
+            fg='white',
+            anchor='w'
+        ).pack(side='left')
+        self.sparkline = tk.Canvas(resource_frame, height=30, width=240, bg='#1c2833', highlightthickness=0)
+        self.sparkline.pack(side='right')
+        self.sparkline_cpu = self.sparkline.create_line(0, 0, 0, 0, fill='#2ecc71')
+        self.sparkline_rss = self.sparkline.create_line(0, 0, 0, 0, fill='#f39c12')
+        
+        scrollbar = tk.Scrollbar(output_frame)
+        scrollbar.pack(side='right', fill='y')
+        
+        self.output_text = tk.Text(
+            output_frame,
+            height=8,
+            font=('Courier', 10),
+            bg='#1c2833',
+            fg='#ecf0f1',
+            yscrollcommand=scrollbar.set,
+            state='disabled'
+        )
+        self.output_text.pack(fill='both', expand=True)
+        self.output_text.tag_configure('stderr', foreground='#e74c3c')
+        scrollbar.config(command=self.output_text.yview)
+        self.output_seq = 0
+    
+    def update_output_console(self):
+        """Append output captured since the last update to the console"""
+        self.output_seq, lines = self.app_launcher.output_buffer.since(self.output_seq)
+        if not lines:
+            return
+        
+        # Only follow the output if the user has not scrolled up
+        at_bottom = self.output_text.yview()[1] >= 1.0
+        self.output_text.configure(state='normal')
+        for stream_name, line in lines:
+            self.output_text.insert('end', line + '\n', stream_name)
+        line_count = int(self.output_text.index('end-1c').split('.')[0])
+        if line_count > self.MAX_CONSOLE_LINES:
+            self.output_text.delete('1.0', f"{line_count - self.MAX_CONSOLE_LINES + 1}.0")
+        self.output_text.configure(state='disabled')
+        if at_bottom:
+            self.output_text.see('end')
+    
+    def update_resource_graph(self, pid):
+        """Redraw the resource sparkline from the sampler's ring of pid"""
+        process = self.app_launcher.current_process
+        sampler = getattr(self.app_launcher, 'sampler', None)
+        if sampler is None or process is None or process.pid != pid or pid not in sampler.rings:
+            return
+        ring = sampler.rings[pid]
+        latest = ring.latest()
+        if latest is None:
+            return
+        self.resource_var.set(
+            f"CPU {latest['cpu_percent']:5.1f}%  RSS {latest['rss_bytes'] / 1048576:7.1f} MB  "
+            f"I/O {latest['read_bytes_per_s'] / 1024:7.1f} / {latest['write_bytes_per_s'] / 1024:7.1f} KB/s"
+        )
+        width = int(self.sparkline['width'])
+        height = int(self.sparkline['height'])
+        for item, values, floor in ((self.sparkline_cpu, ring.values('cpu_percent', self.SPARKLINE_SAMPLES), 100.0),
+                                    (self.sparkline_rss, ring.values('rss_bytes', self.SPARKLINE_SAMPLES), 1.0)):
+            if len(values) < 2:
+                continue
+            peak = max(max(values), floor)
+            step = width / (self.SPARKLINE_SAMPLES - 1)
+            offset = width - step * (len(values) - 1)
+            points = []
+            for index, value in enumerate(values):
+                points.extend((offset + index * step, height - 1 - value / peak * (height - 2)))
+            self.sparkline.coords(item, *points)
+    
     def start_monitoring(self):
         """Start USB monitoring thread"""
         try:
             success = self.usb_monitor.start_monitoring()
+            self.mount_watcher.start()
             if success:
                 logger.info("USB monitoring thread started")
                 self.status_var.set("USB monitoring started")
@@ -937,39 +4931,65 @@ class DeviceMonitorGUI:
             messagebox.showerror("Error", f"Failed to start USB monitoring: {e}")
     
     def update_device_status(self):
-        """Update device status from monitoring thread"""
+        """Handle messages from the monitor core, run on the Tk thread by TkEventBridge"""
         try:
             while True:
                 try:
                     message_type, data = self.device_queue.get_nowait()
                     
-                    if message_type == 'device_status':
-                        self.device_status = data
-                        self.update_device_buttons()
+                    if message_type == 'device_status' or message_type in DEVICE_DELTA_MESSAGES:
+                        for device_id in apply_device_message(self.device_status, message_type, data):
+                            self.update_device_button(device_id)
+                        if message_type == 'device_attached' and len(data) > 2 and data[2] is not None:
+                            ATTACH_TO_RECOLOR_SECONDS.observe(time.monotonic() - data[2])
+                    elif message_type == 'app_sample':
+                        self.update_resource_graph(data)
+                    elif message_type == 'app_started':
+                        self.on_app_started()
+                    elif message_type == 'app_finished':
+                        self.on_app_finished(data)
+                    elif message_type == 'app_error':
+                        self.on_app_error(data)
+                    elif message_type == 'verify_progress':
+                        self.on_verify_progress(*data)
+                    elif message_type == 'verify_done':
+                        self.on_verify_done(*data)
+                    elif message_type == 'media_mounted':
+                        self.on_media_mounted(data)
+                    elif message_type == 'media_unmounted':
+                        self.on_media_unmounted(data)
                     elif message_type == 'error':
                         logger.error(f"Monitor error: {data}")
                         
                 except queue.Empty:
                     break
                     
+            self.update_output_console()
+                    
         except Exception as e:
             logger.error(f"Status update error: {e}")
-        
-        # Schedule next update
-        self.root.after(500, self.update_device_status)
     
     def update_device_buttons(self):
         """Update device button colors based on status"""
-        for device_id, button in self.device_buttons.items():
-            if device_id in self.device_status:
-                status = self.device_status[device_id]
-                if status['connected']:
-                    button.configure(bg='#27ae60')  # Green
-                    count = status['count']
-                    button.configure(text=f"Device {device_id} ({count})")
-                else:
-                    button.configure(bg='#e74c3c')  # Red
-                    button.configure(text=f"Device {device_id}")
+        for device_id in self.device_buttons:
+            self.update_device_button(device_id)
+    
+    def update_device_button(self, device_id):
+        """Update a single device button from its status"""
+        if device_id not in self.device_status:
+            return
+        button = self.device_buttons.get(device_id)
+        if button is None:
+            button = self.add_device_button(device_id)
+        status = self.device_status[device_id]
+        label = self.device_label(device_id)
+        if status.get('flapping'):
+            button.configure(bg='#f39c12', text=f"{label} (flapping)")  # Orange
+        elif status['connected']:
+            count = status['count']
+            button.configure(bg='#27ae60', text=f"{label} ({count})")  # Green
+        else:
+            button.configure(bg='#e74c3c', text=label)  # Red
     
     def toggle_monitoring(self):
         """Toggle USB monitoring on/off"""
@@ -989,6 +5009,24 @@ class DeviceMonitorGUI:
             except Exception as e:
                 logger.error(f"Failed to pause monitoring: {e}")
     
+    def on_media_mounted(self, entry):
+        """Start indexing the executables of newly mounted removable media"""
+        old_scanner = self.media_scanners.pop(entry.mount_point, None)
+        if old_scanner is not None:
+            old_scanner.cancel()
+        scanner = ExecutableScanner(entry.mount_point, cache=self.executable_index)
+        scanner.start()
+        self.media_scanners[entry.mount_point] = scanner
+        self.status_var.set(f"USB media mounted at {entry.mount_point}, indexing executables...")
+    
+    def on_media_unmounted(self, entry):
+        """Drop the index scan and the cached digests of removed media"""
+        scanner = self.media_scanners.pop(entry.mount_point, None)
+        if scanner is not None:
+            scanner.cancel()
+        self.verifier.forget_device(entry.device)
+        self.status_var.set(f"USB media removed from {entry.mount_point}")
+    
     def browse_usb(self):
         """Browse USB devices for executables (cross-platform)"""
         if IS_WINDOWS:
@@ -998,6 +5036,14 @@ class DeviceMonitorGUI:
     
     def _browse_usb_linux(self):
         """Browse USB on Linux"""
+        media = self.mount_watcher.media()
+        if len(media) == 1:
+            self.browse_medium(media[0].mount_point)
+            return
+        if media:
+            self.show_media_selection(media)
+            return
+        
         usb_paths = ['/run/media', '/media', '/mnt']
         
         for path in usb_paths:
@@ -1012,6 +5058,62 @@ class DeviceMonitorGUI:
         
         messagebox.showwarning("Warning", "No USB mount points found")
     
+    def browse_medium(self, mount_point):
+        """Show the executables of mounted removable media, indexed since it was mounted"""
+        scanner = self.media_scanners.get(mount_point)
+        if scanner is None or scanner.is_cancelled() or scanner.error is not None:
+            # Kept until the medium is unmounted, so browsing it again is instant
+            scanner = ExecutableScanner(mount_point, cache=self.executable_index)
+            scanner.start()
+            self.media_scanners[mount_point] = scanner
+        self.status_var.set(f"Executables on {mount_point}")
+        self.show_executable_selection([], scanner, owns_scanner=False)
+    
+    def show_media_selection(self, media):
+        """Let the operator pick one of several mounted removable media"""
+        selection_window = tk.Toplevel(self.root)
+        selection_window.title("Select USB Media")
+        selection_window.configure(bg='#34495e')
+        selection_window.transient(self.root)
+        selection_window.grab_set()
+        selection_window.geometry("+%d+%d" % (
+            self.root.winfo_rootx() + 50,
+            self.root.winfo_rooty() + 50
+        ))
+        
+        tk.Label(
+            selection_window,
+            text="Several USB media are mounted. Please select one:",
+            font=('Arial', 12, 'bold'),
+            bg='#34495e',
+            fg='white'
+        ).pack(padx=20, pady=10)
+        
+        def choose(mount_point):
+            selection_window.destroy()
+            self.browse_medium(mount_point)
+        
+        for entry in media:
+            tk.Button(
+                selection_window,
+                text=f"{entry.mount_point} ({entry.source})",
+                command=lambda mount_point=entry.mount_point: choose(mount_point),
+                font=('Arial', 12),
+                bg='#3498db',
+                fg='white',
+                anchor='w'
+            ).pack(fill='x', padx=20, pady=5)
+        
+        tk.Button(
+            selection_window,
+            text="Cancel",
+            command=selection_window.destroy,
+            font=('Arial', 12),
+            bg='#e74c3c',
+            fg='white',
+            width=10
+        ).pack(pady=10)
+    
     def _browse_usb_windows(self):
         """Browse USB on Windows - detect removable drives"""
         import string
@@ -1051,41 +5153,20 @@ class DeviceMonitorGUI:
             self.find_executable_in_directory(directory)
     
     def find_executable_in_directory(self, directory):
-        """Find executable files in directory (cross-platform)"""
-        try:
-            executables = []
-            for file_path in Path(directory).rglob('*'):
-                if file_path.is_file():
-                    if IS_WINDOWS:
-                        # On Windows, look for .exe files
-                        if file_path.suffix.lower() == '.exe':
-                            executables.append(str(file_path))
-                    else:
-                        # On Linux, check executable permission
-                        if os.access(file_path, os.X_OK):
-                            executables.append(str(file_path))
-            
-            if not executables:
-                if IS_WINDOWS:
-                    messagebox.showwarning("Warning", "No .exe files found in selected directory")
-                else:
-                    messagebox.showwarning("Warning", "No executable files found in selected directory")
-                return
-            
-            if len(executables) == 1:
-                self.selected_executable = executables[0]
-                self.file_path_var.set(self.selected_executable)
-                self.status_var.set("Executable selected successfully")
-            else:
-                # Show selection dialog for multiple executables
-                self.show_executable_selection(executables)
-                
-        except Exception as e:
-            logger.error(f"Error finding executables: {e}")
-            messagebox.showerror("Error", f"Error searching for executables: {e}")
+        """Find executable files in directory on a background scanner (cross-platform)"""
+        scanner = ExecutableScanner(directory, cache=self.executable_index)
+        scanner.start()
+        self.status_var.set(f"Searching for executables in {directory}...")
+        self.show_executable_selection([], scanner)
     
-    def show_executable_selection(self, executables):
-        """Show dialog to select from multiple executables"""
+    def show_executable_selection(self, executables, scanner=None, owns_scanner=True):
+        """Show dialog to select from multiple executables, streaming in scanner results.
+
+        The dialog cancels a scanner it owns when it closes, a shared one (a
+        medium's index) keeps running and keeps its results.
+        """
+        executables = list(executables)
+        scanned = [0]
         selection_window = tk.Toplevel(self.root)
         selection_window.title("Select Executable")
         selection_window.geometry("600x400")
@@ -1100,9 +5181,10 @@ class DeviceMonitorGUI:
         ))
         
         # Title
+        title_var = tk.StringVar(value="Multiple executables found. Please select one:")
         title_label = tk.Label(
             selection_window,
-            text="Multiple executables found. Please select one:",
+            textvariable=title_var,
             font=('Arial', 12, 'bold'),
             bg='#34495e',
             fg='white'
@@ -1134,17 +5216,61 @@ class DeviceMonitorGUI:
         button_frame = tk.Frame(selection_window, bg='#34495e')
         button_frame.pack(pady=10)
         
+        def select(executable):
+            self.selected_executable = executable
+            self.file_path_var.set(self.selected_executable)
+            self.status_var.set("Executable selected successfully")
+            # It is likely launched within seconds, start reading it and its libraries now
+            threading.Thread(target=prefetch_executable, args=(executable,), daemon=True).start()
+            self.verify_selected_executable(executable)
+        
         def on_select():
             selection = listbox.curselection()
             if selection:
-                self.selected_executable = executables[selection[0]]
-                self.file_path_var.set(self.selected_executable)
-                self.status_var.set("Executable selected successfully")
+                if scanner is not None and owns_scanner:
+                    scanner.cancel()
+                select(executables[selection[0]])
                 selection_window.destroy()
         
         def on_cancel():
+            if scanner is not None and owns_scanner and not scanner.done.is_set():
+                scanner.cancel()
+                self.status_var.set("Executable search cancelled")
             selection_window.destroy()
         
+        def poll_scanner():
+            if not selection_window.winfo_exists() or scanner.is_cancelled():
+                return
+            finished = scanner.done.is_set()
+            found = scanner.found_since(scanned[0])
+            scanned[0] += len(found)
+            for exe in found:
+                executables.append(exe)
+                listbox.insert('end', os.path.basename(exe))
+            
+            if not finished:
+                title_var.set(f"Searching... {len(executables)} found, "
+                              f"{scanner.scanned_entries} entries scanned")
+                selection_window.after(100, poll_scanner)
+                return
+            
+            if scanner.error is not None:
+                selection_window.destroy()
+                messagebox.showerror("Error", f"Error searching for executables: {scanner.error}")
+            elif not executables:
+                selection_window.destroy()
+                if IS_WINDOWS:
+                    messagebox.showwarning("Warning", "No .exe files found in selected directory")
+                else:
+                    messagebox.showwarning("Warning", "No executable files found in selected directory")
+            elif len(executables) == 1:
+                select(executables[0])
+                selection_window.destroy()
+            else:
+                title_var.set("Multiple executables found. Please select one:")
+                self.status_var.set(f"Found {len(executables)} executables"
+                                    + (" (search limit reached)" if scanner.truncated else ""))
+        
         select_btn = tk.Button(
             button_frame,
             text="Select",
@@ -1169,6 +5295,45 @@ class DeviceMonitorGUI:
         
         # Double-click to select
         listbox.bind('<Double-1>', lambda e: on_select())
+        selection_window.protocol("WM_DELETE_WINDOW", on_cancel)
+        
+        if scanner is not None:
+            title_var.set("Searching...")
+            poll_scanner()
+    
+    def verify_selected_executable(self, executable_path):
+        """Hash the selected executable on a worker thread, launching it then finds the digest cached"""
+        if not self.verifier.enabled():
+            return
+        self.status_var.set(f"Verifying {os.path.basename(executable_path)}...")
+        
+        def verify():
+            try:
+                allowed, digest = self.verifier.verify(
+                    executable_path,
+                    lambda done, total: self.device_queue.put(('verify_progress', (executable_path, done, total))))
+                self.device_queue.put(('verify_done', (executable_path, allowed, digest)))
+            except OSError as e:
+                self.device_queue.put(('verify_done', (executable_path, None, str(e))))
+        
+        threading.Thread(target=verify, daemon=True).start()
+    
+    def on_verify_progress(self, executable_path, done, total):
+        """Show hashing progress of the selected executable in the status bar"""
+        if executable_path == self.selected_executable and total:
+            self.status_var.set(f"Verifying {os.path.basename(executable_path)}... {100 * done // total}%")
+    
+    def on_verify_done(self, executable_path, allowed, detail):
+        """Show the verification result of the selected executable"""
+        if executable_path != self.selected_executable:
+            return
+        name = os.path.basename(executable_path)
+        if allowed:
+            self.status_var.set(f"{name} verified (sha256 {detail[:16]}...)")
+        elif allowed is None:
+            self.status_var.set(f"Cannot verify {name}: {detail}")
+        else:
+            self.status_var.set(f"{name} is not in the allow-list (sha256 {detail[:16]}...)")
     
     def launch_application(self):
         """Launch selected application"""
@@ -1176,13 +5341,21 @@ class DeviceMonitorGUI:
             messagebox.showwarning("Warning", "Please select an executable file first")
             return
         
-        if self.app_launcher.is_running:
+        if not self.app_launcher.can_launch():
             messagebox.showwarning("Warning", "Another application is already running")
             return
         
-        success = self.app_launcher.launch_application(self.selected_executable)
-        if not success:
-            messagebox.showerror("Error", "Failed to launch application")
+        # Staging a large directory takes a while, launch off the Tk thread, the result arrives as app_started or app_error
+        self.launch_btn.configure(state='disabled', text="Launching...")
+        self.status_var.set(f"Launching {os.path.basename(self.selected_executable)}...")
+        threading.Thread(target=self._launch_in_background, args=(self.selected_executable,), daemon=True).start()
+    
+    def _launch_in_background(self, executable_path):
+        """Run the launcher on a worker thread, failures are reported through the error callback"""
+        try:
+            self.app_launcher.launch_application(executable_path)
+        except Exception as e:
+            self.device_queue.put(('app_error', str(e)))
     
     def terminate_application(self):
         """Terminate running application"""
@@ -1195,14 +5368,23 @@ class DeviceMonitorGUI:
     
     def on_app_started(self):
         """Callback when application starts"""
-        self.launch_btn.configure(state='disabled', text="Application Running")
+        self.output_text.configure(state='normal')
+        self.output_text.delete('1.0', 'end')
+        self.output_text.configure(state='disabled')
+        for item in (self.sparkline_cpu, self.sparkline_rss):
+            self.sparkline.coords(item, 0, 0, 0, 0)
+        if not self.app_launcher.can_launch():
+            self.launch_btn.configure(state='disabled', text="Application Running")
+        else:
+            self.launch_btn.configure(state='normal', text="Launch Application")
         self.terminate_btn.configure(state='normal')
         self.status_var.set("Application started successfully")
     
     def on_app_finished(self, exit_code):
         """Callback when application finishes"""
         self.launch_btn.configure(state='normal', text="Launch Application")
-        self.terminate_btn.configure(state='disabled')
+        if not self.app_launcher.is_running:
+            self.terminate_btn.configure(state='disabled')
         if exit_code == 0:
             self.status_var.set("Application finished successfully")
         else:
@@ -1245,6 +5427,12 @@ class DeviceMonitorGUI:
         try:
             # Stop monitoring
             self.usb_monitor.stop_monitoring()
+            self.mount_watcher.stop()
+            for scanner in self.media_scanners.values():
+                scanner.cancel()
+            if self.core is not None:
+                self.core.stop()
+            self.device_queue.close()
             
             logger.info("Application closing")
             self.root.quit()
@@ -1255,11 +5443,102 @@ class DeviceMonitorGUI:
             self.root.quit()
 
 
-def main():
+def make_debouncer(args):
+    """DeviceDebouncer configured from the command line"""
+    return DeviceDebouncer(settle_time=args.settle_time, min_dwell=args.min_dwell, flap_threshold=args.flap_threshold)
+
+
+def run_daemon(socket_path, max_processes=1, sample_interval=1.0, debouncer=None, max_poll_interval=None):
+    """Run USBMonitor and ApplicationLauncher headless behind the IPC socket"""
+    if not hasattr(socket, 'AF_UNIX'):
+        logger.error("Daemon mode requires Unix domain sockets")
+        return 1
+    try:
+        DeviceDaemon(socket_path, max_processes, sample_interval, debouncer, max_poll_interval).serve_forever()
+    except Exception as e:
+        logger.error(f"Daemon error: {e}")
+        return 1
+    return 0
+
+
+def main(argv=None):
     """Main application entry point"""
-    # Create and run application
+    parser = argparse.ArgumentParser(description="Device Monitor Application")
+    parser.add_argument('--daemon', action='store_true',
+                        help="run headless, serving status/launch/terminate on a Unix domain socket")
+    parser.add_argument('--attach', action='store_true',
+                        help="run the GUI as a thin client of a running daemon")
+    parser.add_argument('--socket', default=DEFAULT_SOCKET_PATH,
+                        help=f"daemon socket path (default: {DEFAULT_SOCKET_PATH})")
+    parser.add_argument('--metrics-textfile',
+                        help="write Prometheus metrics to this file for node_exporter's textfile collector")
+    parser.add_argument('--metrics-interval', type=float, default=15.0,
+                        help="seconds between metrics textfile updates (default: 15)")
+    parser.add_argument('--max-apps', type=int, default=1,
+                        help="number of applications that may run at the same time (default: 1)")
+    parser.add_argument('--sample-interval', type=float, default=1.0,
+                        help="seconds between resource samples of launched applications (default: 1)")
+    parser.add_argument('--monitor-cpu', type=int,
+                        help="pin the monitor to this CPU and keep launched applications off it (Linux)")
+    parser.add_argument('--settle-time', type=float, default=0.25,
+                        help="seconds a device must stay attached/detached before it is reported (default: 0.25)")
+    parser.add_argument('--min-dwell', type=float, default=1.0,
+                        help="minimum seconds a reported device state is shown (default: 1)")
+    parser.add_argument('--flap-threshold', type=int, default=4,
+                        help="attach/detach changes within 5 seconds that mark a device as flapping (default: 4)")
+    parser.add_argument('--max-poll-interval', type=float, default=8.0,
+                        help="longest seconds between scans of an unchanged device set when no hotplug "
+                             "events are available, the worst case detection latency (default: 8)")
+    args = parser.parse_args(argv)
+    init_logging()
+    init_data_directories()
+    
+    if args.monitor_cpu is not None:
+        # Before the monitor threads start so that they inherit the affinity
+        try:
+            pin_monitor_to_cpu(args.monitor_cpu)
+        except (OSError, ValueError) as e:
+            logger.error(f"Cannot pin the monitor to CPU {args.monitor_cpu}: {e}")
+    
+    exporter = None
+    if args.metrics_textfile:
+        exporter = MetricsTextfileExporter(METRICS, args.metrics_textfile, args.metrics_interval)
+        exporter.start()
+    install_metrics_dump_handler()
+    try:
+        if args.daemon:
+            return run_daemon(args.socket, args.max_apps, args.sample_interval, make_debouncer(args),
+                              args.max_poll_interval)
+        return run_gui(args)
+    finally:
+        if exporter is not None:
+            exporter.stop()
+
+
+def install_metrics_dump_handler():
+    """Dump metrics as JSON into the state directory on SIGUSR1 (Unix only)"""
+    if not hasattr(signal, 'SIGUSR1'):
+        return
+    dump_path = os.path.join(guard_directory('state'), 'metrics.json')
+    
+    def dump_metrics(signum, frame):
+        try:
+            METRICS.write_json(dump_path)
+            logger.info(f"Metrics written to {dump_path}")
+        except OSError as e:
+            logger.error(f"Cannot write metrics to {dump_path}: {e}")
+    
+    signal.signal(signal.SIGUSR1, dump_metrics)
+
+
+def run_gui(args):
+    """Create and run the Tk application"""
+    load_tkinter()
     root = tk.Tk()
-    app = DeviceMonitorGUI(root)
+    daemon_client = DaemonClient(args.socket) if args.attach else None
+    app = DeviceMonitorGUI(root, daemon_client=daemon_client, max_processes=args.max_apps,
+                           sample_interval=args.sample_interval, debouncer=make_debouncer(args),
+                           max_poll_interval=args.max_poll_interval)
     
     try:
         root.mainloop()
@@ -1274,7 +5553,8 @@ def main():
                 app.usb_monitor.stop_monitoring()
         except Exception as e:
             logger.error(f"Cleanup error: {e}")
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
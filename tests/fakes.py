@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Test doubles for main.py: a fake sysfs tree, a fake hotplug event source, a
+manually advanced clock and a synthetic bouncing device, so device detection
+can be exercised on a plain Linux box without USB hardware. benchmarks.py
+uses them as well.
+"""
+
+import os
+import queue
+import select
+import time
+from collections import deque
+
+import main
+
+
+def make_fake_sysfs(root, device_count=40):
+    """Build a /sys/bus/usb/devices lookalike with hubs, interfaces and a few 1809 devices"""
+    devices = [('usb1', '1d6b', '0002', 1, 1), ('usb2', '1d6b', '0003', 2, 1)]
+    for index in range(device_count):
+        vendor, product = ('1809', '4761') if index % 10 == 0 else ('046d', f'{0xc000 + index:04x}')
+        devices.append((f'1-{index + 1}', vendor, product, 1, index + 2))
+    devices.append(('2-1', '1809', '4750', 2, 2))
+
+    for name, vendor, product, busnum, devnum in devices:
+        write_fake_device(root, name, vendor, product, busnum, devnum)
+    return devices
+
+
+def write_fake_device(root, name, vendor, product, busnum, devnum):
+    """Write one sysfs device directory, with an interface directory unless it is a root hub"""
+    path = os.path.join(root, name)
+    os.makedirs(path)
+    for attribute, value in (('idVendor', vendor), ('idProduct', product),
+                             ('busnum', str(busnum)), ('devnum', str(devnum))):
+        with open(os.path.join(path, attribute), 'w') as f:
+            f.write(value + '\n')
+    if not name.startswith('usb'):
+        os.makedirs(os.path.join(root, f'{name}:1.0'))
+
+
+def wait_for_delta(device_queue, event, device_id, timeout=5.0):
+    """Read device_queue until the given delta for device_id arrives, returns False on timeout"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            message_type, data = device_queue.get(timeout=max(deadline - time.monotonic(), 0.001))
+        except queue.Empty:
+            return False
+        if message_type == event and data[0] == device_id:
+            return True
+
+
+class FakeClock:
+    """Manually advanced clock for simulating schedulers"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def bouncing_trace(t):
+    """Connected state of a synthetic 4761 on a marginal cable at time t"""
+    if t < 5.0:
+        return True
+    if t < 8.0:
+        # Bounces every 150 ms
+        return int((t - 5.0) / 0.15) % 2 == 1
+    if t < 20.0:
+        return False
+    # Plugged in properly, with one 100 ms glitch
+    return not 25.0 <= t < 25.1
+
+
+class FakeHotplugListener(main.HotplugListener):
+    """Hotplug events injected by a test instead of the kernel (Unix only).
+
+    inject() queues an event and writes a byte to a pipe, whose read end is
+    the fileno() the monitor loop watches, like the netlink socket of
+    LinuxHotplugListener. Set USBMonitor.hotplug_factory to
+    FakeHotplugListener (or a function returning one) to use it.
+    """
+
+    def __init__(self, device_ids):
+        super().__init__(device_ids)
+        self._events = deque()
+        self._read_fd = None
+        self._write_fd = None
+
+    def open(self):
+        self._read_fd, self._write_fd = os.pipe()
+        os.set_blocking(self._write_fd, False)
+        return True
+
+    def fileno(self):
+        return self._read_fd
+
+    def inject(self, action, vendor_id, product_id):
+        """Queue an (action, vendor_id, product_id) event, vendor and product as ints, from any thread"""
+        self._events.append((action, vendor_id, product_id))
+        try:
+            os.write(self._write_fd, b'\0')
+        except BlockingIOError:
+            # Pipe full, the reader is already woken
+            pass
+
+    def next_event(self, timeout):
+        if not select.select([self._read_fd], [], [], timeout)[0]:
+            return None
+        os.read(self._read_fd, 1)
+        return self._events.popleft() if self._events else None
+
+    def close(self):
+        for fd in (self._read_fd, self._write_fd):
+            if fd is not None:
+                os.close(fd)
+        self._read_fd = self._write_fd = None
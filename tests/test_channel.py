@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""CoalescingChannel ordering, merging and a soak with a blocked consumer"""
+
+import queue
+import threading
+import time
+import tracemalloc
+
+import main
+
+ATTACHED = {'connected': True, 'count': 1, 'instances': ['1-1']}
+CHANGED = {'connected': True, 'count': 1, 'instances': ['1-2']}
+DETACHED = {'connected': False, 'count': 0, 'instances': []}
+
+
+def drain(channel):
+    messages = []
+    while True:
+        try:
+            messages.append(channel.get_nowait())
+        except queue.Empty:
+            return messages
+
+
+def test_messages_come_out_in_put_order():
+    channel = main.CoalescingChannel()
+    channel.put(('device_attached', ('dev0', ATTACHED, 1.0)))
+    channel.put(('app_started', None))
+    channel.put(('device_detached', ('dev1', DETACHED, 2.0)))
+    channel.put(('app_finished', 0))
+    assert drain(channel) == [('device_attached', ('dev0', ATTACHED, 1.0)), ('app_started', None),
+                              ('device_detached', ('dev1', DETACHED, 2.0)), ('app_finished', 0)]
+
+
+def test_change_merged_into_pending_attach_stays_an_attach():
+    channel = main.CoalescingChannel()
+    channel.put(('device_attached', ('dev0', ATTACHED, 1.0)))
+    channel.put(('app_error', 'failed'))
+    channel.put(('device_changed', ('dev0', CHANGED, 2.0)))
+    # The replaced state takes the place of its newest put
+    assert drain(channel) == [('app_error', 'failed'), ('device_attached', ('dev0', CHANGED, 1.0))]
+    assert channel.coalesced == 1
+
+
+def test_snapshot_replaces_pending_deltas():
+    channel = main.CoalescingChannel()
+    channel.put(('device_attached', ('dev0', ATTACHED, 1.0)))
+    channel.put(('device_status', {'dev0': DETACHED}))
+    assert drain(channel) == [('device_status', {'dev0': DETACHED})]
+
+
+def test_events_are_bounded_and_drops_counted():
+    channel = main.CoalescingChannel(max_events=10)
+    for index in range(25):
+        channel.put(('app_finished', index))
+    assert channel.dropped == 15
+    assert drain(channel) == [('app_finished', index) for index in range(15, 25)]
+
+
+def produce(channel, count):
+    """Device deltas, samples and events at the mix the monitor and launcher produce"""
+    statuses = [DETACHED, ATTACHED]
+    for index in range(count):
+        kind = index % 10
+        if kind < 7:
+            channel.put(('device_changed', (f'dev{index % 3}', statuses[index % 2], time.monotonic())))
+        elif kind < 9:
+            channel.put(('app_sample', 4242))
+        else:
+            channel.put(('app_finished', index))
+
+
+def soak(channel, count):
+    """Produce count messages from another thread while the consumer is blocked, returns the memory
+    held afterwards, the backlog and the catch-up time"""
+    producer = threading.Thread(target=produce, args=(channel, count))
+    producer.start()
+    producer.join()
+    held = tracemalloc.get_traced_memory()[0]
+    backlog = channel.qsize()
+    device_status = {}
+    started = time.perf_counter()
+    for message_type, data in drain(channel):
+        main.apply_device_message(device_status, message_type, data)
+    return held, backlog, time.perf_counter() - started
+
+
+def test_soak_with_blocked_consumer_stays_bounded():
+    channel = main.CoalescingChannel(max_events=1000, name='test_soak')
+    tracemalloc.start()
+    try:
+        # Warm up, then a short and a 10 times longer block
+        soak(channel, 20000)
+        short_held, short_backlog, short_catchup = soak(channel, 20000)
+        long_held, long_backlog, long_catchup = soak(channel, 200000)
+    finally:
+        tracemalloc.stop()
+    # One pending event per slot plus one state per device and pid
+    assert short_backlog == long_backlog == channel.max_events + 4
+    assert long_held - short_held < 64 * 1024
+    assert long_catchup < short_catchup * 3 + 0.005
+    # Every tenth message is an event, all but the newest max_events of each block are dropped
+    assert channel.dropped == sum(count // 10 - channel.max_events for count in (20000, 20000, 200000))
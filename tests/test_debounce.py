@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""DeviceDebouncer against a synthetic bouncing device trace"""
+
+import logging
+
+import pytest
+
+import main
+from tests.fakes import FakeClock, bouncing_trace
+
+CONNECTED = {'connected': True, 'count': 1, 'instances': ['/dev/bus/usb/001/004'], 'port': '1-1'}
+DISCONNECTED = {'connected': False, 'count': 0, 'instances': []}
+
+
+def replay(debouncer, clock, step=0.05, duration=30.0):
+    """Feed bouncing_trace to the debouncer, returns the published (time, connected) transitions and
+    the times the flapping flag was set"""
+    published = []
+    flapping = []
+    last = None
+    for index in range(int(duration / step)):
+        clock.now = index * step
+        connected = bouncing_trace(clock.now)
+        status = debouncer.update({'4761': CONNECTED if connected else DISCONNECTED})['4761']
+        if last is not None and status['connected'] != last['connected']:
+            published.append((clock.now, status['connected']))
+        if status.get('flapping'):
+            flapping.append(clock.now)
+        last = status
+    return published, flapping
+
+
+def test_bouncing_trace_publishes_stable_transitions_only(caplog):
+    clock = FakeClock()
+    debouncer = main.DeviceDebouncer(clock=clock)
+    with caplog.at_level(logging.WARNING, logger=main.logger.name):
+        published, flapping = replay(debouncer, clock)
+
+    # One detach after the bouncing, one attach, the 100 ms glitch at 25 s is not shown
+    assert [connected for _, connected in published] == [False, True]
+    detached_at, attached_at = published[0][0], published[1][0]
+    assert 8.0 <= detached_at < 20.0
+    assert 20.0 <= attached_at <= 20.0 + debouncer.settle_time + 0.05
+    # Flapping starts during the bouncing and ends a quiet window after it
+    assert flapping and 5.0 < flapping[0] < 8.0
+    assert flapping[-1] < 8.0 + debouncer.flap_window + 0.05
+    assert debouncer.flap_counts['4761'] > 2 * debouncer.flap_threshold
+    messages = [record.getMessage() for record in caplog.records]
+    assert messages.count("Device 4761 is flapping") == 1
+    assert messages.count("Device 4761 stopped flapping") == 1
+
+
+def test_short_glitch_is_suppressed():
+    clock = FakeClock()
+    debouncer = main.DeviceDebouncer(settle_time=0.25, min_dwell=1.0, clock=clock)
+    assert debouncer.update({'4761': CONNECTED})['4761']['connected']
+    clock.now = 1.0
+    assert debouncer.update({'4761': DISCONNECTED})['4761']['connected']
+    assert debouncer.timeout() == pytest.approx(0.25)
+    clock.now = 1.1
+    assert debouncer.update({'4761': CONNECTED})['4761']['connected']
+    assert debouncer.timeout() is None
+
+
+def test_settled_change_is_published_after_settle_time():
+    clock = FakeClock()
+    debouncer = main.DeviceDebouncer(settle_time=0.25, min_dwell=1.0, clock=clock)
+    debouncer.update({'4761': CONNECTED})
+    clock.now = 2.0
+    assert debouncer.update({'4761': DISCONNECTED})['4761']['connected']
+    clock.now = 2.25
+    # A re-check without a new scan publishes the settled state
+    assert not debouncer.update()['4761']['connected']
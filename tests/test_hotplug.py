@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""USBMonitor driven by injected hotplug events instead of polling"""
+
+import os
+import queue
+import shutil
+
+import pytest
+
+import main
+from tests.fakes import FakeHotplugListener, make_fake_sysfs, wait_for_delta, write_fake_device
+
+pytestmark = pytest.mark.skipif(main.IS_WINDOWS, reason="FakeHotplugListener needs selectable pipes")
+
+
+def test_wait_reports_only_watched_devices():
+    listener = FakeHotplugListener({'1809:4761'})
+    assert listener.open()
+    try:
+        listener.inject('add', 0x046d, 0xc001)
+        assert not listener.wait(0)
+        listener.inject('remove', 0x1809, 0x4761)
+        assert listener.wait(0)
+        listener.inject('rescan', None, None)
+        assert listener.wait(0)
+        assert not listener.wait(0)
+    finally:
+        listener.close()
+
+
+@pytest.fixture
+def hotplug_monitor(tmp_path):
+    """USBMonitor on a fake sysfs tree whose scans are driven by a FakeHotplugListener"""
+    root = str(tmp_path / 'sysfs')
+    make_fake_sysfs(root, device_count=0)
+    device_queue = queue.Queue()
+    monitor = main.USBMonitor(device_queue, queue.Queue())
+    monitor.sysfs_enumerator = main.SysfsUSBEnumerator(root)
+    monitor.debouncer = main.DeviceDebouncer(settle_time=0.02, min_dwell=0.0, flap_threshold=1000)
+    listeners = []
+
+    def make_listener(device_ids):
+        listeners.append(FakeHotplugListener(device_ids))
+        return listeners[-1]
+
+    monitor.hotplug_factory = make_listener
+    monitor.start_monitoring()
+    try:
+        message_type, status = device_queue.get(timeout=5)
+        assert message_type == 'device_status'
+        assert not status['4761']['connected']
+        assert len(listeners) == 1
+        yield root, device_queue, listeners[0]
+    finally:
+        monitor.stop_monitoring()
+
+
+def test_injected_events_replay_through_monitor_loop(hotplug_monitor):
+    root, device_queue, listener = hotplug_monitor
+    # Only events drive scans here, the safety rescan is a minute away
+    for devnum in (10, 11, 12):
+        write_fake_device(root, '1-5', '1809', '4761', 1, devnum)
+        listener.inject('add', 0x1809, 0x4761)
+        assert wait_for_delta(device_queue, 'device_attached', '4761')
+
+        shutil.rmtree(os.path.join(root, '1-5'))
+        shutil.rmtree(os.path.join(root, '1-5:1.0'))
+        listener.inject('remove', 0x1809, 0x4761)
+        assert wait_for_delta(device_queue, 'device_detached', '4761')
+
+
+def test_unrelated_events_do_not_rescan(hotplug_monitor):
+    root, device_queue, listener = hotplug_monitor
+    write_fake_device(root, '1-6', '1809', '4761', 1, 11)
+    listener.inject('add', 0x046d, 0xc001)
+    assert not wait_for_delta(device_queue, 'device_attached', '4761', timeout=0.3)
+    # A lost event forces a rescan that finds the device
+    listener.inject('rescan', None, None)
+    assert wait_for_delta(device_queue, 'device_attached', '4761')
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""ExecutableScanner reusing its index for unchanged directories"""
+
+import os
+import stat
+
+import pytest
+
+import main
+
+pytestmark = pytest.mark.skipif(main.IS_WINDOWS, reason="executables are found by permission bits")
+
+
+def write_file(path, text='', executable=False):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(text)
+    os.chmod(path, 0o755 if executable else 0o644)
+
+
+def scan(root, cache):
+    scanner = main.ExecutableScanner(root, cache=cache)
+    return sorted(os.path.relpath(path, root) for path in scanner.walk()), scanner
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = str(tmp_path / 'media')
+    write_file(os.path.join(root, 'tool'), '#!/bin/sh\n', executable=True)
+    write_file(os.path.join(root, 'bin', 'readme.txt'), 'notes')
+    write_file(os.path.join(root, 'bin', 'run'), '#!/bin/sh\n')
+    cache = main.ExecutableIndexCache(str(tmp_path / 'index.json'))
+    assert scan(root, cache)[0] == ['tool']
+    return root, cache
+
+
+def directory_mtimes(root):
+    return dict((directory, os.stat(directory).st_mtime_ns) for directory, _, _ in os.walk(root))
+
+
+def test_unchanged_tree_is_reused(tree):
+    root, cache = tree
+    found, scanner = scan(root, cache)
+    assert found == ['tool']
+    assert scanner.reused_directories == 2
+
+
+def test_chmod_is_noticed_without_a_directory_change(tree):
+    root, cache = tree
+    mtimes = directory_mtimes(root)
+    run = os.path.join(root, 'bin', 'run')
+    os.chmod(run, os.stat(run).st_mode | stat.S_IXUSR)
+    os.chmod(os.path.join(root, 'tool'), 0o644)
+    assert directory_mtimes(root) == mtimes
+    found, scanner = scan(root, cache)
+    assert found == [os.path.join('bin', 'run')]
+    assert scanner.reused_directories == 2
+
+
+def test_in_place_rewrite_is_noticed(tree):
+    root, cache = tree
+    mtimes = directory_mtimes(root)
+    readme = os.path.join(root, 'bin', 'readme.txt')
+    with open(readme, 'w') as f:
+        f.write('updated')
+    os.chmod(readme, 0o755)
+    assert directory_mtimes(root) == mtimes
+    assert scan(root, cache)[0] == [os.path.join('bin', 'readme.txt'), 'tool']
+
+
+def test_index_survives_a_restart(tree, tmp_path):
+    root, _ = tree
+    cache = main.ExecutableIndexCache(str(tmp_path / 'index.json'))
+    found, scanner = scan(root, cache)
+    assert found == ['tool']
+    assert scanner.reused_directories == 2
+
+
+def test_background_results_can_be_read_again(tree):
+    root, cache = tree
+    scanner = main.ExecutableScanner(root, cache=cache)
+    scanner.start()
+    assert scanner.done.wait(5)
+    # A medium's scanner is browsed every time Browse USB picks it
+    assert scanner.found_since(0) == [os.path.join(root, 'tool')]
+    assert scanner.found_since(0) == scanner.found_since(0)
+    assert scanner.found_since(1) == []
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""SysfsUSBEnumerator and check_devices against a fake sysfs tree"""
+
+import os
+import queue
+
+import main
+from tests.fakes import make_fake_sysfs, write_fake_device
+
+
+def test_enumerate_reads_every_device(tmp_path):
+    root = str(tmp_path)
+    devices = make_fake_sysfs(root, device_count=20)
+    records = main.SysfsUSBEnumerator(root).enumerate()
+    # Interface directories are not devices
+    assert len(records) == len(devices)
+    assert [(r.busnum, r.devnum) for r in records] == sorted((busnum, devnum) for *_, busnum, devnum in devices)
+    cards = [r for r in records if r.device_id == '1809:4761']
+    assert [r.sysfs_name for r in cards] == ['1-1', '1-11']
+    assert cards[0].dev_path == '/dev/bus/usb/001/002'
+
+
+def test_enumerate_skips_incomplete_devices(tmp_path):
+    root = str(tmp_path)
+    write_fake_device(root, '1-1', '1809', '4750', 1, 2)
+    write_fake_device(root, '1-2', '1809', '4761', 1, 3)
+    # Unplugged while the directory was read
+    os.remove(os.path.join(root, '1-2', 'devnum'))
+    write_fake_device(root, '1-3', '1809', '4761', 1, 4)
+    with open(os.path.join(root, '1-3', 'busnum'), 'w') as f:
+        f.write('garbage\n')
+    records = main.SysfsUSBEnumerator(root).enumerate()
+    assert [r.sysfs_name for r in records] == ['1-1']
+
+
+def test_vendor_and_product_are_lowercase(tmp_path):
+    root = str(tmp_path)
+    write_fake_device(root, '2-1', '1809', '4C5A', 2, 7)
+    record, = main.SysfsUSBEnumerator(root).enumerate()
+    assert record.device_id == '1809:4c5a'
+
+
+def test_missing_tree(tmp_path):
+    enumerator = main.SysfsUSBEnumerator(str(tmp_path / 'missing'))
+    assert not enumerator.available()
+    assert enumerator.enumerate() == []
+
+
+def test_check_devices_without_lsusb(tmp_path, monkeypatch):
+    root = str(tmp_path)
+    make_fake_sysfs(root, device_count=20)
+    monitor = main.USBMonitor(queue.Queue(), queue.Queue())
+    monitor.sysfs_enumerator = main.SysfsUSBEnumerator(root)
+    # No subprocess may be started for a sysfs scan
+    monkeypatch.setattr(main.subprocess, 'run', None)
+    status = monitor.check_devices()
+    assert status['4750']['connected']
+    assert status['4750']['instances'] == ['/dev/bus/usb/002/002']
+    assert status['4761']['connected'] and status['4761_1']['connected']